@@ -0,0 +1,134 @@
+import argparse
+from concurrent.futures import as_completed, ThreadPoolExecutor
+import os
+import resource
+import time
+
+import diff
+import homework
+import logs
+import storage
+import streaming
+from subscriptions import load_file, Subscription
+from timeline import updated_at
+import transport
+
+BACKFILL_CONCURRENCY = int(os.getenv('BACKFILL_CONCURRENCY', 8))
+BATCH_SIZE = int(os.getenv('BACKFILL_BATCH_SIZE', 500))
+
+BACKFILL_START_MESSAGE = (
+    'Бэкфилл: подписок {pending}, уже загружено {finished}'
+)
+BACKFILL_ERROR_MESSAGE = 'Сбой бэкфилла подписки {subscription}: {error}'
+BACKFILL_REPORT_MESSAGE = (
+    'Бэкфилл завершён: записей {records} за {seconds:.1f} с '
+    '({records_per_second:.0f} записей/с), ошибок {failed}, '
+    'пик памяти {peak_rss_mb:.1f} МБ'
+)
+
+
+def peak_rss_mb():
+    """Пиковый размер резидентной памяти процесса в мегабайтах."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def backfill_subscription(subscription, store, from_date=0, until=None,
+                          batch_size=BATCH_SIZE):
+    """Загрузка истории одной подписки пачками, возвращает число работ."""
+    stream = streaming.stream_api_answer(from_date, subscription.headers)
+    batch = []
+    count = 0
+    for record in stream:
+        if until is not None and (updated_at(record) or 0) > until:
+            continue
+        batch.append((diff.homework_key(record), record))
+        if len(batch) >= batch_size:
+            store.write(subscription.key, batch)
+            count += len(batch)
+            batch = []
+    store.write(subscription.key, batch)
+    count += len(batch)
+    store.finish(subscription.key, count, stream.current_date)
+    return count
+
+
+def backfill(subscriptions, store, from_date=0, until=None,
+             concurrency=BACKFILL_CONCURRENCY, batch_size=BATCH_SIZE):
+    """Загрузка истории подписок с ограниченным параллелизмом.
+
+    Уже загруженные подписки пропускаются, так что после сбоя
+    достаточно запустить бэкфилл снова. Возвращает сводку с числом
+    записей, скоростью и пиковой памятью.
+    """
+    finished = store.finished()
+    pending = [s for s in subscriptions if s.key not in finished]
+    homework.logger.info(logs.Message(
+        BACKFILL_START_MESSAGE,
+        pending=len(pending), finished=len(subscriptions) - len(pending)
+    ))
+    started = time.perf_counter()
+    records = failed = 0
+    with ThreadPoolExecutor(concurrency) as executor:
+        futures = {
+            executor.submit(
+                backfill_subscription, subscription, store, from_date,
+                until, batch_size
+            ): subscription
+            for subscription in pending
+        }
+        for future in as_completed(futures):
+            try:
+                records += future.result()
+            except Exception as error:
+                failed += 1
+                homework.logger.error(logs.Message(
+                    BACKFILL_ERROR_MESSAGE,
+                    subscription=futures[future].key, error=error
+                ))
+    seconds = time.perf_counter() - started
+    return {
+        'subscriptions': len(pending),
+        'records': records,
+        'failed': failed,
+        'seconds': seconds,
+        'records_per_second': records / seconds if seconds else 0.0,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def main():
+    """Запуск бэкфилла из командной строки."""
+    parser = argparse.ArgumentParser(
+        description='Загрузка истории проверок домашних работ'
+    )
+    parser.add_argument(
+        '--subscriptions', default=os.getenv(
+            'SUBSCRIPTIONS_FILE', 'subscriptions.json'
+        )
+    )
+    parser.add_argument('--from-date', type=int, default=0)
+    parser.add_argument('--until', type=int, default=None)
+    parser.add_argument(
+        '--concurrency', type=int, default=BACKFILL_CONCURRENCY
+    )
+    parser.add_argument('--state', default=storage.STATE_FILE)
+    args = parser.parse_args()
+    subscriptions = load_file(args.subscriptions)
+    if not subscriptions and homework.PRACTICUM_TOKEN:
+        subscriptions = [Subscription(
+            homework.PRACTICUM_TOKEN, homework.TELEGRAM_CHAT_ID
+        )]
+    transport.install(transport.Transport(pool_size=args.concurrency))
+    store = storage.HistoryStore(args.state)
+    try:
+        report = backfill(
+            subscriptions, store, args.from_date, args.until,
+            args.concurrency
+        )
+    finally:
+        store.close()
+    homework.logger.info(logs.Message(BACKFILL_REPORT_MESSAGE, **report))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+r"""Нагрузочный бенчмарк цикла опроса на локальных заменителях API.
+
+Пример:
+
+    python benchmarks/load.py --subscriptions 1 100 10000 --rounds 3 \
+        --latency 0.02 --payload-size 50 --error-rate 0.01
+
+Результаты пишутся в json-файл для сравнения между версиями.
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import json
+import logging
+import multiprocessing
+import os
+from os.path import abspath, dirname
+import platform
+import resource
+import sys
+import time
+import urllib.request
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+import telegram  # noqa: E402
+from telegram.utils.request import Request  # noqa: E402
+
+import diff  # noqa: E402
+import homework  # noqa: E402
+from outbox import Outbox  # noqa: E402
+import stubs  # noqa: E402
+from subscriptions import Subscription  # noqa: E402
+import transport  # noqa: E402
+
+BOT_TOKEN = '123456:benchmark'
+DRAIN_TIMEOUT = 120
+RESULTS_FILE = os.path.join(dirname(abspath(__file__)), 'results.json')
+
+SCENARIO_MESSAGE = (
+    'подписок {subscriptions}: {polls_per_second:.0f} опросов/с, '
+    'уведомление p50 {notify_p50_ms:.1f} мс, p99 {notify_p99_ms:.1f} мс, '
+    'CPU {cpu_percent:.0f}%, RSS {rss_mb:.1f} МБ'
+)
+
+
+def serve_stubs(options, connection):
+    """Заменители в отдельном процессе, чтобы не мешать замерам CPU."""
+    practicum = stubs.practicum_server(
+        options['latency'], options['error_rate'], options['payload_size'],
+        seed=options['seed']
+    ).start()
+    bot_api = stubs.telegram_server(
+        options['telegram_latency'], options['telegram_error_rate'],
+        seed=options['seed']
+    ).start()
+    connection.send((practicum.url, bot_api.url))
+    connection.recv()
+
+
+def percentile(values, fraction):
+    """Перцентиль по отсортированному списку."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def rss_mb():
+    """Текущий размер резидентной памяти процесса в мегабайтах."""
+    with open('/proc/self/statm') as statm:
+        pages = int(statm.read().split()[1])
+    return pages * resource.getpagesize() / 2 ** 20
+
+
+def cpu_seconds():
+    """Процессорное время процесса."""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run_scenario(count, options):
+    """Прогон rounds циклов опроса для count подписок."""
+    context = multiprocessing.get_context('spawn')
+    parent, child = context.Pipe()
+    process = context.Process(
+        target=serve_stubs, args=(options, child), daemon=True
+    )
+    process.start()
+    try:
+        practicum_url, telegram_url = parent.recv()
+        homework.ENDPOINT = practicum_url + stubs.PRACTICUM_PATH
+        concurrency = options['concurrency']
+        transport.install(transport.Transport(pool_size=concurrency))
+        bot = telegram.Bot(
+            BOT_TOKEN, base_url=telegram_url + '/bot',
+            request=Request(con_pool_size=concurrency + 4)
+        )
+        outbox = Outbox(
+            bot, global_rate=options['send_rate'],
+            chat_rate=options['send_rate']
+        ).start()
+        poller = homework.Poller(bot, outbox=outbox)
+        known = {
+            diff.homework_key(record): record['status']
+            for record in stubs.padding(options['payload_size'])
+        }
+        subscriptions = [
+            Subscription(
+                f'token-{index}', index, timestamp=0, statuses=dict(known)
+            )
+            for index in range(count)
+        ]
+        cpu_before = cpu_seconds()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            for _ in range(options['rounds']):
+                list(executor.map(poller.poll, subscriptions))
+        polling = time.perf_counter() - started
+        deadline = time.monotonic() + DRAIN_TIMEOUT
+        while outbox.pending() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        outbox.stop(timeout=1)
+        elapsed = time.perf_counter() - started
+        cpu = cpu_seconds() - cpu_before
+        with urllib.request.urlopen(telegram_url + '/stats') as response:
+            stats = json.load(response)
+        transport.current().close()
+    finally:
+        parent.send('stop')
+        process.join(timeout=5)
+    latencies = stats['latencies']
+    polls = poller.counters['polls']
+    return {
+        'subscriptions': count,
+        'rounds': options['rounds'],
+        'polls': polls,
+        'notifications': len(latencies),
+        'seconds': elapsed,
+        'polls_per_second': polls / polling if polling else 0.0,
+        'notify_p50_ms': percentile(latencies, 0.5) * 1000,
+        'notify_p99_ms': percentile(latencies, 0.99) * 1000,
+        'cpu_seconds': cpu,
+        'cpu_percent': cpu / elapsed * 100 if elapsed else 0.0,
+        'rss_mb': rss_mb(),
+        'peak_rss_mb': resource.getrusage(
+            resource.RUSAGE_SELF
+        ).ru_maxrss / 1024,
+    }
+
+
+def parse_args(argv=None):
+    """Параметры бенчмарка."""
+    parser = argparse.ArgumentParser(
+        description='Нагрузочный бенчмарк опроса и уведомлений'
+    )
+    parser.add_argument(
+        '--subscriptions', type=int, nargs='+', default=[1, 100, 10000]
+    )
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--payload-size', type=int, default=0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--telegram-latency', type=float, default=0.0)
+    parser.add_argument('--telegram-error-rate', type=float, default=0.0)
+    parser.add_argument('--send-rate', type=float, default=1e6)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--output', default=RESULTS_FILE)
+    parser.add_argument('--verbose', action='store_true')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Прогон всех сценариев и запись результатов."""
+    args = parse_args(argv)
+    if not args.verbose:
+        homework.logger.setLevel(logging.WARNING)
+    options = vars(args)
+    results = []
+    for count in args.subscriptions:
+        result = run_scenario(count, options)
+        print(SCENARIO_MESSAGE.format(**result))
+        results.append(result)
+    report = {
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'options': {
+            key: value for key, value in options.items()
+            if key not in ('output', 'verbose', 'subscriptions')
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as output:
+        json.dump(report, output, ensure_ascii=False, indent=2)
+    return report
+
+
+if __name__ == '__main__':
+    main()
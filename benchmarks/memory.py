@@ -0,0 +1,184 @@
+"""Бенчмарк памяти на состояние одной подписки.
+
+Пример:
+
+    python benchmarks/memory.py --subscriptions 10000 100000
+
+Загружает подписки из json-файла, восстанавливает статусы и расписание
+из SQLite, как при запуске, и проводит каждую через один опрос
+настоящего Poller с тем же кэшем статусов, что у движка, без сети:
+ответы эндпоинта отдаёт заменитель транспорта. Выводит байт на
+подписку по tracemalloc.
+"""
+import argparse
+import gc
+import json
+import os
+from os.path import abspath, dirname
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import requests
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+import commands  # noqa: E402
+import homework  # noqa: E402
+import scheduling  # noqa: E402
+import storage  # noqa: E402
+import subscriptions  # noqa: E402
+import transport  # noqa: E402
+
+RESULTS_FILE = os.path.join(dirname(abspath(__file__)), 'results_memory.json')
+STATUSES = ('reviewing', 'approved', 'rejected')
+START = 1_700_000_000
+
+REPORT_MESSAGE = (
+    'подписок {subscriptions}: {bytes_per_subscription:.0f} Б на подписку, '
+    'всего {megabytes:.1f} МБ, загрузка {load_seconds:.2f} с, '
+    'команды {commands}'
+)
+
+
+class StubTransport:
+    """Транспорт с заранее готовыми телами ответов по токену."""
+
+    def __init__(self, bodies):
+        """Тела ответов по заголовку Authorization."""
+        self.bodies = bodies
+
+    def get(self, url, headers=None, params=None, **kwargs):
+        """Ответ 200 с телом для токена из заголовков."""
+        response = requests.models.Response()
+        response.status_code = 200
+        response.headers['Content-Type'] = 'application/json'
+        response._content = self.bodies[headers['Authorization']]
+        return response
+
+
+class StubBot:
+    """Бот без отправки: при совпадающих статусах уведомлений нет."""
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        """Сообщение никуда не отправляется."""
+
+
+def homeworks(number, count):
+    """Работы подписки со случайными статусами."""
+    rng = random.Random(number)
+    return [
+        {'id': number * 10 + index, 'homework_name': f'lesson {index}',
+         'status': rng.choice(STATUSES)}
+        for index in range(count)
+    ]
+
+
+def prepare(directory, count, homework_count):
+    """Файл подписок и база со статусами и расписанием."""
+    path = os.path.join(directory, 'subscriptions.json')
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump([
+            {'token': f'y0_{number:040d}', 'chat_id': 100_000_000 + number,
+             'cohort': f'cohort-{number % 20}'}
+            for number in range(count)
+        ], file)
+    store = storage.CheckpointStore(os.path.join(directory, 'state.sqlite3'))
+    for subscription in subscriptions.load_file(path):
+        number = subscription.chat_id - 100_000_000
+        for work in homeworks(number, homework_count):
+            store.save_status(
+                subscription.key, work['id'], work['status']
+            )
+        store.save_cursor(subscription.key, START + number, START + 600.5)
+    store.flush()
+    return path, store
+
+
+def responses(path, homework_count):
+    """Тела ответов эндпоинта для всех подписок файла."""
+    bodies = {}
+    for subscription in subscriptions.load_file(path):
+        number = subscription.chat_id - 100_000_000
+        bodies[subscription.headers['Authorization']] = json.dumps({
+            'current_date': START + number + 1,
+            'homeworks': homeworks(number, homework_count),
+        }).encode()
+    return bodies
+
+
+def load(path, store):
+    """Подписки и поллер после запуска и одного опроса каждой."""
+    loaded = subscriptions.load_file(path)
+    subscriptions.restore_all(loaded, store)
+    poller = homework.Poller(
+        StubBot(), store, cache=homework.status_cache(),
+        scheduler=scheduling.AdaptiveScheduler(rng=random.Random(1))
+    )
+    for subscription in loaded:
+        poller.poll(subscription)
+    store.flush()
+    return loaded, poller
+
+
+def run(count, homework_count):
+    """Замер памяти подписок в count штук."""
+    with tempfile.TemporaryDirectory() as directory:
+        path, store = prepare(directory, count, homework_count)
+        previous = transport.current()
+        transport.install(StubTransport(responses(path, homework_count)))
+        gc.collect()
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        try:
+            loaded = load(path, store)
+            seconds = time.perf_counter() - started
+            gc.collect()
+            used = tracemalloc.get_traced_memory()[0] - baseline
+        finally:
+            tracemalloc.stop()
+            transport.install(previous)
+            store.close()
+        del loaded
+    return {
+        'subscriptions': count,
+        'homeworks': homework_count,
+        'commands': commands.BOT_COMMANDS,
+        'bytes': used,
+        'bytes_per_subscription': used / count,
+        'megabytes': used / 2 ** 20,
+        'load_seconds': seconds,
+    }
+
+
+def parse_args(argv=None):
+    """Параметры бенчмарка."""
+    parser = argparse.ArgumentParser(
+        description='Память на состояние подписки'
+    )
+    parser.add_argument(
+        '--subscriptions', type=int, nargs='+', default=[10_000, 100_000]
+    )
+    parser.add_argument('--homeworks', type=int, default=3)
+    parser.add_argument('--output', default=RESULTS_FILE)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Запуск бенчмарка из командной строки."""
+    options = parse_args(argv)
+    reports = []
+    for count in options.subscriptions:
+        report = run(count, options.homeworks)
+        print(REPORT_MESSAGE.format(**report))
+        reports.append(report)
+    with open(options.output, 'w', encoding='utf-8') as output:
+        json.dump(reports, output, ensure_ascii=False, indent=2)
+    return reports
+
+
+if __name__ == '__main__':
+    main()
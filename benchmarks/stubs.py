@@ -0,0 +1,168 @@
+"""Локальные заменители эндпоинта Практикума и Telegram Bot API."""
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import re
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+PRACTICUM_PATH = '/api/user_api/homework_statuses/'
+STATUSES = ('reviewing', 'approved', 'rejected')
+SENT_AT = re.compile(r'sent-at=(\d+\.\d+)')
+
+
+class StubServer(ThreadingHTTPServer):
+    """HTTP-сервер с задержкой ответа и долей ошибок."""
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, handler, latency=0.0, error_rate=0.0, port=0,
+                 seed=None):
+        """Сервер на свободном порту с задержкой и долей ошибок."""
+        super().__init__(('127.0.0.1', port), handler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        """Адрес сервера."""
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def should_fail(self):
+        """Нужно ли ответить ошибкой на этот запрос."""
+        with self.lock:
+            return self.random.random() < self.error_rate
+
+    def start(self):
+        """Запуск в фоновом потоке."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Общая часть обработчиков заменителей."""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def reply(self, status, data):
+        """Json-ответ с длиной тела для keep-alive."""
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def delay(self):
+        """Искусственная задержка ответа."""
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+    def log_message(self, *args):
+        """Запросы не логируются."""
+
+
+class PracticumHandler(StubHandler):
+    """Эндпоинт статусов: каждый запрос токена меняет статус его работы.
+
+    В названии работы передаётся время ответа, чтобы заменитель
+    Telegram мог посчитать задержку от смены статуса до уведомления.
+    Дополнительные работы с неизменным статусом задают размер ответа.
+    """
+
+    def do_GET(self):
+        """Ответ со списком работ."""
+        self.delay()
+        url = urlparse(self.path)
+        if url.path != PRACTICUM_PATH:
+            self.reply(404, {'code': 'not_found'})
+            return
+        if self.server.should_fail():
+            self.reply(500, {'message': 'stub error'})
+            return
+        token = self.headers.get('Authorization', '')
+        with self.server.lock:
+            self.server.polls[token] += 1
+            count = self.server.polls[token]
+        homeworks = [{
+            'id': 0,
+            'homework_name': f'changed sent-at={time.time():.6f}',
+            'status': STATUSES[count % len(STATUSES)],
+        }]
+        homeworks.extend(self.server.padding)
+        from_date = parse_qs(url.query).get('from_date', ['0'])[0]
+        self.reply(200, {
+            'homeworks': homeworks,
+            'current_date': max(int(time.time()), int(from_date)),
+        })
+
+
+class TelegramHandler(StubHandler):
+    """Bot API: sendMessage запоминает задержку уведомления."""
+
+    def do_POST(self):
+        """Ответ на sendMessage."""
+        length = int(self.headers.get('Content-Length', 0))
+        data = json.loads(self.rfile.read(length) or b'{}')
+        self.delay()
+        if self.server.should_fail():
+            self.reply(500, {
+                'ok': False, 'error_code': 500, 'description': 'stub error'
+            })
+            return
+        received = time.time()
+        match = SENT_AT.search(data.get('text', ''))
+        with self.server.lock:
+            self.server.messages += 1
+            message_id = self.server.messages
+            if match:
+                self.server.latencies.append(
+                    received - float(match.group(1))
+                )
+        self.reply(200, {'ok': True, 'result': {
+            'message_id': message_id,
+            'date': int(received),
+            'chat': {'id': data.get('chat_id'), 'type': 'private'},
+            'text': data.get('text'),
+        }})
+
+    def do_GET(self):
+        """Собранная статистика по адресу /stats."""
+        with self.server.lock:
+            self.reply(200, {
+                'messages': self.server.messages,
+                'latencies': list(self.server.latencies),
+            })
+
+
+def padding(size):
+    """Работы с неизменным статусом, которые только увеличивают ответ."""
+    return [
+        {'id': index, 'homework_name': f'homework {index}',
+         'status': 'approved'}
+        for index in range(1, size + 1)
+    ]
+
+
+def practicum_server(latency=0.0, error_rate=0.0, payload_size=0, port=0,
+                     seed=None):
+    """Заменитель эндпоинта с payload_size дополнительными работами."""
+    server = StubServer(PracticumHandler, latency, error_rate, port, seed)
+    server.polls = defaultdict(int)
+    server.padding = padding(payload_size)
+    return server
+
+
+def telegram_server(latency=0.0, error_rate=0.0, port=0, seed=None):
+    """Заменитель Telegram Bot API."""
+    server = StubServer(TelegramHandler, latency, error_rate, port, seed)
+    server.messages = 0
+    server.latencies = []
+    return server
@@ -0,0 +1,154 @@
+"""Бенчмарк размера и скорости журнала смен статусов.
+
+Пример:
+
+    python benchmarks/timeline_size.py --events 1000000 --subscriptions 10000
+
+Пишет синтетический журнал в SQLite-файл и выводит байт на событие на
+диске и в памяти процесса, скорость записи и время типовых запросов.
+"""
+import argparse
+import json
+import os
+from os.path import abspath, dirname
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from subscriptions import Subscription  # noqa: E402
+import timeline  # noqa: E402
+
+RESULTS_FILE = os.path.join(
+    dirname(abspath(__file__)), 'results_timeline.json'
+)
+BATCH_SIZE = 10000
+START = 1_600_000_000
+HOUR = 60 * 60
+
+REPORT_MESSAGE = (
+    'событий {events}: {disk_bytes_per_event:.1f} Б/событие на диске, '
+    'пик памяти при записи {memory_bytes_per_event:.1f} Б/событие в пачке, '
+    '{events_per_second:.0f} событий/с; отказы за неделю '
+    '{rejections_ms:.1f} мс ({rejections} шт.), медиана проверки по '
+    'когортам {review_time_ms:.1f} мс'
+)
+
+
+def homework_events(subscriptions, homeworks, rng):
+    """Смены статусов: проверка, доработки и принятие каждой работы."""
+    for homework_id in range(homeworks):
+        for subscription in subscriptions:
+            at = START + homework_id * 7 * 24 * HOUR + rng.randrange(HOUR)
+            while True:
+                yield subscription, homework_id, 'reviewing', at
+                at += rng.randrange(HOUR, 72 * HOUR)
+                if rng.random() < 0.7:
+                    yield subscription, homework_id, 'approved', at
+                    break
+                yield subscription, homework_id, 'rejected', at
+                at += rng.randrange(HOUR, 48 * HOUR)
+
+
+def write(store, subscriptions, events, seed):
+    """Запись events событий пачками; возвращает время и пик памяти."""
+    rng = random.Random(seed)
+    generator = homework_events(subscriptions, events, rng)
+    written = 0
+    peak = 0
+    started = time.perf_counter()
+    while written < events:
+        tracemalloc.start()
+        for subscription, homework_id, status, at in generator:
+            store.clock = lambda: at
+            store.record(subscription, homework_id, {
+                'homework_name': f'lesson {homework_id}', 'status': status,
+            })
+            written += 1
+            if written % BATCH_SIZE == 0 or written == events:
+                break
+        store.flush()
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return time.perf_counter() - started, peak
+
+
+def timed(function, *args):
+    """Результат и длительность вызова в миллисекундах."""
+    started = time.perf_counter()
+    result = function(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def run(options):
+    """Запись журнала и замеры."""
+    subscriptions = [
+        Subscription(
+            f'token-{number}', number,
+            cohort=f'cohort-{number % options.cohorts}'
+        )
+        for number in range(options.subscriptions)
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'timeline.sqlite3')
+        store = timeline.TimelineStore(path)
+        seconds, peak = write(store, subscriptions, options.events,
+                              options.seed)
+        store.connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        disk = os.path.getsize(path)
+        events = store.connection.execute(
+            'SELECT COUNT(*) FROM timeline'
+        ).fetchone()[0]
+        last = store.connection.execute(
+            'SELECT MAX(at) FROM timeline'
+        ).fetchone()[0]
+        rejections, rejections_ms = timed(
+            store.transitions, 'rejected', last - 7 * 24 * HOUR
+        )
+        medians, review_time_ms = timed(
+            store.median_durations, 'reviewing', 'approved'
+        )
+        store.close()
+    return {
+        'events': events,
+        'subscriptions': options.subscriptions,
+        'cohorts': len(medians),
+        'disk_bytes': disk,
+        'disk_bytes_per_event': disk / events,
+        'memory_peak_bytes': peak,
+        'memory_bytes_per_event': peak / min(BATCH_SIZE, events),
+        'events_per_second': events / seconds,
+        'rejections': len(rejections),
+        'rejections_ms': rejections_ms,
+        'review_time_ms': review_time_ms,
+    }
+
+
+def parse_args(argv=None):
+    """Параметры бенчмарка."""
+    parser = argparse.ArgumentParser(
+        description='Размер и скорость журнала смен статусов'
+    )
+    parser.add_argument('--events', type=int, default=1_000_000)
+    parser.add_argument('--subscriptions', type=int, default=10_000)
+    parser.add_argument('--cohorts', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default=RESULTS_FILE)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Запуск бенчмарка из командной строки."""
+    options = parse_args(argv)
+    report = run(options)
+    print(REPORT_MESSAGE.format(**report))
+    with open(options.output, 'w', encoding='utf-8') as output:
+        json.dump(report, output, ensure_ascii=False, indent=2)
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+from contextlib import contextmanager
+import contextvars
+import os
+import threading
+import time
+
+import exceptions
+import logs
+import metrics
+
+FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', 5))
+RESET_TIMEOUT = float(os.getenv('BREAKER_RESET_TIMEOUT', 60))
+PROBE_WAIT = 1.0
+TELEGRAM = 'api.telegram.org'
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+CIRCUIT_OPEN_MESSAGE = (
+    'Запросы к {name} приостановлены после {failures} сбоев подряд, '
+    'повтор через {retry_after:.0f} с'
+)
+CIRCUIT_STATE_MESSAGE = 'Автомат {name}: {previous} -> {state}'
+
+logger = logs.get_logger('breaker')
+
+_breakers = {}
+_registry_lock = threading.Lock()
+_clock = time.monotonic
+_outcomes = contextvars.ContextVar('breaker_outcomes', default=None)
+
+
+class CircuitBreaker:
+    """Автоматический выключатель запросов к одному сервису.
+
+    После failure_threshold сбоев подряд автомат размыкается, и вызовы
+    сразу получают CircuitOpenError, не нагружая упавший сервис. Через
+    reset_timeout пропускается ровно один пробный запрос: его успех
+    замыкает автомат, а сбой снова размыкает на reset_timeout.
+    """
+
+    def __init__(self, name, failure_threshold=FAILURE_THRESHOLD,
+                 reset_timeout=RESET_TIMEOUT, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Можно ли выполнить запрос сейчас."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if self.clock() - self.opened_at < self.reset_timeout:
+                    return False
+                self._transition(HALF_OPEN)
+            if self.probing:
+                return False
+            self.probing = True
+            return True
+
+    def check(self):
+        """Исключение CircuitOpenError, если запрос выполнять нельзя."""
+        if not self.allow():
+            retry_after = self.retry_after()
+            raise exceptions.CircuitOpenError(
+                CIRCUIT_OPEN_MESSAGE.format(
+                    name=self.name, failures=self.failures,
+                    retry_after=retry_after
+                ),
+                retry_after=retry_after
+            )
+
+    def record(self, success):
+        """Учёт результата разрешённого запроса.
+
+        Внутри single_outcome() результат только запоминается и
+        учитывается один раз при выходе из блока.
+        """
+        outcomes = _outcomes.get()
+        if outcomes is not None:
+            outcomes[self] = success
+            return
+        if success:
+            self.success()
+        else:
+            self.failure()
+
+    def success(self):
+        """Успешный запрос замыкает автомат."""
+        with self._lock:
+            self.failures = 0
+            self.probing = False
+            if self.state != CLOSED:
+                self._transition(CLOSED)
+
+    def failure(self):
+        """Сбой запроса; размыкает автомат при достижении порога."""
+        with self._lock:
+            self.failures += 1
+            self.probing = False
+            if (self.state == HALF_OPEN
+                    or self.failures >= self.failure_threshold):
+                self.opened_at = self.clock()
+                if self.state != OPEN:
+                    self._transition(OPEN)
+
+    def retry_after(self):
+        """Секунды до следующей попытки."""
+        with self._lock:
+            if self.state == CLOSED:
+                return 0.0
+            if self.state == HALF_OPEN:
+                return PROBE_WAIT
+            return max(
+                PROBE_WAIT,
+                self.opened_at + self.reset_timeout - self.clock()
+            )
+
+    def stats(self):
+        """Состояние автомата."""
+        with self._lock:
+            return {
+                'state': self.state,
+                'failures': self.failures,
+                'probing': self.probing,
+            }
+
+    def _transition(self, state):
+        logger.warning(logs.Message(
+            CIRCUIT_STATE_MESSAGE,
+            name=self.name, previous=self.state, state=state
+        ))
+        self.state = state
+
+
+def get(name):
+    """Общий автомат сервиса, создаётся при первом обращении."""
+    circuit = _breakers.get(name)
+    if circuit is None:
+        with _registry_lock:
+            circuit = _breakers.setdefault(
+                name, CircuitBreaker(name, clock=_clock)
+            )
+    return circuit
+
+
+@contextmanager
+def single_outcome():
+    """Один результат на автомат за весь блок — последний записанный.
+
+    Повторы одного логического запроса не засчитываются отдельными
+    сбоями, так что один опрос не размыкает автомат сам по себе.
+    """
+    outcomes = {}
+    token = _outcomes.set(outcomes)
+    try:
+        yield
+    finally:
+        _outcomes.reset(token)
+        for circuit, success in outcomes.items():
+            circuit.record(success)
+
+
+def states():
+    """Состояния всех автоматов по именам."""
+    return {name: circuit.state for name, circuit in list(_breakers.items())}
+
+
+metrics.REGISTRY.register(metrics.Gauge(
+    'homework_circuit_state',
+    'Состояние автоматов: 0 замкнут, 1 пробный запрос, 2 разомкнут',
+    lambda: {
+        (('endpoint', name),): STATE_VALUES[state]
+        for name, state in states().items()
+    }
+))
+
+
+def reset(clock=time.monotonic):
+    """Удаление всех автоматов; новые будут считать время по clock."""
+    global _clock
+    with _registry_lock:
+        _breakers.clear()
+        _clock = clock
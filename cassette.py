@@ -0,0 +1,243 @@
+from datetime import timedelta
+import gzip
+import json
+import os
+import re
+import threading
+import time
+
+import startup
+
+requests = startup.lazy('requests')
+telegram = startup.lazy('telegram')
+
+CASSETTE_FILE = os.getenv('CASSETTE_FILE')
+HTTP = 'http'
+TELEGRAM = 'telegram'
+STATE = 'state'
+RECORDED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Retry-After')
+SECRETS = re.compile(
+    r'(?<=OAuth )[^\s\'",}\\]+|(?<=Bearer )[^\s\'",}\\]+'
+    r'|(?<=/bot)\d+:[\w-]+'
+)
+REDACTED = '***'
+
+CASSETTE_EXHAUSTED_MESSAGE = 'В кассете больше нет ответов {kind}'
+
+
+def open_file(path, mode):
+    """Текстовый файл кассеты; с расширением .gz — сжатый."""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def load(path):
+    """События кассеты по порядку записи."""
+    with open_file(path, 'r') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def redact(text):
+    """Текст без токенов Практикума и Telegram.
+
+    Сообщения об ошибках запроса содержат заголовки с OAuth-токеном, а
+    ошибки Telegram — адрес с токеном бота.
+    """
+    return SECRETS.sub(REDACTED, text)
+
+
+def error_name(error):
+    """Имя класса исключения для записи в кассету."""
+    return type(error).__name__
+
+
+class Cassette:
+    """Запись трафика в JSONL: одно событие на строку.
+
+    У каждого события есть вид (kind), смещение от начала записи t и
+    длительность вызова elapsed в секундах. Заголовок Authorization и
+    другие заголовки запроса не пишутся, а токены в текстах сообщений и
+    ошибок, например в хедерах из сообщения о сбое запроса, заменяются
+    на ***, так что токенов в кассете нет.
+    """
+
+    def __init__(self, path=CASSETTE_FILE, clock=time.monotonic):
+        self.clock = clock
+        self.started = clock()
+        self.file = open_file(path, 'w')
+        self._lock = threading.Lock()
+
+    def write(self, kind, started, **fields):
+        """Запись события, начавшегося в started по часам кассеты."""
+        event = {
+            'kind': kind,
+            't': round(started - self.started, 3),
+            'elapsed': round(self.clock() - started, 4),
+            **fields,
+        }
+        line = redact(
+            json.dumps(event, ensure_ascii=False, separators=(',', ':'))
+        )
+        with self._lock:
+            self.file.write(line + '\n')
+            self.file.flush()
+
+    def state(self, subscription):
+        """Курсор и статусы подписки на начало записи."""
+        self.write(
+            STATE, self.clock(), timestamp=subscription.timestamp,
+            statuses=list(subscription.statuses.items())
+        )
+
+    def close(self):
+        """Закрытие файла кассеты."""
+        with self._lock:
+            self.file.close()
+
+
+class RecordingTransport:
+    """Транспорт, записывающий ответы эндпоинта в кассету."""
+
+    def __init__(self, transport, cassette):
+        self.transport = transport
+        self.cassette = cassette
+
+    def get(self, url, params=None, **kwargs):
+        """Запрос через исходный транспорт с записью ответа или ошибки."""
+        started = self.cassette.clock()
+        try:
+            response = self.transport.get(url, params=params, **kwargs)
+        except requests.exceptions.RequestException as error:
+            self.cassette.write(
+                HTTP, started, url=url, params=params,
+                error=error_name(error), message=str(error)
+            )
+            raise
+        self.cassette.write(
+            HTTP, started, url=url, params=params,
+            status=response.status_code,
+            headers={
+                name: response.headers[name]
+                for name in RECORDED_HEADERS if name in response.headers
+            },
+            body=response.content.decode('utf-8', 'replace')
+        )
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.transport, name)
+
+
+class RecordingBot:
+    """Бот, записывающий отправленные сообщения в кассету."""
+
+    def __init__(self, bot, cassette):
+        self.bot = bot
+        self.cassette = cassette
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        """Отправка через исходного бота с записью результата."""
+        started = self.cassette.clock()
+        try:
+            message = self.bot.send_message(
+                chat_id=chat_id, text=text, **kwargs
+            )
+        except Exception as error:
+            self.cassette.write(
+                TELEGRAM, started, chat_id=chat_id, text=text,
+                error=error_name(error), message=str(error),
+                retry_after=getattr(error, 'retry_after', None)
+            )
+            raise
+        self.cassette.write(TELEGRAM, started, chat_id=chat_id, text=text)
+        return message
+
+    def __getattr__(self, name):
+        return getattr(self.bot, name)
+
+
+class _Player:
+    def __init__(self, events, kind, speed, sleep):
+        self.events = [event for event in events if event['kind'] == kind]
+        self.position = 0
+        self.kind = kind
+        self.speed = speed
+        self.sleep = sleep
+
+    def peek(self):
+        """Следующее событие без продвижения или None в конце записи."""
+        if self.position < len(self.events):
+            return self.events[self.position]
+        return None
+
+    def next(self):
+        event = self.peek()
+        if event is None:
+            raise LookupError(
+                CASSETTE_EXHAUSTED_MESSAGE.format(kind=self.kind)
+            )
+        self.position += 1
+        if self.speed:
+            self.sleep(event['elapsed'] / self.speed)
+        return event
+
+
+class ReplayTransport(_Player):
+    """Транспорт, отдающий записанные ответы по порядку без сети.
+
+    Задержка каждого ответа — записанная, делённая на speed; при
+    speed=0 ответы отдаются сразу.
+    """
+
+    def __init__(self, events, speed=1.0, sleep=time.sleep):
+        super().__init__(events, HTTP, speed, sleep)
+
+    def get(self, url, params=None, **kwargs):
+        """Следующий записанный ответ или ошибка."""
+        event = self.next()
+        if 'error' in event:
+            error = getattr(
+                requests.exceptions, event['error'],
+                requests.exceptions.RequestException
+            )
+            raise error(event['message'])
+        response = requests.models.Response()
+        response.status_code = event['status']
+        response.headers = requests.structures.CaseInsensitiveDict(
+            event['headers']
+        )
+        response._content = event['body'].encode('utf-8')
+        response.encoding = 'utf-8'
+        response.url = event['url']
+        response.elapsed = timedelta(seconds=event['elapsed'])
+        return response
+
+
+class ReplayBot(_Player):
+    """Бот, который вместо отправки повторяет записанные результаты.
+
+    Отправленные сообщения копятся в sent для сравнения с записью без
+    токенов, как в кассете; записанная ошибка отправки бросается снова,
+    а сообщения сверх записи считаются отправленными.
+    """
+
+    def __init__(self, events, speed=1.0, sleep=time.sleep):
+        super().__init__(events, TELEGRAM, speed, sleep)
+        self.sent = []
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        """Учёт сообщения и повтор записанного результата отправки."""
+        self.sent.append((chat_id, redact(text)))
+        try:
+            event = self.next()
+        except LookupError:
+            return None
+        if 'error' not in event:
+            return None
+        error = getattr(
+            telegram.error, event['error'], telegram.error.TelegramError
+        )
+        if error is telegram.error.RetryAfter:
+            raise error(event['retry_after'])
+        raise error(event['message'])
@@ -0,0 +1,56 @@
+import heapq
+import itertools
+
+
+class VirtualClock:
+    """Часы дискретно-событийной симуляции.
+
+    Время стоит на месте, пока его не сдвинут sleep(), advance() или
+    run(). run() выполняет запланированные call_at() события в порядке
+    времени, перескакивая паузы между ними, поэтому неделя опросов
+    проигрывается за секунды. time и monotonic показывают одно и то же
+    время и подставляются вместо time.time и time.monotonic.
+    """
+
+    def __init__(self, start=0.0):
+        self.now = start
+        self._events = []
+        self._counter = itertools.count()
+
+    def time(self):
+        """Текущее время симуляции."""
+        return self.now
+
+    monotonic = time
+
+    def sleep(self, seconds):
+        """Пауза: время просто сдвигается вперёд."""
+        self.advance(seconds)
+
+    def advance(self, seconds):
+        """Сдвиг времени вперёд без выполнения событий."""
+        self.now += max(0.0, seconds)
+
+    def call_at(self, when, callback, *args):
+        """Событие callback(*args) в момент when."""
+        heapq.heappush(
+            self._events, (when, next(self._counter), callback, args)
+        )
+
+    def call_later(self, delay, callback, *args):
+        """Событие callback(*args) через delay секунд."""
+        self.call_at(self.now + max(0.0, delay), callback, *args)
+
+    def run(self, until):
+        """Выполнение событий до момента until; возвращает их число.
+
+        События одного момента выполняются в порядке планирования.
+        """
+        count = 0
+        while self._events and self._events[0][0] <= until:
+            when, _, callback, args = heapq.heappop(self._events)
+            self.now = max(self.now, when)
+            callback(*args)
+            count += 1
+        self.now = max(self.now, until)
+        return count
@@ -0,0 +1,264 @@
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import os
+import threading
+import time
+
+from diff import homework_key
+import logs
+
+BOT_COMMANDS = os.getenv('BOT_COMMANDS', '') not in ('', '0')
+STATUS_TTL = float(os.getenv('STATUS_TTL', 600))
+STATUS_ERROR_TTL = float(os.getenv('STATUS_ERROR_TTL', 30))
+HISTORY_SIZE = 20
+UPDATES_TIMEOUT = 30
+UPDATES_RETRY = 5
+WORKERS = 4
+
+STATUS_LINE = '"{name}": {verdict}'
+HISTORY_LINE = '{time} "{name}": {verdict}'
+TIME_FORMAT = '%d.%m %H:%M'
+NO_HOMEWORKS_MESSAGE = 'Работ на проверке пока нет'
+NO_HISTORY_MESSAGE = 'Смен статусов пока не было'
+UNAVAILABLE_MESSAGE = 'Статусы сейчас недоступны, попробуйте позже'
+HELP_MESSAGE = (
+    'Команды: /status — текущие статусы работ, '
+    '/history — последние смены статусов'
+)
+REFRESH_ERROR_MESSAGE = 'Не удалось обновить статусы для команды: {error}'
+UPDATES_ERROR_MESSAGE = 'Сбой получения команд: {error}'
+
+logger = logs.get_logger('commands')
+
+
+class StatusView:
+    """Последние известные статусы работ подписки и их смены."""
+
+    __slots__ = ('homeworks', 'history', 'updated', 'complete')
+
+    def __init__(self):
+        self.homeworks = {}
+        self.history = deque(maxlen=HISTORY_SIZE)
+        self.updated = None
+        self.complete = False
+
+    def merge(self, homeworks, now, moment):
+        """Учёт работ из ответа; смены статусов попадают в историю.
+
+        now — время кеша для TTL, moment — время смены для истории.
+        Пока полного списка работ нет, незнакомая работа не считается
+        сменой статуса: она могла просто не попасть в ответ с курсором.
+        """
+        for homework in homeworks:
+            key = homework_key(homework)
+            previous = self.homeworks.get(key)
+            if (previous is None and self.complete) or (
+                previous is not None
+                and previous['status'] != homework['status']
+            ):
+                self.history.append((moment, homework))
+            self.homeworks[key] = homework
+        self.updated = now
+
+
+class StatusCache:
+    """Кеш статусов для команд с TTL и одним общим обновлением.
+
+    Каждый опрос поллера дополняет кеш, поэтому обычно команды
+    отвечают без запросов к эндпоинту. Если кеш устарел или ещё не
+    содержит полного списка, его обновляет один запрос fetch(subscription),
+    а остальные одновременные команды ждут его результата. Неудачное
+    обновление запоминается на error_ttl секунд, и пока эндпоинт
+    недоступен, команды не запрашивают его заново.
+    """
+
+    def __init__(self, fetch, ttl=STATUS_TTL, clock=time.monotonic,
+                 error_ttl=STATUS_ERROR_TTL, wall=time.time):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.clock = clock
+        self.wall = wall
+        self._views = {}
+        self._inflight = {}
+        self._failures = {}
+        self._lock = threading.Lock()
+
+    def update(self, subscription, homeworks, complete=False):
+        """Работы из очередного ответа эндпоинта."""
+        with self._lock:
+            view = self._views.setdefault(subscription.key, StatusView())
+            view.merge(homeworks, self.clock(), self.wall())
+            view.complete = view.complete or complete
+
+    def view(self, subscription):
+        """Свежий вид статусов подписки.
+
+        Если обновить кеш не удалось, возвращается устаревший вид, а
+        при его отсутствии исключение пробрасывается.
+        """
+        with self._lock:
+            view = self._views.get(subscription.key)
+            if view is not None and view.complete and (
+                self.clock() - view.updated < self.ttl
+            ):
+                return view
+            failure = self._failures.get(subscription.key)
+            if failure is not None and (
+                self.clock() - failure[0] < self.error_ttl
+            ):
+                if view is None:
+                    raise failure[1]
+                return view
+            future = self._inflight.get(subscription.key)
+            leader = future is None
+            if leader:
+                future = self._inflight[subscription.key] = Future()
+        if leader:
+            self._refresh(subscription, future)
+        try:
+            return future.result()
+        except Exception:
+            if view is None:
+                raise
+            return view
+
+    def _refresh(self, subscription, future):
+        try:
+            homeworks = self.fetch(subscription)
+        except Exception as error:
+            logger.warning(logs.Message(REFRESH_ERROR_MESSAGE, error=error))
+            with self._lock:
+                self._failures[subscription.key] = self.clock(), error
+            future.set_exception(error)
+        else:
+            self.update(subscription, homeworks, complete=True)
+            with self._lock:
+                self._failures.pop(subscription.key, None)
+            future.set_result(self._views[subscription.key])
+        finally:
+            with self._lock:
+                self._inflight.pop(subscription.key, None)
+
+
+class CommandListener:
+    """Ответы на /status и /history из кеша статусов.
+
+    Команды читаются long polling через getUpdates в фоновом потоке и
+    обрабатываются в небольшом пуле, чтобы одновременные запросы одной
+    подписки сошлись на одном обновлении кеша. Отвечают только чаты
+    известных подписок.
+    """
+
+    def __init__(self, bot, cache, subscriptions, send, verdicts,
+                 workers=WORKERS):
+        self.bot = bot
+        self.cache = cache
+        self.send = send
+        self.verdicts = verdicts
+        self.chats = {}
+        for subscription in subscriptions:
+            self.chats.setdefault(
+                str(subscription.chat_id), []
+            ).append(subscription)
+        self.commands = {
+            '/status': self.status,
+            '/history': self.history,
+            '/help': self.help,
+            '/start': self.help,
+        }
+        self._executor = ThreadPoolExecutor(workers)
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Запуск чтения команд."""
+        self._thread = threading.Thread(
+            target=self._run, name='commands', daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Остановка после текущего запроса getUpdates."""
+        self._stopping.set()
+        self._executor.shutdown(wait=False)
+
+    def reply(self, chat_id, text):
+        """Ответ на сообщение или None, если отвечать не нужно."""
+        subscriptions = self.chats.get(str(chat_id))
+        if not subscriptions or not text:
+            return None
+        command = self.commands.get(text.split()[0].split('@')[0].lower())
+        if command is None:
+            return None
+        return '\n\n'.join(
+            command(subscription) for subscription in subscriptions
+        )
+
+    def status(self, subscription):
+        """Текущие статусы работ подписки."""
+        try:
+            view = self.cache.view(subscription)
+        except Exception:
+            return UNAVAILABLE_MESSAGE
+        if not view.homeworks:
+            return NO_HOMEWORKS_MESSAGE
+        return '\n'.join(
+            STATUS_LINE.format(
+                name=homework.get('homework_name'),
+                verdict=self.verdicts.get(
+                    homework['status'], homework['status']
+                )
+            )
+            for homework in view.homeworks.values()
+        )
+
+    def history(self, subscription):
+        """Последние смены статусов подписки."""
+        try:
+            view = self.cache.view(subscription)
+        except Exception:
+            return UNAVAILABLE_MESSAGE
+        if not view.history:
+            return NO_HISTORY_MESSAGE
+        return '\n'.join(
+            HISTORY_LINE.format(
+                time=time.strftime(TIME_FORMAT, time.localtime(moment)),
+                name=homework.get('homework_name'),
+                verdict=self.verdicts.get(
+                    homework['status'], homework['status']
+                )
+            )
+            for moment, homework in reversed(view.history)
+        )
+
+    def help(self, subscription):
+        """Список команд."""
+        return HELP_MESSAGE
+
+    def answer(self, chat_id, text):
+        """Ответ на одно сообщение."""
+        reply = self.reply(chat_id, text)
+        if reply is not None:
+            self.send(chat_id, reply)
+
+    def _run(self):
+        offset = None
+        while not self._stopping.is_set():
+            try:
+                updates = self.bot.get_updates(
+                    offset=offset, timeout=UPDATES_TIMEOUT,
+                    allowed_updates=['message']
+                )
+            except Exception as error:
+                logger.error(logs.Message(UPDATES_ERROR_MESSAGE, error=error))
+                self._stopping.wait(UPDATES_RETRY)
+                continue
+            for update in updates:
+                offset = update.update_id + 1
+                message = update.message
+                if message is not None and not self._stopping.is_set():
+                    self._executor.submit(
+                        self.answer, message.chat_id, message.text
+                    )
@@ -0,0 +1,52 @@
+import hashlib
+import re
+
+OK = 200
+NOT_MODIFIED = 304
+CURRENT_DATE = re.compile(rb'"current_date"\s*:\s*(-?\d+)')
+
+
+def request_headers(validators):
+    """Условные заголовки по валидаторам прошлого ответа."""
+    if validators is None:
+        return {}
+    etag, modified, _ = validators
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if modified:
+        headers['If-Modified-Since'] = modified
+    return headers
+
+
+def body_digest(body):
+    """Хеш тела ответа без current_date, которое меняется каждый опрос."""
+    return hashlib.blake2b(
+        CURRENT_DATE.sub(b'', body), digest_size=16
+    ).digest()
+
+
+def current_date(body):
+    """current_date из сырого тела ответа без разбора json."""
+    match = CURRENT_DATE.search(body or b'')
+    return int(match.group(1)) if match else None
+
+
+def check(response, validators):
+    """Валидаторы нового ответа или None, если он не изменился.
+
+    Сервер может сам ответить 304 на If-None-Match/If-Modified-Since;
+    иначе сравнивается хеш сырого тела до декодирования json.
+    """
+    if response.status_code == NOT_MODIFIED:
+        return None
+    if response.status_code != OK:
+        return None, None, None
+    digest = body_digest(response.content)
+    if validators is not None and validators[2] == digest:
+        return None
+    return (
+        response.headers.get('ETag'),
+        response.headers.get('Last-Modified'),
+        digest,
+    )
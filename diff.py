@@ -0,0 +1,25 @@
+def homework_key(homework):
+    """Идентификатор работы: id, а при его отсутствии название."""
+    return homework.get('id', homework.get('homework_name'))
+
+
+def transitions(previous, homeworks):
+    """Все реальные смены статусов относительно прошлого снимка.
+
+    previous — словарь id работы -> последний отправленный статус.
+    Каждая работа учитывается один раз (первое вхождение в ответе),
+    повтор уже известного статуса переходом не считается. Снимок не
+    изменяется: его обновляет вызывающий код после доставки
+    уведомления. Один проход по списку, так что полная история при
+    from_date=0 обрабатывается за O(n).
+    """
+    seen = set()
+    changed = []
+    for homework in homeworks:
+        key = homework_key(homework)
+        if key in seen:
+            continue
+        seen.add(key)
+        if previous.get(key) != homework['status']:
+            changed.append((key, homework))
+    return changed
@@ -0,0 +1,312 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import os
+import sqlite3
+import time
+
+import telegram
+from telegram.utils.request import Request
+
+import exceptions
+import homework
+import leases
+import logs
+import metrics
+from outbox import Outbox
+import profiling
+import retry
+import scheduling
+import sharding
+import shutdown
+import storage
+from subscriptions import load_file, restore_all, Subscription
+import timeline
+import transport
+
+SUBSCRIPTIONS_FILE = os.getenv('SUBSCRIPTIONS_FILE', 'subscriptions.json')
+CONCURRENCY = int(os.getenv('ENGINE_CONCURRENCY', 64))
+FLUSH_INTERVAL = float(os.getenv('CHECKPOINT_FLUSH_INTERVAL', 1))
+
+NO_SUBSCRIPTIONS_MESSAGE = 'Нет ни одной подписки для опроса'
+SHARD_MESSAGE = (
+    'Воркер {worker}: подписок {owned} из {total}, воркеров {workers}'
+)
+LEASE_GAINED_MESSAGE = 'Получено аренд: {count}, всего удерживается {held}'
+LEASE_ERROR_MESSAGE = 'Не удалось продлить аренды: {error}'
+ENGINE_START_MESSAGE = (
+    'Запуск движка: подписок {count}, параллельных запросов {concurrency}'
+)
+
+
+def load_subscriptions(path=SUBSCRIPTIONS_FILE):
+    """Загрузка подписок из json-файла или из переменных окружения."""
+    subscriptions = load_file(path)
+    if subscriptions:
+        return subscriptions
+    if homework.PRACTICUM_TOKEN and homework.TELEGRAM_CHAT_ID:
+        return [
+            Subscription(homework.PRACTICUM_TOKEN, homework.TELEGRAM_CHAT_ID)
+        ]
+    return []
+
+
+class Engine:
+    """Опрос множества подписок в одном цикле событий asyncio.
+
+    Запросы к API синхронные, поэтому выполняются в пуле потоков,
+    а семафор ограничивает число одновременных опросов. Старты подписок
+    равномерно распределены по retry_time, чтобы нагрузка на эндпоинт
+    не приходила одной пачкой, дальше паузы задаёт расписание поллера.
+    """
+
+    def __init__(self, poller, concurrency=CONCURRENCY,
+                 retry_time=homework.RETRY_TIME, leases=None):
+        self.poller = poller
+        self.store = poller.store
+        self.concurrency = concurrency
+        self.retry_time = retry_time
+        self.leases = leases
+        self.held = set()
+        self.polls = 0
+
+    async def run(self, subscriptions, membership=None):
+        """Запуск опроса подписок до отмены задачи.
+
+        С membership воркер опрашивает только свою долю подписок по
+        консистентному хешированию и пересчитывает её при каждом
+        продлении членства.
+        """
+        if not subscriptions:
+            return
+        homework.logger.info(logs.Message(
+            ENGINE_START_MESSAGE,
+            count=len(subscriptions), concurrency=self.concurrency
+        ))
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.tasks = {}
+        with ThreadPoolExecutor(self.concurrency) as executor:
+            self.executor = executor
+            jobs = []
+            if self.store is not None:
+                jobs.append(self.checkpoint())
+            if self.leases is not None:
+                jobs.append(self.renew())
+            if membership is None:
+                self.assign(subscriptions)
+                jobs.append(asyncio.gather(*self.tasks.values()))
+            else:
+                jobs.append(self.rebalance(subscriptions, membership))
+            try:
+                await asyncio.gather(*jobs)
+            finally:
+                for task in self.tasks.values():
+                    task.cancel()
+                await asyncio.gather(
+                    *self.tasks.values(), return_exceptions=True
+                )
+
+    def assign(self, subscriptions, restore=False):
+        """Запуск опроса новых подписок и остановка переданных другим."""
+        owned = {subscription.key: subscription
+                 for subscription in subscriptions}
+        self.subscriptions = owned
+        metrics.track_cursor_lag(owned.values())
+        for key in self.tasks.keys() - owned.keys():
+            self.tasks.pop(key).cancel()
+        added = [subscription for key, subscription in owned.items()
+                 if key not in self.tasks]
+        if not added:
+            return
+        if restore and self.store is not None:
+            for subscription in added:
+                subscription.restore(self.store)
+        delays = scheduling.startup_delays(added, self.retry_time)
+        for subscription, delay in zip(added, delays):
+            self.tasks[subscription.key] = asyncio.create_task(
+                self.watch(subscription, delay)
+            )
+
+    async def serve(self, subscriptions, membership=None,
+                    signals=shutdown.SIGNALS):
+        """Опрос до сигнала остановки с сохранением состояния.
+
+        Сигнал отменяет run: новые опросы не начинаются, уже начатые
+        доигрываются в пуле потоков, а накопленные изменения
+        записываются в хранилище.
+        """
+        loop = asyncio.get_running_loop()
+        task = asyncio.create_task(self.run(subscriptions, membership))
+        stop = shutdown.Shutdown()
+        retry.install(stop.sleep)
+
+        def request(signum):
+            stop.request(signum)
+            homework.logger.info(logs.Message(
+                homework.SHUTDOWN_MESSAGE, signal=signum
+            ))
+            task.cancel()
+
+        for signum in signals:
+            loop.add_signal_handler(signum, request, signum)
+        try:
+            await task
+        except asyncio.CancelledError:
+            if not stop.requested:
+                raise
+        finally:
+            for signum in signals:
+                loop.remove_signal_handler(signum)
+
+    async def rebalance(self, subscriptions, membership):
+        """Продление членства и пересчёт своей доли подписок."""
+        loop = asyncio.get_running_loop()
+        restore = False
+        try:
+            while True:
+                ring = sharding.HashRing(await loop.run_in_executor(
+                    self.executor, membership.heartbeat
+                ))
+                owned = [
+                    subscription for subscription in subscriptions
+                    if ring.owner(subscription.key) == membership.worker_id
+                ]
+                if len(owned) != len(self.tasks):
+                    homework.logger.info(logs.Message(
+                        SHARD_MESSAGE,
+                        worker=membership.worker_id, owned=len(owned),
+                        total=len(subscriptions), workers=len(ring.nodes)
+                    ))
+                self.assign(owned, restore=restore)
+                restore = True
+                await asyncio.sleep(membership.ttl / 3)
+        finally:
+            membership.leave()
+
+    async def renew(self):
+        """Периодическое продление и захват аренд своих подписок."""
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    self.held = await loop.run_in_executor(
+                        self.executor, self.acquire, list(self.tasks)
+                    )
+                except sqlite3.Error as error:
+                    homework.logger.error(logs.Message(
+                        LEASE_ERROR_MESSAGE, error=error
+                    ))
+                await asyncio.sleep(self.leases.interval)
+        finally:
+            self.held = set()
+            self.leases.release()
+
+    def acquire(self, keys):
+        """Аренды подписок; для перехваченных читается их состояние."""
+        held = self.leases.sync(keys)
+        gained = held - self.held
+        if gained and self.store is not None:
+            for key in gained:
+                self.subscriptions[key].restore(self.store)
+        if gained:
+            homework.logger.info(logs.Message(
+                LEASE_GAINED_MESSAGE, count=len(gained), held=len(held)
+            ))
+        return held
+
+    def leader(self, subscription):
+        """Опрашивает ли подписку этот процесс."""
+        return self.leases is None or (
+            subscription.key in self.held and self.leases.valid()
+        )
+
+    async def checkpoint(self):
+        """Периодическая запись накопленных изменений в хранилище."""
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                await asyncio.sleep(FLUSH_INTERVAL)
+                await loop.run_in_executor(self.executor, self.store.flush)
+        finally:
+            self.store.flush()
+
+    async def watch(self, subscription, delay):
+        """Бесконечный опрос одной подписки.
+
+        Получив аренду, процесс ждёт сохранённого прежним держателем
+        времени опроса, как poll_due(), а не опрашивает подписку сразу,
+        чтобы перехваченные подписки не опрашивались все разом.
+        """
+        loop = asyncio.get_running_loop()
+        await asyncio.sleep(delay)
+        leading = True
+        while True:
+            if not self.leader(subscription):
+                leading = False
+                await asyncio.sleep(self.leases.interval)
+                continue
+            if not leading:
+                wait = (subscription.due or 0) - time.time()
+                if wait > 0:
+                    await asyncio.sleep(min(wait, self.leases.interval))
+                    continue
+                leading = True
+            async with self.semaphore:
+                delay = await loop.run_in_executor(
+                    self.executor, profiling.PROFILER.run, self.poller.poll,
+                    subscription
+                )
+            self.polls += 1
+            await asyncio.sleep(delay)
+
+
+def main():
+    """Запуск движка для всех подписок из файла."""
+    if not homework.TELEGRAM_TOKEN:
+        raise exceptions.MissingTokenError(
+            homework.MISSING_TOKENS_ERROR_MESSAGE
+        )
+    subscriptions = load_subscriptions()
+    if not subscriptions:
+        homework.logger.critical(NO_SUBSCRIPTIONS_MESSAGE)
+        return
+    bot = telegram.Bot(
+        token=homework.TELEGRAM_TOKEN,
+        request=Request(con_pool_size=CONCURRENCY)
+    )
+    transport.install(transport.Transport(pool_size=CONCURRENCY))
+    store = storage.CheckpointStore()
+    restore_all(subscriptions, store)
+    profiling.PROFILER.install()
+    metrics.serve()
+    outbox = Outbox(bot).start()
+    cache = homework.status_cache()
+    timeline_store = timeline.TimelineStore()
+    listener = poller = None
+    try:
+        poller = homework.Poller(
+            bot, store, outbox=outbox, cache=cache, timeline=timeline_store
+        )
+        listener = homework.start_commands(
+            bot, cache, subscriptions, poller
+        )
+        membership = (
+            sharding.Membership() if sharding.COORDINATION_FILE else None
+        )
+        lease_manager = (
+            leases.LeaseManager() if leases.LEASE_FILE else None
+        )
+        asyncio.run(Engine(poller, leases=lease_manager).serve(
+            subscriptions, membership
+        ))
+    finally:
+        if listener is not None:
+            listener.stop()
+        homework.drain(outbox)
+        if poller is not None:
+            poller.close(subscriptions)
+        timeline_store.close()
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,30 @@
 class ResponseStatusCodeError(Exception):
-    pass
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
 
 
 class ResponseError(Exception):
-    pass
+    def __init__(self, message, key=None):
+        super().__init__(message)
+        self.key = key
 
 
 class MissingTokenError(Exception):
     pass
+
+
+class RateLimitError(ResponseStatusCodeError):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class OutboxFullError(Exception):
+    pass
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
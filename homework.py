@@ -1,30 +1,48 @@
+from collections import Counter
+from concurrent.futures import Future
+from functools import partial
+import itertools
 import logging
-from logging.handlers import RotatingFileHandler
 import os
 import sys
+import threading
 import time
+from urllib.parse import urlparse
 
 from dotenv import load_dotenv
-import requests
-import telegram
 
+import breaker
+import cassette
+import commands
+import conditional
+import diff
 import exceptions
+import leases
+import logs
+import metrics
+from outbox import deliver, Outbox
+import profiling
+from reporting import ErrorReporter
+import retry
+import scheduling
+import shutdown
+import startup
+import storage
+from subscriptions import Subscription
+import timeline
+
+PROFILE = startup.StartupProfile(startup.process_started())
+argparse = startup.lazy('argparse')
+requests = startup.lazy('requests')
+telegram = startup.lazy('telegram')
+transport = startup.lazy('transport')
 
 load_dotenv()
 
-logger = logging.getLogger(__name__)
+logger = logs.get_logger()
 logger.setLevel(logging.INFO)
-handler = logging.StreamHandler(stream=sys.stdout)
-handler_2 = RotatingFileHandler(
-    'my_logger.log', maxBytes=50000000, backupCount=5
-)
-logger.addHandler(handler)
-logger.addHandler(handler_2)
-formatter = logging.Formatter(
-    '%(asctime)s - %(name)s - функция: %(funcName)s '
-    '- номер строки: %(lineno)d - %(levelname)s - %(message)s'
-)
-handler.setFormatter(formatter)
+if not logger.handlers:
+    logs.configure(logger)
 
 PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
@@ -53,6 +71,10 @@ STATUS_CODE_EXCEPTION_MESSGAE = (
     'Параметры запроса к серверу: эндпоинт {url}, '
     'хедеры {headers}, параметры {params}'
 )
+RATE_LIMIT_EXCEPTION_MESSAGE = (
+    'Превышен лимит запросов к эндпоинту {url}, '
+    'повтор через {retry_after} с'
+)
 NOT_A_DICT_MESSAGE = 'Тип ответа от эндпоинта не словарь, а {type}'
 NOT_A_LIST_MESSAGE = 'Тип информации о домашних работах не список, а {type}'
 UNEXPECTED_HOMEWORK_STATUS_MESSAGE = (
@@ -63,7 +85,7 @@ RESPONSE_ERROR_MESSAGE = (
     'ошибка: {error}, хедеры: {headers}, параметры: {params}'
 )
 REQUEST_EXCEPTION_MESSAGE = (
-    'Произошел сбой сети: {error}'
+    'Произошел сбой сети: {error}. '
     'Параметры запроса к серверу: эндпоинт {url}, '
     'хедеры {headers}, параметры {params}'
 )
@@ -73,6 +95,18 @@ NO_TOKEN_MESSAGE = (
 )
 NO_HOMEWORK_KEY_MESSAGE = 'В ответе от эндпоинта не найдено ключа "homeworks"'
 ERROR_CODES = ('code', 'error')
+RATE_LIMIT_CODES = (429,)
+SERVER_ERROR = 500
+IMPORT_PHASE = 'запуск и импорт homework'
+TOKENS_PHASE = 'проверка токенов'
+TELEGRAM_PHASE = 'импорт telegram и бот'
+TRANSPORT_PHASE = 'импорт requests и транспорт'
+STORAGE_PHASE = 'хранилище и курсор'
+FIRST_POLL_PHASE = 'первый опрос'
+SHUTDOWN_MESSAGE = 'Получен сигнал {signal}, остановка после текущего опроса'
+SHUTDOWN_DROPPED_MESSAGE = (
+    'Не отправлено при остановке: {count}, статусы будут найдены снова'
+)
 MISSING_TOKENS_ERROR_MESSAGE = (
     'Отсутсвует обязательная(-ые) переменная(-ые) окружения'
 )
@@ -80,31 +114,116 @@ MISSING_TOKENS_ERROR_MESSAGE = (
 
 def send_message(bot, message):
     """Отправка сообщения ботом."""
+    return send_chat_message(bot, TELEGRAM_CHAT_ID, message)
+
+
+def send_chat_message(bot, chat_id, message):
+    """Отправка сообщения ботом в указанный чат."""
     try:
-        bot.send_message(
-            chat_id=TELEGRAM_CHAT_ID,
-            text=message
-        )
-        logger.info(SEND_INFO_MESSAGE.format(message=message))
+        deliver(bot, chat_id, message)
+        logger.info(logs.Message(SEND_INFO_MESSAGE, message=message))
         return True
+    except exceptions.CircuitOpenError as error:
+        logger.error(logs.Message(
+            SEND_EXCEPTION_MESSGAE, messgae=message, error=error
+        ))
+        return False
     except Exception as error:
-        logger.exception(SEND_EXCEPTION_MESSGAE.format(
-            messgae=message, error=error
+        logger.exception(logs.Message(
+            SEND_EXCEPTION_MESSGAE, messgae=message, error=error
         ))
         return False
 
 
+def log_delivery(message, future):
+    """Запись в лог результата отправки сообщения."""
+    error = future.exception()
+    if error is None:
+        logger.info(logs.Message(SEND_INFO_MESSAGE, message=message))
+    else:
+        logger.error(logs.Message(
+            SEND_EXCEPTION_MESSGAE, messgae=message, error=error
+        ))
+
+
 def get_api_answer(current_timestamp):
     """Получаем ответ от эндпоинта."""
+    return request_api_answer(current_timestamp, HEADERS)
+
+
+def request_api_answer(current_timestamp, headers):
+    """Получаем ответ от эндпоинта с заголовками конкретной подписки.
+
+    Временные сбои повторяются по политике retry.POLICY.
+    """
+    request_params = build_request_params(current_timestamp, headers)
+    return retry.POLICY.call(
+        lambda: decode_api_answer(
+            fetch_api_response(request_params), request_params
+        )
+    )
+
+
+def build_request_params(current_timestamp, headers):
+    """Параметры запроса к эндпоинту."""
     params = {'from_date': current_timestamp}
-    request_params = dict(url=ENDPOINT, headers=HEADERS, params=params)
+    return dict(url=ENDPOINT, headers=headers, params=params)
+
+
+@metrics.STAGE_SECONDS.time('get_api_answer')
+def fetch_api_response(request_params, stream=False):
+    """Запрос к эндпоинту без разбора тела ответа.
+
+    Сетевые сбои и ответы 5xx учитываются автоматом эндпоинта: пока он
+    разомкнут, запрос не выполняется и сразу бросается CircuitOpenError.
+    """
+    circuit = breaker.get(urlparse(request_params['url']).netloc)
+    circuit.check()
     try:
-        response = requests.get(**request_params)
+        response = transport.current().get(
+            timeout=transport.TIMEOUT, stream=stream, **request_params
+        )
 
     except requests.exceptions.RequestException as error:
-        raise ConnectionError(
+        circuit.record(False)
+        raise ConnectionError(REQUEST_EXCEPTION_MESSAGE.format(
             error=error,
             **request_params
+        )) from error
+
+    except BaseException:
+        circuit.record(False)
+        raise
+
+    circuit.record(response.status_code < SERVER_ERROR)
+
+    if response.status_code in RATE_LIMIT_CODES:
+        retry_after = scheduling.parse_retry_after(
+            response.headers.get('Retry-After')
+        )
+        raise exceptions.RateLimitError(
+            RATE_LIMIT_EXCEPTION_MESSAGE.format(
+                retry_after=retry_after, **request_params
+            ),
+            retry_after=retry_after
+        )
+    return response
+
+
+def decode_api_answer(response, request_params):
+    """Проверка кода возврата и разбор json ответа эндпоинта.
+
+    Код проверяется до разбора: на 502 и 503 прокси отдают html или
+    пустое тело, и такой ответ должен остаться ошибкой 5xx, а не
+    ошибкой разбора json.
+    """
+    if response.status_code != 200:
+        raise exceptions.ResponseStatusCodeError(
+            STATUS_CODE_EXCEPTION_MESSGAE.format(
+                status_code=response.status_code,
+                **request_params
+            ),
+            status_code=response.status_code
         )
 
     json_response = response.json()
@@ -116,20 +235,13 @@ def get_api_answer(current_timestamp):
                     key=code,
                     error=error,
                     **request_params
-                )
-            )
-
-    if response.status_code != 200:
-        raise exceptions.ResponseStatusCodeError(
-            STATUS_CODE_EXCEPTION_MESSGAE.format(
-                status_code=response.status_code,
-                **request_params
+                ),
+                key=code
             )
-        )
-
     return json_response
 
 
+@metrics.STAGE_SECONDS.time('check_response')
 def check_response(response):
     """Проверка ответа от эндпоинта на корректность."""
     if not isinstance(response, dict):
@@ -142,6 +254,7 @@ def check_response(response):
     return homeworks
 
 
+@metrics.STAGE_SECONDS.time('parse_status')
 def parse_status(homework):
     """Извлечение статуса о конкретной домашней работе."""
     name = homework['homework_name']
@@ -155,36 +268,417 @@ def parse_status(homework):
     )
 
 
+def fetch_all_homeworks(subscription):
+    """Полный список работ подписки без курсора, для команд бота."""
+    return check_response(request_api_answer(0, subscription.headers))
+
+
 def check_tokens():
     """Проверка доспутности всех переменных окружения."""
     tokens = [token for token in TOKEN_NAMES if globals()[token] is None]
     if tokens:
-        logger.critical(NO_TOKEN_MESSAGE.format(names=tokens))
+        logger.critical(logs.Message(NO_TOKEN_MESSAGE, names=tokens))
     return not tokens
 
 
-def main():
-    """Основная логика работы бота."""
-    current_timestamp = int(time.time())
-    if not check_tokens():
-        raise exceptions.MissingTokenError(MISSING_TOKENS_ERROR_MESSAGE)
-    bot = telegram.Bot(token=TELEGRAM_TOKEN)
-    while True:
+class Poller:
+    """Опрос эндпоинта и уведомления для подписок.
+
+    Состояние подписки меняет только поток опроса. Поток очереди
+    отправки лишь записывает под замком исходы доставки, а откат
+    недоставленных статусов выполняется в потоке опроса в settle().
+    """
+
+    def __init__(self, bot, store=None, reporter=None, scheduler=None,
+                 outbox=None, cache=None, timeline=None, clock=time.time,
+                 retry_policy=None):
+        """Бот, хранилище, учёт ошибок и расписание общие для подписок."""
+        self.bot = bot
+        self.clock = clock
+        self.retry_policy = retry_policy
+        self.store = store
+        self.outbox = outbox
+        self.cache = cache
+        self.timeline = timeline
+        self.counters = Counter()
+        self._cycles = itertools.count(1)
+        self._pending = {}
+        self._failed = {}
+        self._behind = set()
+        self._lock = threading.Lock()
+        self.reporter = reporter or ErrorReporter()
+        self.scheduler = scheduler or scheduling.AdaptiveScheduler(
+            base=RETRY_TIME
+        )
+
+    @metrics.STAGE_SECONDS.time('poll')
+    def poll(self, subscription):
+        """Один цикл опроса подписки, возвращает паузу до следующего.
+
+        Время следующего опроса сохраняется вместе с курсором, чтобы
+        после перезапуска подписка не опрашивалась раньше срока.
+        """
+        delay = self.cycle(subscription)
+        self.settle(subscription)
+        subscription.due = self.clock() + delay
+        if self.store is not None:
+            self.checkpoint(subscription)
+        if self.timeline is not None:
+            self.timeline.flush()
+        return delay
+
+    def cycle(self, subscription):
+        """Запрос, поиск смен статусов и уведомления; возвращает паузу."""
+        logs.subscription_id.set(subscription.key)
+        logs.cycle_id.set(next(self._cycles))
+        self.settle(subscription)
+        for summary in self.reporter.due(subscription.chat_id):
+            self.send(subscription.chat_id, summary)
+        self.scheduler.charge(subscription)
         try:
-            response = get_api_answer(current_timestamp)
-            homeworks = check_response(response)
-            if homeworks and send_message(bot, parse_status(homeworks[0])):
-                current_timestamp = response.get(
-                    'current_date', current_timestamp
-                )
+            current_date, homeworks, validators = self.fetch(subscription)
+            if self.cache is not None:
+                self.cache.update(subscription, homeworks)
+            changes = diff.transitions(subscription.statuses, homeworks)
+            from_date = subscription.timestamp
+            self.notify(subscription, changes, from_date)
+            subscription.timestamp = current_date or from_date
+            if validators is not None:
+                subscription.validators = validators
+
+        except exceptions.RateLimitError as error:
+            self.report(subscription, error)
+            return self.scheduler.after_error(
+                subscription, error.retry_after, rate_limited=True
+            )
+
+        except exceptions.CircuitOpenError as error:
+            self.count('circuit_open')
+            metrics.ERRORS.inc(type(error).__name__)
+            return self.scheduler.after_error(subscription, error.retry_after)
 
         except Exception as error:
-            message = MAIN_ERROR_MESSAGE.format(error=error)
-            logger.error(message)
-            send_message(bot, message)
+            subscription.validators = None
+            self.report(subscription, error)
+            return self.scheduler.after_error(subscription)
+
+        return self.scheduler.after_success(
+            subscription, bool(changes), current_date
+        )
+
+    def fetch(self, subscription):
+        """Метка времени сервера, работы и валидаторы ответа.
+
+        Временные сбои повторяются по политике повторов поллера, а без
+        неё — по общей retry.POLICY.
+        """
+        return (self.retry_policy or retry.POLICY).call(
+            self.fetch_once, subscription
+        )
+
+    def fetch_once(self, subscription):
+        """Одна попытка запроса для fetch().
+
+        Если ответ не изменился с прошлого опроса (304 или тот же хеш
+        тела), json не разбирается и не проверяется: работ нет, а
+        current_date берётся прямо из байтов тела.
+        """
+        request_params = build_request_params(
+            subscription.timestamp, {
+                **subscription.headers,
+                **conditional.request_headers(subscription.validators),
+            }
+        )
+        response = fetch_api_response(request_params)
+        validators = conditional.check(response, subscription.validators)
+        self.count('polls')
+        if validators is None:
+            self.count('fast_path')
+            return conditional.current_date(response.content), [], None
+        json_response = decode_api_answer(response, request_params)
+        homeworks = check_response(json_response)
+        return json_response.get('current_date'), homeworks, validators
+
+    def count(self, name):
+        """Увеличение счётчика поллера."""
+        with self._lock:
+            self.counters[name] += 1
+
+    def notify(self, subscription, changes, from_date):
+        """Отправка уведомлений о сменах статусов.
+
+        Статус считается отправленным сразу, чтобы следующий цикл не
+        повторил уведомление, пока оно в очереди. Если доставка не
+        удалась, статус откатывается, а курсор возвращается к from_date,
+        и смена будет найдена снова. Каждая работа разбирается отдельно:
+        работа с неожиданным статусом не мешает уведомить об остальных, а
+        её ошибка бросается после постановки их в очередь. В снимок
+        попадает интернированная строка статуса, а не копия из ответа.
+        """
+        messages, errors = [], []
+        for key, homework in changes:
+            try:
+                messages.append((key, homework, parse_status(homework)))
+            except (KeyError, ValueError) as error:
+                errors.append(error)
+        for key, homework, message in messages:
+            if self.timeline is not None:
+                self.timeline.record(subscription, key, homework)
+            status = sys.intern(homework['status'])
+            previous = subscription.statuses.get(key)
+            subscription.statuses[key] = status
+            with self._lock:
+                self._pending.setdefault(
+                    subscription.key, Counter()
+                )[from_date] += 1
+            self.send(subscription.chat_id, message).add_done_callback(
+                partial(
+                    self.delivered, subscription, key, status, previous,
+                    from_date
+                )
+            )
+        if errors:
+            raise errors[0]
+
+    def delivered(self, subscription, key, status, previous, from_date,
+                  future):
+        """Фиксация доставленного статуса или запись неудачи для отката.
+
+        Вызывается в потоке очереди отправки, поэтому состояние
+        подписки здесь не меняется: статус сохраняется только после
+        успешной доставки, а откат ждёт settle() в потоке опроса.
+        """
+        if future.exception() is None:
+            if self.store is not None:
+                self.store.save_status(subscription.key, key, status)
+            self._settled(subscription.key, from_date)
+            return
+        with self._lock:
+            self._failed.setdefault(subscription.key, []).append(
+                (key, status, previous, from_date)
+            )
+
+    def settle(self, subscription):
+        """Откат статусов и курсора недоставленных уведомлений."""
+        with self._lock:
+            failed = self._failed.pop(subscription.key, ())
+        for key, status, previous, from_date in failed:
+            subscription.validators = None
+            if subscription.statuses.get(key) == status:
+                if previous is None:
+                    subscription.statuses.pop(key, None)
+                else:
+                    subscription.statuses[key] = previous
+            subscription.timestamp = min(subscription.timestamp, from_date)
+            self._settled(subscription.key, from_date)
+
+    def _settled(self, subscription_key, from_date):
+        with self._lock:
+            pending = self._pending[subscription_key]
+            pending[from_date] -= 1
+            if not pending[from_date]:
+                del pending[from_date]
+            if not pending:
+                del self._pending[subscription_key]
+
+    def checkpoint(self, subscription):
+        """Запись курсора не дальше самого раннего недоставленного.
+
+        Пока уведомление в очереди, сохранённый курсор остаётся у его
+        from_date, так что после аварийной остановки смена будет
+        найдена и отправлена снова.
+        """
+        with self._lock:
+            pending = self._pending.get(subscription.key)
+            cursor = (
+                min(subscription.timestamp, *pending) if pending
+                else subscription.timestamp
+            )
+            if cursor == subscription.timestamp:
+                self._behind.discard(subscription.key)
+            else:
+                self._behind.add(subscription.key)
+        subscription.checkpoint(self.store, cursor)
+
+    def close(self, subscriptions):
+        """Откаты и курсоры подписок после остановки очереди отправки.
+
+        Записываются только подписки, чей курсор отстал из-за
+        уведомлений этого процесса, чтобы не затереть курсоры других
+        реплик.
+        """
+        for subscription in subscriptions:
+            with self._lock:
+                touched = subscription.key in (
+                    self._pending.keys() | self._failed.keys() | self._behind
+                )
+            if not touched:
+                continue
+            self.settle(subscription)
+            if self.store is not None:
+                self.checkpoint(subscription)
+
+    def send(self, chat_id, message):
+        """Отправка через очередь, а без неё сразу; возвращает future."""
+        if self.outbox is not None:
+            future = self.outbox.submit(chat_id, message)
+        else:
+            future = Future()
+            try:
+                deliver(self.bot, chat_id, message)
+                future.set_result(True)
+            except Exception as error:
+                future.set_exception(error)
+        future.add_done_callback(logs.bind(partial(log_delivery, message)))
+        return future
+
+    def report(self, subscription, error):
+        """Логирование ошибки и сообщение в чат, если оно не подавлено."""
+        message = MAIN_ERROR_MESSAGE.format(error=error)
+        logger.error(message)
+        metrics.ERRORS.inc(type(error).__name__)
+        if self.reporter.report(subscription.chat_id, error):
+            self.send(subscription.chat_id, message)
+
+
+def parse_args(argv=None):
+    """Параметры запуска бота."""
+    parser = argparse.ArgumentParser(description='Бот статусов домашних работ')
+    parser.add_argument(
+        '--profile-startup', action='store_true',
+        help='выполнить первый опрос, вывести время этапов запуска и выйти'
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Основная логика работы бота."""
+    args = parse_args(argv)
+    with PROFILE.phase(TOKENS_PHASE):
+        tokens_found = check_tokens()
+    if not tokens_found:
+        raise exceptions.MissingTokenError(MISSING_TOKENS_ERROR_MESSAGE)
+    with PROFILE.phase(TELEGRAM_PHASE):
+        bot = telegram.Bot(
+            token=TELEGRAM_TOKEN,
+            request=telegram.utils.request.Request(con_pool_size=4)
+        )
+    with PROFILE.phase(TRANSPORT_PHASE):
+        transport.install(transport.Transport(pool_size=1))
+    with PROFILE.phase(STORAGE_PHASE):
+        store = storage.CheckpointStore()
+        subscription = Subscription(PRACTICUM_TOKEN, TELEGRAM_CHAT_ID)
+        subscription.restore(store)
+    bot, recorder = start_recording(bot, subscription)
+    stop = shutdown.Shutdown().install()
+    retry.install(stop.sleep)
+    profiler = profiling.PROFILER.install()
+    lease_manager = leases.LeaseManager() if leases.LEASE_FILE else None
+    outbox = Outbox(bot).start()
+    cache = status_cache()
+    timeline_store = timeline.TimelineStore()
+    poller = Poller(
+        bot, store, outbox=outbox, cache=cache, timeline=timeline_store
+    )
+    listener = start_commands(bot, cache, [subscription], poller)
+    metrics.track_cursor_lag([subscription])
+    metrics.serve()
+    try:
+        if args.profile_startup:
+            with PROFILE.phase(FIRST_POLL_PHASE):
+                poller.poll(subscription)
+                store.flush()
+            print(PROFILE.report())
+            return
+        delay = 0
+        while not stop.sleep(delay):
+            delay = profiler.run(
+                poll_due, poller, subscription, store, lease_manager
+            )
+        logger.info(logs.Message(SHUTDOWN_MESSAGE, signal=stop.signal))
+    finally:
+        if listener is not None:
+            listener.stop()
+        if lease_manager is not None:
+            lease_manager.release()
+        drain(outbox)
+        poller.close([subscription])
+        timeline_store.close()
+        store.close()
+        if recorder is not None:
+            recorder.close()
+
+
+def poll_due(poller, subscription, store, lease_manager=None,
+             clock=time.time):
+    """Опрос подписки, если подошёл срок и аренда у этой реплики.
+
+    Возвращает паузу до следующей проверки. С арендой пауза не длиннее
+    интервала продления, иначе аренда истечёт во время сна. Пока аренды
+    нет, due сбрасывается; получив её, реплика сначала читает курсор,
+    статусы и срок опроса, сохранённые прежним держателем.
+    """
+    if lease_manager is not None:
+        if subscription.key not in lease_manager.sync([subscription.key]):
+            subscription.due = None
+            return lease_manager.interval
+        if subscription.due is None:
+            subscription.restore(store)
+    now = clock()
+    if subscription.due is None or subscription.due <= now:
+        poller.poll(subscription)
+        store.flush()
+        now = clock()
+    delay = subscription.due - now
+    if lease_manager is not None:
+        delay = min(delay, lease_manager.interval)
+    return max(0.0, delay)
+
+
+def start_recording(bot, subscription):
+    """Запись трафика в кассету, если задан CASSETTE_FILE.
+
+    Возвращает бота, записывающего отправки, и кассету или None.
+    """
+    if not cassette.CASSETTE_FILE:
+        return bot, None
+    recorder = cassette.Cassette()
+    recorder.state(subscription)
+    transport.install(
+        cassette.RecordingTransport(transport.current(), recorder)
+    )
+    return cassette.RecordingBot(bot, recorder), recorder
+
+
+def status_cache():
+    """Кэш статусов для команд или None, если команды выключены.
+
+    Без команд кэш никто не читает, и хранить в нём ответы на каждую
+    подписку незачем.
+    """
+    if not commands.BOT_COMMANDS:
+        return None
+    return commands.StatusCache(fetch_all_homeworks)
+
+
+def start_commands(bot, cache, subscriptions, poller):
+    """Запуск ответов на команды, если они включены в BOT_COMMANDS."""
+    if not commands.BOT_COMMANDS:
+        return None
+    return commands.CommandListener(
+        bot, cache, subscriptions, poller.send, HOMEWORK_VERDICTS
+    ).start()
+
+
+def drain(outbox, timeout=shutdown.SHUTDOWN_TIMEOUT):
+    """Отправка оставшихся сообщений при остановке не дольше timeout."""
+    dropped = outbox.stop(timeout)
+    if dropped:
+        logger.warning(logs.Message(SHUTDOWN_DROPPED_MESSAGE, count=dropped))
+    return dropped
+
 
-        finally:
-            time.sleep(RETRY_TIME)
+PROFILE.mark(IMPORT_PHASE, PROFILE.started)
 
 
 if __name__ == '__main__':
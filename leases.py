@@ -0,0 +1,91 @@
+import os
+import sqlite3
+import time
+
+from sharding import WORKER_ID
+
+LEASE_FILE = os.getenv('LEASE_FILE')
+LEASE_TTL = float(os.getenv('LEASE_TTL', 30))
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    epoch INTEGER NOT NULL
+) WITHOUT ROWID;
+'''
+
+
+class LeaseManager:
+    """Аренды подписок в общем файле SQLite.
+
+    Подписку опрашивает только держатель её аренды. sync() одной
+    транзакцией продлевает свои аренды и забирает свободные или
+    истёкшие, поэтому резервная реплика перехватывает подписку не позже
+    чем через ttl + interval после остановки ведущей. epoch растёт при
+    каждой смене держателя.
+    """
+
+    def __init__(self, path=LEASE_FILE, holder=WORKER_ID, ttl=LEASE_TTL,
+                 clock=time.time):
+        self.holder = holder
+        self.ttl = ttl
+        self.interval = ttl / 3
+        self.clock = clock
+        self.valid_until = 0.0
+        self.connection = sqlite3.connect(
+            path, timeout=self.interval, check_same_thread=False,
+            isolation_level=None
+        )
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(SCHEMA)
+
+    def sync(self, names):
+        """Продление и захват аренд, возвращает удерживаемые имена."""
+        now = self.clock()
+        with self.connection:
+            self.connection.execute('BEGIN IMMEDIATE')
+            self.connection.executemany(
+                'INSERT INTO leases (name, holder, expires_at, epoch) '
+                'VALUES (?, ?, ?, 1) ON CONFLICT (name) DO UPDATE SET '
+                'epoch = leases.epoch + (leases.holder != excluded.holder), '
+                'holder = excluded.holder, '
+                'expires_at = excluded.expires_at '
+                'WHERE leases.holder = excluded.holder '
+                'OR leases.expires_at < ?',
+                ((name, self.holder, now + self.ttl, now) for name in names)
+            )
+            held = {row[0] for row in self.connection.execute(
+                'SELECT name FROM leases WHERE holder = ?', (self.holder,)
+            )}
+        self.valid_until = now + self.ttl - self.interval
+        return held.intersection(names)
+
+    def valid(self):
+        """Не истекли ли аренды с последнего успешного sync()."""
+        return self.clock() < self.valid_until
+
+    def release(self):
+        """Освобождение своих аренд для немедленного перехвата."""
+        self.valid_until = 0.0
+        with self.connection:
+            self.connection.execute(
+                'UPDATE leases SET expires_at = 0 WHERE holder = ?',
+                (self.holder,)
+            )
+
+    def holders(self):
+        """Текущие держатели аренд: имя -> (держатель, epoch)."""
+        now = self.clock()
+        return {
+            name: (holder, epoch)
+            for name, holder, epoch in self.connection.execute(
+                'SELECT name, holder, epoch FROM leases '
+                'WHERE expires_at >= ?', (now,)
+            )
+        }
+
+    def close(self):
+        """Закрытие файла аренд."""
+        self.connection.close()
@@ -0,0 +1,142 @@
+import atexit
+import contextvars
+import json
+import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+import os
+import queue
+import sys
+
+LOG_FILE = os.getenv('LOG_FILE', 'my_logger.log')
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+LOG_MAX_BYTES = 50000000
+LOG_BACKUP_COUNT = 5
+LOGGER_NAME = 'homework'
+
+TEXT_FORMAT = (
+    '%(asctime)s - %(name)s - функция: %(funcName)s '
+    '- номер строки: %(lineno)d - %(levelname)s - %(message)s'
+)
+
+subscription_id = contextvars.ContextVar('subscription_id', default=None)
+cycle_id = contextvars.ContextVar('cycle_id', default=None)
+
+
+def get_logger(name=None):
+    """Логгер бота или его модуля name.
+
+    Имя фиксировано, а не __name__: при запуске python homework.py
+    модуль называется __main__, и логгеры модулей не попали бы в
+    обработчики, подключённые configure().
+    """
+    return logging.getLogger(
+        LOGGER_NAME if name is None else f'{LOGGER_NAME}.{name}'
+    )
+
+
+class Message:
+    """Сообщение лога, которое форматируется только при записи."""
+
+    __slots__ = ('template', 'kwargs')
+
+    def __init__(self, template, **kwargs):
+        self.template = template
+        self.kwargs = kwargs
+
+    def __str__(self):
+        return self.template.format(**self.kwargs)
+
+
+def bind(callback):
+    """Колбэк, который выполнится в текущем контексте логирования."""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.run(callback, *args, **kwargs)
+    return run
+
+
+class ContextFilter(logging.Filter):
+    """Добавление id подписки и цикла опроса в запись лога."""
+
+    def filter(self, record):
+        """Запись контекста в атрибуты записи."""
+        record.subscription = subscription_id.get()
+        record.cycle = cycle_id.get()
+        return True
+
+
+class BoundedQueueHandler(QueueHandler):
+    """Передача записей в фоновый поток через ограниченную очередь.
+
+    Запись не форматируется в вызывающем потоке: это делает поток
+    QueueListener. Если очередь заполнена, запись отбрасывается и
+    учитывается в dropped, а поток опроса не ждёт.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        """Запись передаётся без предварительного форматирования."""
+        return record
+
+    def enqueue(self, record):
+        """Неблокирующая постановка записи в очередь."""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """Запись лога одной json-строкой."""
+
+    def format(self, record):
+        """Сериализация записи с контекстом подписки и цикла."""
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'function': record.funcName,
+            'line': record.lineno,
+            'message': record.getMessage(),
+            'subscription': getattr(record, 'subscription', None),
+            'cycle': getattr(record, 'cycle', None),
+        }
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def shutdown(listener):
+    """Запись оставшихся в очереди сообщений и остановка потока."""
+    if listener._thread is not None:
+        listener.stop()
+
+
+def configure(logger, path=LOG_FILE, stream=sys.stdout,
+              log_format=LOG_FORMAT, maxsize=LOG_QUEUE_SIZE):
+    """Подключение к логгеру фоновой записи в stdout и файл."""
+    formatter = (
+        JsonFormatter() if log_format == 'json'
+        else logging.Formatter(TEXT_FORMAT)
+    )
+    handlers = [logging.StreamHandler(stream=stream)]
+    if path:
+        handlers.append(RotatingFileHandler(
+            path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT,
+            delay=True
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    log_queue = queue.Queue(maxsize)
+    queue_handler = BoundedQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+    listener = QueueListener(log_queue, *handlers)
+    listener.start()
+    atexit.register(shutdown, listener)
+    logger.addHandler(queue_handler)
+    return queue_handler, listener
@@ -0,0 +1,249 @@
+from bisect import bisect_left
+from functools import wraps
+import os
+import threading
+import time
+
+import exceptions
+import startup
+
+http_server = startup.lazy('http.server')
+
+METRICS_PORT = os.getenv('METRICS_PORT')
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+LATENCY_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30,
+)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def format_labels(labels):
+    """Метки в формате Prometheus."""
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(
+            name, str(value).replace('\\', '\\\\').replace('"', '\\"')
+        )
+        for name, value in labels
+    )
+    return '{' + pairs + '}'
+
+
+class _HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum', 'lock')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ('child', 'started')
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.child.observe(time.perf_counter() - self.started)
+
+
+class Histogram:
+    """Гистограмма длительностей с одной меткой."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, label, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, value):
+        """Гистограмма для значения метки."""
+        child = self._children.get(value)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(
+                    value, _HistogramChild(self.buckets)
+                )
+        return child
+
+    def time(self, value):
+        """Декоратор, замеряющий длительность вызовов функции."""
+        child = self.labels(value)
+
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with child.time():
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def samples(self):
+        """Строки сэмплов для экспозиции."""
+        for value, child in sorted(self._children.items()):
+            with child.lock:
+                counts = list(child.counts)
+                total = child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                labels = format_labels(((self.label, value), ('le', bound)))
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = format_labels(((self.label, value),))
+            yield f'{self.name}_sum{labels} {total}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+class Counter:
+    """Счётчик с одной меткой."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, label, values=()):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self._values = dict.fromkeys(values, 0)
+        self._lock = threading.Lock()
+
+    def inc(self, value, amount=1):
+        """Увеличение счётчика для значения метки."""
+        with self._lock:
+            self._values[value] = self._values.get(value, 0) + amount
+
+    def samples(self):
+        """Строки сэмплов для экспозиции."""
+        with self._lock:
+            values = sorted(self._values.items())
+        for value, count in values:
+            labels = format_labels(((self.label, value),))
+            yield f'{self.name}_total{labels} {count}'
+
+
+class Gauge:
+    """Показатель, который вычисляется при каждом запросе метрик."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, function=None):
+        self.name = name
+        self.documentation = documentation
+        self.function = function
+
+    def set_function(self, function):
+        """Функция значения: число или словарь {метки: число}."""
+        self.function = function
+
+    def samples(self):
+        """Строки сэмплов для экспозиции."""
+        if self.function is None:
+            return
+        value = self.function()
+        if isinstance(value, dict):
+            for labels, number in sorted(value.items()):
+                yield f'{self.name}{format_labels(labels)} {number}'
+        elif value is not None:
+            yield f'{self.name} {value}'
+
+
+class Registry:
+    """Набор метрик для экспозиции в текстовом формате Prometheus."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        """Добавление метрики."""
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'homework_stage_seconds',
+    'Длительность этапов опроса: запрос, проверка, разбор, отправка',
+    'stage'
+))
+ERRORS = REGISTRY.register(Counter(
+    'homework_errors', 'Исключения по классам', 'exception', values=[
+        name for name, value in vars(exceptions).items()
+        if isinstance(value, type) and issubclass(value, Exception)
+    ]
+))
+CURSOR_LAG = REGISTRY.register(Gauge(
+    'homework_cursor_lag_seconds',
+    'Отставание самого старого курсора from_date от текущего времени'
+))
+
+
+def track_cursor_lag(subscriptions):
+    """Отставание курсоров подписок в CURSOR_LAG."""
+    CURSOR_LAG.set_function(lambda: time.time() - min(
+        (subscription.timestamp for subscription in subscriptions),
+        default=time.time()
+    ))
+
+
+def handler_class(registry=REGISTRY):
+    """Обработчик /metrics; http.server загружается только здесь."""
+
+    class MetricsHandler(http_server.BaseHTTPRequestHandler):
+        """Отдача /metrics."""
+
+        def do_GET(self):
+            """Ответ на GET /metrics."""
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            """Запросы к метрикам не логируются."""
+
+    return MetricsHandler
+
+
+def serve(port=METRICS_PORT, host=METRICS_HOST):
+    """Запуск HTTP-сервера метрик в фоновом потоке, если задан порт."""
+    if port in (None, ''):
+        return None
+    server = http_server.ThreadingHTTPServer(
+        (host, int(port)), handler_class()
+    )
+    threading.Thread(
+        target=server.serve_forever, name='metrics', daemon=True
+    ).start()
+    return server
@@ -0,0 +1,230 @@
+from concurrent.futures import Future
+import heapq
+import itertools
+import os
+import threading
+import time
+
+import breaker
+import exceptions
+import metrics
+from reporting import TokenBucket
+import startup
+
+telegram = startup.lazy('telegram')
+
+GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', 30))
+CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', 1))
+OUTBOX_SIZE = int(os.getenv('OUTBOX_SIZE', 10000))
+MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 5))
+RETRY_DELAY = 1.0
+RESCHEDULE_TOLERANCE = 0.001
+SEND_SECONDS = metrics.STAGE_SECONDS.labels('send_message')
+
+OUTBOX_FULL_MESSAGE = 'Очередь отправки переполнена: {size} сообщений'
+OUTBOX_STOPPED_MESSAGE = 'Очередь отправки остановлена'
+
+
+def is_outage(error):
+    """Говорит ли ошибка отправки о недоступности Telegram."""
+    return not isinstance(error, (
+        telegram.error.BadRequest, telegram.error.RetryAfter,
+        telegram.error.Unauthorized
+    ))
+
+
+def deliver(bot, chat_id, text):
+    """Отправка сообщения через автомат Telegram; ошибки бросаются.
+
+    Пока автомат разомкнут, сразу бросается CircuitOpenError, иначе
+    результат отправки учитывается автоматом по is_outage().
+    """
+    circuit = breaker.get(breaker.TELEGRAM)
+    circuit.check()
+    try:
+        with SEND_SECONDS.time():
+            bot.send_message(chat_id=chat_id, text=text)
+    except Exception as error:
+        circuit.record(not is_outage(error))
+        raise
+    circuit.success()
+
+
+class _Item:
+    __slots__ = ('chat_id', 'text', 'future', 'attempts')
+
+    def __init__(self, chat_id, text):
+        self.chat_id = chat_id
+        self.text = text
+        self.future = Future()
+        self.attempts = 0
+
+
+class Outbox:
+    """Очередь исходящих сообщений Telegram с ограничением скорости.
+
+    Сообщения отправляет отдельный поток: не чаще GLOBAL_RATE в
+    секунду на бота и CHAT_RATE в секунду на чат, как требуют лимиты
+    Telegram. Очередь упорядочена по времени готовности, поэтому
+    упёршийся в лимит чат не задерживает остальные. RetryAfter
+    откладывает чат на указанное сервером время, сетевые сбои
+    повторяются до MAX_ATTEMPTS раз. submit() не блокирует: при
+    переполнении очереди future сразу завершается OutboxFullError.
+    """
+
+    def __init__(self, bot, global_rate=GLOBAL_RATE, chat_rate=CHAT_RATE,
+                 maxsize=OUTBOX_SIZE, max_attempts=MAX_ATTEMPTS,
+                 clock=time.monotonic):
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.maxsize = maxsize
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self._bucket = TokenBucket(max(global_rate, 1), global_rate, clock())
+        self._chats = {}
+        self._heap = []
+        self._order = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self.counters = {
+            'submitted': 0, 'sent': 0, 'failed': 0,
+            'rejected': 0, 'retry_after': 0, 'retried': 0,
+            'circuit_open': 0,
+        }
+
+    def start(self):
+        """Запуск потока отправки."""
+        self._thread = threading.Thread(
+            target=self._run, name='outbox', daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def submit(self, chat_id, text):
+        """Постановка сообщения в очередь, возвращает future."""
+        item = _Item(chat_id, text)
+        with self._condition:
+            if self._stopping:
+                item.future.set_exception(
+                    exceptions.OutboxFullError(OUTBOX_STOPPED_MESSAGE)
+                )
+            elif len(self._heap) >= self.maxsize:
+                self.counters['rejected'] += 1
+                item.future.set_exception(exceptions.OutboxFullError(
+                    OUTBOX_FULL_MESSAGE.format(size=len(self._heap))
+                ))
+            else:
+                self.counters['submitted'] += 1
+                self._push(self.clock(), item)
+        return item.future
+
+    def pending(self):
+        """Число сообщений в очереди."""
+        with self._condition:
+            return len(self._heap)
+
+    def stats(self):
+        """Счётчики отправки и размер очереди."""
+        with self._condition:
+            return {**self.counters, 'pending': len(self._heap)}
+
+    def stop(self, timeout=None):
+        """Отправка оставшихся сообщений не дольше timeout секунд.
+
+        Не отправленные за это время сообщения завершаются
+        OutboxFullError. Возвращает число таких сообщений.
+        """
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        with self._condition:
+            dropped, self._heap = self._heap, []
+            self._condition.notify()
+        for _, _, item in dropped:
+            item.future.set_exception(
+                exceptions.OutboxFullError(OUTBOX_STOPPED_MESSAGE)
+            )
+        return len(dropped)
+
+    def _push(self, ready, item):
+        heapq.heappush(self._heap, (ready, next(self._order), item))
+        self._condition.notify()
+
+    def _chat_bucket(self, chat_id, now):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = TokenBucket(1, self.chat_rate, now)
+        return bucket
+
+    def _next(self):
+        with self._condition:
+            while True:
+                if not self._heap:
+                    if self._stopping:
+                        return None
+                    self._condition.wait()
+                    continue
+                now = self.clock()
+                ready, _, item = self._heap[0]
+                chat = self._chat_bucket(item.chat_id, now)
+                wait = max(
+                    ready - now, chat.wait(now), self._bucket.wait(now)
+                )
+                if wait <= 0:
+                    heapq.heappop(self._heap)
+                    chat.take(now)
+                    self._bucket.take(now)
+                    return item
+                if ready < now + wait - RESCHEDULE_TOLERANCE:
+                    heapq.heapreplace(
+                        self._heap, (now + wait, next(self._order), item)
+                    )
+                    continue
+                self._condition.wait(wait)
+
+    def _run(self):
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            self._send(item)
+
+    def _send(self, item):
+        try:
+            deliver(self.bot, item.chat_id, item.text)
+        except exceptions.CircuitOpenError as error:
+            self._retry(item, error.retry_after, 'circuit_open')
+        except telegram.error.RetryAfter as error:
+            self._retry(item, error.retry_after, 'retry_after')
+        except (telegram.error.BadRequest,
+                telegram.error.Unauthorized) as error:
+            self._fail(item, error)
+        except telegram.error.NetworkError as error:
+            item.attempts += 1
+            if item.attempts >= self.max_attempts:
+                self._fail(item, error)
+            else:
+                self._retry(
+                    item, RETRY_DELAY * 2 ** (item.attempts - 1), 'retried'
+                )
+        except Exception as error:
+            self._fail(item, error)
+        else:
+            with self._condition:
+                self.counters['sent'] += 1
+            item.future.set_result(True)
+
+    def _retry(self, item, delay, counter):
+        with self._condition:
+            self.counters[counter] += 1
+            now = self.clock()
+            self._chat_bucket(item.chat_id, now).defer(delay, now)
+            self._push(now + delay, item)
+
+    def _fail(self, item, error):
+        with self._condition:
+            self.counters['failed'] += 1
+        item.future.set_exception(error)
@@ -0,0 +1,251 @@
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+
+import logs
+import startup
+
+cProfile = startup.lazy('cProfile')
+pstats = startup.lazy('pstats')
+tracemalloc = startup.lazy('tracemalloc')
+
+PROFILE_DIR = os.getenv('PROFILE_DIR')
+TRACEMALLOC_FRAMES = int(os.getenv('PROFILE_TRACEMALLOC_FRAMES', 25))
+TOP_ALLOCATIONS = 50
+CONCURRENT_PROFILES = sys.version_info < (3, 12)
+
+PROFILE_SIGNAL = signal.SIGUSR1
+MEMORY_SIGNAL = signal.SIGUSR2
+STACKS_SIGNAL = signal.SIGQUIT
+
+PROFILE_REQUESTED_MESSAGE = (
+    'Профилирование {state} с началом следующей итерации опроса'
+)
+PROFILE_WRITTEN_MESSAGE = 'Профиль cProfile записан в {path}'
+TRACEMALLOC_STARTED_MESSAGE = (
+    'Трассировка выделений памяти включена, глубина стека {frames}'
+)
+TRACEMALLOC_WRITTEN_MESSAGE = (
+    'Снимок tracemalloc записан в {path}, сводка в {summary}'
+)
+STACKS_WRITTEN_MESSAGE = 'Стеки {count} потоков записаны в {path}'
+THREAD_HEADER = 'Поток {name} (id {ident}{daemon}):'
+ALLOCATION_LINE = '{size} Б в {count} блоках: {where}'
+
+logger = logs.get_logger('profiling')
+
+
+class ProfileSession:
+    """Один сеанс cProfile со своим профилем на каждый поток.
+
+    cProfile следит только за потоком, в котором включён, поэтому
+    каждый поток пула получает свой профиль, а при записи они
+    складываются в один pstats-файл. Начиная с Python 3.12 cProfile
+    работает через sys.monitoring, и одновременно может быть включён
+    только один профиль: тогда итерации, начатые, пока профиль занят
+    другим потоком, выполняются без профилирования. Файл пишется, когда
+    сеанс остановлен и закончилась последняя начатая в нём итерация.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._profiles = []
+        self._active = 0
+        self._stopped = False
+        self._written = False
+        self._lock = threading.Lock()
+        self._exclusive = threading.Lock()
+
+    def run(self, function, *args):
+        """function(*args) под профилем текущего потока, если можно."""
+        if CONCURRENT_PROFILES:
+            return self._run(function, *args)
+        if not self._exclusive.acquire(blocking=False):
+            return function(*args)
+        try:
+            return self._run(function, *args)
+        finally:
+            self._exclusive.release()
+
+    def _run(self, function, *args):
+        profile = getattr(self._local, 'profile', None)
+        if profile is None:
+            profile = self._local.profile = cProfile.Profile()
+            with self._lock:
+                self._profiles.append(profile)
+        with self._lock:
+            self._active += 1
+        try:
+            return profile.runcall(function, *args)
+        finally:
+            with self._lock:
+                self._active -= 1
+            self._finish()
+
+    def stop(self):
+        """Остановка сеанса; файл пишется после текущих итераций."""
+        with self._lock:
+            self._stopped = True
+        self._finish()
+
+    def _finish(self):
+        with self._lock:
+            if self._written or not self._stopped or self._active:
+                return
+            self._written = True
+            profiles = list(self._profiles)
+        if not profiles:
+            return
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        stats.dump_stats(self.path)
+        logger.warning(logs.Message(PROFILE_WRITTEN_MESSAGE, path=self.path))
+
+
+class Profiler:
+    """Профилирование работающего процесса по сигналам.
+
+    Сигналы ставятся, только если задан PROFILE_DIR: SIGUSR1 включает
+    и выключает cProfile вокруг итераций опроса, SIGUSR2 включает
+    трассировку выделений памяти, а повторный SIGUSR2 пишет снимок
+    tracemalloc с блоками, выделенными и не освобождёнными с момента
+    включения, SIGQUIT пишет стеки всех потоков. Обработчик сигнала
+    только пишет его номер в канал, а логирование и запись файлов
+    выполняет отдельный поток: обработчик, прервавший главный поток
+    посреди записи в лог, не должен ждать замка очереди логов. Пока
+    профилирование выключено, run() только сравнивает два флага.
+    """
+
+    def __init__(self, directory=PROFILE_DIR, frames=TRACEMALLOC_FRAMES,
+                 clock=time.time):
+        self.directory = directory
+        self.frames = frames
+        self.clock = clock
+        self.wanted = False
+        self.session = None
+        self._lock = threading.Lock()
+        self._requests = None
+
+    def install(self):
+        """Установка обработчиков сигналов; только в главном потоке."""
+        if not self.directory:
+            return self
+        os.makedirs(self.directory, exist_ok=True)
+        reader, self._requests = os.pipe()
+        os.set_blocking(self._requests, False)
+        threading.Thread(
+            target=self._serve, args=(reader,), name='profiler', daemon=True
+        ).start()
+        for signum in (PROFILE_SIGNAL, MEMORY_SIGNAL, STACKS_SIGNAL):
+            signal.signal(signum, self._request)
+        return self
+
+    def _request(self, signum, frame):
+        try:
+            os.write(self._requests, bytes([signum]))
+        except BlockingIOError:
+            pass
+
+    def _serve(self, reader):
+        actions = {
+            PROFILE_SIGNAL: self.toggle_profile,
+            MEMORY_SIGNAL: self.toggle_tracemalloc,
+            STACKS_SIGNAL: self.dump_stacks,
+        }
+        while True:
+            for signum in os.read(reader, 64):
+                actions[signum]()
+
+    def run(self, function, *args):
+        """Итерация опроса function(*args), под cProfile, если он включён.
+
+        Включение и выключение по сигналу применяются на границе
+        итераций, чтобы профиль содержал их целиком.
+        """
+        if self.wanted != (self.session is not None):
+            self._switch()
+        session = self.session
+        if session is None:
+            return function(*args)
+        return session.run(function, *args)
+
+    def toggle_profile(self, signum=None, frame=None):
+        """Запрос включения или выключения cProfile."""
+        self.wanted = not self.wanted
+        logger.warning(logs.Message(
+            PROFILE_REQUESTED_MESSAGE,
+            state='включится' if self.wanted else 'выключится'
+        ))
+
+    def _switch(self):
+        with self._lock:
+            if self.wanted and self.session is None:
+                self.session = ProfileSession(self.path('profile', 'pstats'))
+                return
+            session, self.session = self.session, None
+        if session is not None:
+            session.stop()
+
+    def toggle_tracemalloc(self, signum=None, frame=None):
+        """Включение трассировки или снимок с её выключением.
+
+        Возвращает путь к снимку или None, если трассировка включена.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            logger.warning(logs.Message(
+                TRACEMALLOC_STARTED_MESSAGE, frames=self.frames
+            ))
+            return None
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        path = self.path('tracemalloc', 'snapshot')
+        snapshot.dump(path)
+        summary = self.path('tracemalloc', 'txt')
+        with open(summary, 'w', encoding='utf-8') as file:
+            for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]:
+                file.write(ALLOCATION_LINE.format(
+                    size=stat.size, count=stat.count,
+                    where=stat.traceback[0]
+                ) + '\n')
+        logger.warning(logs.Message(
+            TRACEMALLOC_WRITTEN_MESSAGE, path=path, summary=summary
+        ))
+        return path
+
+    def dump_stacks(self, signum=None, frame=None):
+        """Запись стеков всех потоков; возвращает путь к файлу."""
+        frames = sys._current_frames()
+        path = self.path('stacks', 'txt')
+        count = 0
+        with open(path, 'w', encoding='utf-8') as file:
+            for thread in threading.enumerate():
+                stack = frames.get(thread.ident)
+                if stack is None:
+                    continue
+                count += 1
+                file.write(THREAD_HEADER.format(
+                    name=thread.name, ident=thread.ident,
+                    daemon=', daemon' if thread.daemon else ''
+                ) + '\n')
+                file.writelines(traceback.format_stack(stack))
+                file.write('\n')
+        logger.warning(logs.Message(
+            STACKS_WRITTEN_MESSAGE, count=count, path=path
+        ))
+        return path
+
+    def path(self, kind, suffix):
+        """Имя файла результата с pid и временем в миллисекундах."""
+        return os.path.join(
+            self.directory,
+            f'{kind}-{os.getpid()}-{int(self.clock() * 1000)}.{suffix}'
+        )
+
+
+PROFILER = Profiler()
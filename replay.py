@@ -0,0 +1,141 @@
+import argparse
+import random
+import time
+
+import breaker
+import cassette
+from clock import VirtualClock
+import homework
+import logs
+from reporting import ErrorReporter
+import retry
+import scheduling
+from subscriptions import Subscription
+import transport
+
+REPLAY_TOKEN = 'replay'
+
+REPLAY_REPORT_MESSAGE = (
+    'Воспроизведение: опросов {polls}, сообщений {sent} из {expected}, '
+    'расхождений {mismatches}, {seconds:.2f} с вместо '
+    '{recorded_seconds:.2f} с (x{speedup:.1f})'
+)
+REPLAY_MISMATCH_MESSAGE = (
+    'Сообщение {index}: ожидалось {expected!r}, отправлено {sent!r}'
+)
+
+
+def mismatches(expected, sent):
+    """Номера сообщений, отличающихся от записанных."""
+    return [
+        index for index in range(max(len(expected), len(sent)))
+        if index >= len(expected) or index >= len(sent)
+        or expected[index] != sent[index]
+    ]
+
+
+def replay(events, speed=1.0, sleep=time.sleep, clock=time.monotonic):
+    """Прогон кассеты через цикл опроса бота без сети.
+
+    Ответы эндпоинта проходят настоящие check_response, parse_status и
+    отправку; опросы идут с записанными интервалами, сжатыми в speed
+    раз, а при speed=0 — подряд, пока в кассете есть ответы. Повторы
+    внутри одного опроса идут без пауз и забирают следующие записанные
+    ответы. Автоматы отключения, подавление ошибок, бюджет повторов и
+    расписание считают время по виртуальным часам, которые идут по
+    записанным t, поэтому прогон не зависит от speed. Если опрос не
+    забрал ни одного ответа (например, автомат разомкнут), виртуальное
+    время сдвигается к следующему опросу по расписанию. Возвращает
+    отчёт со сравнением отправленных сообщений с записанными.
+    """
+    responses = [
+        event for event in events if event['kind'] == cassette.HTTP
+    ]
+    expected = [
+        (event['chat_id'], event['text']) for event in events
+        if event['kind'] == cassette.TELEGRAM
+    ]
+    state = next(
+        (event for event in events if event['kind'] == cassette.STATE),
+        {'timestamp': 0, 'statuses': []}
+    )
+    subscription = Subscription(
+        REPLAY_TOKEN, expected[0][0] if expected else None,
+        timestamp=state['timestamp'], statuses=dict(state['statuses'])
+    )
+    virtual = VirtualClock()
+    bot = cassette.ReplayBot(events, speed, sleep)
+    poller = homework.Poller(
+        bot,
+        reporter=ErrorReporter(clock=virtual.monotonic),
+        scheduler=scheduling.AdaptiveScheduler(
+            clock=scheduling.ServerClock(virtual.monotonic, virtual.time),
+            rng=random.Random(0)
+        ),
+        clock=virtual.time,
+        retry_policy=retry.RetryPolicy(
+            budget=retry.RetryBudget(clock=virtual.monotonic),
+            sleep=virtual.sleep, rng=random.Random(0)
+        )
+    )
+    player = cassette.ReplayTransport(events, speed, sleep)
+    previous = transport.current()
+    transport.install(player)
+    breaker.reset(virtual.monotonic)
+    polls = 0
+    started = clock()
+    try:
+        while player.peek() is not None:
+            virtual.advance(player.peek()['t'] - virtual.now)
+            if speed:
+                sleep(max(
+                    0.0, started + player.peek()['t'] / speed - clock()
+                ))
+            position = player.position
+            poller.poll(subscription)
+            polls += 1
+            if player.position == position:
+                virtual.advance(subscription.due - virtual.now)
+    finally:
+        transport.install(previous)
+        breaker.reset()
+    seconds = clock() - started
+    recorded = (
+        responses[-1]['t'] - responses[0]['t'] if responses else 0.0
+    )
+    different = mismatches(expected, bot.sent)
+    for index in different:
+        homework.logger.warning(logs.Message(
+            REPLAY_MISMATCH_MESSAGE, index=index,
+            expected=expected[index] if index < len(expected) else None,
+            sent=bot.sent[index] if index < len(bot.sent) else None
+        ))
+    return {
+        'polls': polls,
+        'sent': len(bot.sent),
+        'expected': len(expected),
+        'mismatches': len(different),
+        'seconds': seconds,
+        'recorded_seconds': recorded,
+        'speedup': recorded / seconds if seconds else 0.0,
+    }
+
+
+def main(argv=None):
+    """Воспроизведение кассеты из командной строки."""
+    parser = argparse.ArgumentParser(
+        description='Воспроизведение записанного трафика бота'
+    )
+    parser.add_argument('cassette')
+    parser.add_argument(
+        '--speed', type=float, default=1.0,
+        help='во сколько раз быстрее записи; 0 — без пауз'
+    )
+    args = parser.parse_args(argv)
+    report = replay(cassette.load(args.cassette), args.speed)
+    homework.logger.info(logs.Message(REPLAY_REPORT_MESSAGE, **report))
+    return 1 if report['mismatches'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
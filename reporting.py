@@ -0,0 +1,159 @@
+import os
+import re
+import threading
+import time
+
+ERROR_WINDOW = float(os.getenv('ERROR_WINDOW', 3600))
+ERROR_BURST = int(os.getenv('ERROR_BURST', 3))
+ERROR_RATE = float(os.getenv('ERROR_RATE', 1 / 600))
+
+SUPPRESSED_MESSAGE = (
+    'Похожих ошибок подавлено: {count} за {minutes} мин. '
+    'Последняя: {error}'
+)
+
+VOLATILE = re.compile(
+    r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'
+    r'|0x[0-9a-f]+|\b[0-9a-f]{16,}\b|\d+',
+    re.IGNORECASE
+)
+
+
+def fingerprint(error):
+    """Отпечаток ошибки: тип и текст без изменчивых чисел и id."""
+    return type(error).__name__, VOLATILE.sub('#', str(error))
+
+
+class TokenBucket:
+    """Корзина токенов: burst сообщений сразу, дальше rate в секунду."""
+
+    __slots__ = ('capacity', 'rate', 'tokens', 'updated')
+
+    def __init__(self, capacity, rate, now):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now):
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+
+    def take(self, now):
+        """Забрать токен, если он есть."""
+        self._refill(now)
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def put(self, amount, now):
+        """Вернуть amount токенов, не больше ёмкости."""
+        self._refill(now)
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def wait(self, now):
+        """Секунды до появления целого токена."""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        if not self.rate:
+            return float('inf')
+        return (1 - self.tokens) / self.rate
+
+    def defer(self, seconds, now):
+        """Не выдавать токены ближайшие seconds секунд."""
+        self._refill(now)
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+
+class _Window:
+    __slots__ = ('opened', 'suppressed', 'last_error')
+
+    def __init__(self, opened):
+        self.opened = opened
+        self.suppressed = 0
+        self.last_error = None
+
+
+class ErrorReporter:
+    """Подавление шторма одинаковых сообщений об ошибках в чат.
+
+    Первая ошибка с новым отпечатком в окне отправляется (если в
+    корзине чата есть токен), повторы в пределах окна только считаются.
+    После закрытия окна due() отдаёт сводку о подавленных ошибках.
+    """
+
+    def __init__(self, window=ERROR_WINDOW, burst=ERROR_BURST,
+                 rate=ERROR_RATE, clock=time.monotonic):
+        self.window = window
+        self.burst = burst
+        self.rate = rate
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._windows = {}
+        self._closed = {}
+        self._buckets = {}
+        self.counters = {'reported': 0, 'suppressed': 0, 'rate_limited': 0}
+        self.by_fingerprint = {}
+
+    def report(self, chat_id, error):
+        """Учёт ошибки, True если о ней нужно написать в чат."""
+        now = self.clock()
+        key = fingerprint(error)
+        with self._lock:
+            self.by_fingerprint[key] = self.by_fingerprint.get(key, 0) + 1
+            windows = self._windows.setdefault(chat_id, {})
+            window = windows.get(key)
+            if window is not None and now - window.opened < self.window:
+                return self._suppress(window, error, 'suppressed')
+            if window is not None:
+                self._close(chat_id, window)
+            window = windows[key] = _Window(now)
+            bucket = self._buckets.get(chat_id)
+            if bucket is None:
+                bucket = self._buckets[chat_id] = TokenBucket(
+                    self.burst, self.rate, now
+                )
+            if not bucket.take(now):
+                return self._suppress(window, error, 'rate_limited')
+            self.counters['reported'] += 1
+            return True
+
+    def _suppress(self, window, error, counter):
+        window.suppressed += 1
+        window.last_error = error
+        self.counters[counter] += 1
+        return False
+
+    def _close(self, chat_id, window):
+        if window.suppressed:
+            self._closed.setdefault(chat_id, []).append(
+                SUPPRESSED_MESSAGE.format(
+                    count=window.suppressed,
+                    minutes=round(self.window / 60),
+                    error=window.last_error
+                )
+            )
+
+    def due(self, chat_id):
+        """Сводки по закрытым окнам чата."""
+        now = self.clock()
+        with self._lock:
+            windows = self._windows.get(chat_id, {})
+            for key, window in list(windows.items()):
+                if now - window.opened >= self.window:
+                    del windows[key]
+                    self._close(chat_id, window)
+            return self._closed.pop(chat_id, [])
+
+    def stats(self):
+        """Счётчики отправленных и подавленных ошибок."""
+        with self._lock:
+            return {
+                **self.counters,
+                'open_windows': sum(map(len, self._windows.values())),
+                'fingerprints': dict(self.by_fingerprint),
+            }
@@ -0,0 +1,193 @@
+import os
+import random
+import threading
+import time
+
+import breaker
+import exceptions
+import logs
+import metrics
+from reporting import TokenBucket
+import startup
+
+requests = startup.lazy('requests')
+
+BUDGET_RATIO = float(os.getenv('RETRY_BUDGET_RATIO', 0.1))
+BUDGET_MIN_PER_SECOND = float(os.getenv('RETRY_BUDGET_MIN_PER_SECOND', 1))
+BUDGET_CAPACITY = float(os.getenv('RETRY_BUDGET_CAPACITY', 10))
+SERVER_ERROR = 500
+
+CONNECT = 'connect'
+READ_TIMEOUT = 'read_timeout'
+SERVER = 'server_error'
+RATE_LIMITED = 'rate_limited'
+BUDGET_EXHAUSTED = 'budget_exhausted'
+
+RETRY_MESSAGE = (
+    'Повтор запроса после сбоя {reason} через {delay:.1f} с, '
+    'попытка {attempt}: {error}'
+)
+BUDGET_EXHAUSTED_MESSAGE = (
+    'Бюджет повторов исчерпан, сбой {reason} не повторяется: {error}'
+)
+
+logger = logs.get_logger('retry')
+
+
+class Backoff:
+    """Политика повторов одного класса сбоев.
+
+    attempts — всего попыток вместе с первой, пауза перед повтором n
+    выбирается случайно от нуля до min(maximum, base * factor ** (n-1)).
+    """
+
+    __slots__ = ('attempts', 'base', 'factor', 'maximum')
+
+    def __init__(self, attempts, base=1.0, factor=2.0, maximum=8.0):
+        self.attempts = attempts
+        self.base = base
+        self.factor = factor
+        self.maximum = maximum
+
+    def delay(self, attempt, rng):
+        """Пауза перед повтором после attempt неудачных попыток."""
+        return rng.uniform(
+            0, min(self.maximum, self.base * self.factor ** (attempt - 1))
+        )
+
+
+POLICIES = {
+    CONNECT: Backoff(3, base=0.5, maximum=4),
+    READ_TIMEOUT: Backoff(2, base=1, maximum=4),
+    SERVER: Backoff(3, base=1, maximum=8),
+    RATE_LIMITED: Backoff(2, base=1, maximum=30),
+}
+
+RETRIES = metrics.REGISTRY.register(metrics.Counter(
+    'homework_retries', 'Повторы запросов к эндпоинту по классам сбоев',
+    'reason', values=[*POLICIES, BUDGET_EXHAUSTED]
+))
+
+
+def classify(error):
+    """Класс сбоя запроса к эндпоинту или None, если повторять нельзя.
+
+    Ключи code и error в ответе 200 не повторяются: это ошибки токена
+    или параметров запроса, и повтор только удвоил бы нагрузку.
+    """
+    if isinstance(error, exceptions.RateLimitError):
+        return RATE_LIMITED
+    if isinstance(error, exceptions.ResponseStatusCodeError):
+        status_code = error.status_code or 0
+        return SERVER if status_code >= SERVER_ERROR else None
+    cause = error.__cause__ or error
+    if isinstance(cause, requests.exceptions.ReadTimeout):
+        return READ_TIMEOUT
+    if isinstance(cause, requests.exceptions.ConnectionError):
+        return CONNECT
+    return None
+
+
+class RetryBudget:
+    """Общий бюджет повторов как доля от числа запросов.
+
+    Каждый запрос добавляет ratio токена, каждый повтор забирает
+    один, так что повторов не больше ratio от трафика. Ещё
+    min_per_second токенов в секунду начисляются всегда, чтобы при
+    редких опросах одиночный сбой тоже повторялся; запас ограничен
+    capacity.
+    """
+
+    def __init__(self, ratio=BUDGET_RATIO,
+                 min_per_second=BUDGET_MIN_PER_SECOND,
+                 capacity=BUDGET_CAPACITY, clock=time.monotonic):
+        self.ratio = ratio
+        self.clock = clock
+        self.bucket = TokenBucket(capacity, min_per_second, clock())
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        """Учёт нового запроса."""
+        with self._lock:
+            self.bucket.put(self.ratio, self.clock())
+
+    def withdraw(self):
+        """Разрешение на повтор."""
+        with self._lock:
+            return self.bucket.take(self.clock())
+
+
+class RetryPolicy:
+    """Повторы временных сбоев с паузой по классу сбоя и общим бюджетом.
+
+    Сетевые сбои, таймауты чтения и ответы 5xx и 429 повторяются
+    сразу, не дожидаясь следующего цикла опроса, но каждый класс по
+    своей политике. 429 повторяется, только если Retry-After не длиннее
+    maximum, иначе ожидание остаётся расписанию. Когда бюджет исчерпан,
+    сбой пробрасывается сразу. Автомат отключения учитывает только
+    итог вызова, а не каждую попытку. sleep возвращает истину, если
+    пауза прервана остановкой, и тогда сбой пробрасывается без повтора.
+    """
+
+    def __init__(self, policies=None, budget=None, sleep=time.sleep,
+                 rng=None):
+        self.policies = POLICIES if policies is None else policies
+        self.budget = budget or RetryBudget()
+        self.sleep = sleep
+        self.rng = rng or random
+
+    def call(self, function, *args):
+        """Вызов function(*args) с повторами временных сбоев."""
+        self.budget.deposit()
+        attempt = 1
+        with breaker.single_outcome():
+            while True:
+                try:
+                    return function(*args)
+                except Exception as error:
+                    delay = self.retry(error, attempt)
+                    if delay is None or self.sleep(delay):
+                        raise
+                attempt += 1
+
+    def retry(self, error, attempt):
+        """Пауза перед повтором с учётом бюджета или None."""
+        reason = classify(error)
+        delay = self.delay(reason, attempt, error)
+        if delay is None:
+            return None
+        if not self.budget.withdraw():
+            RETRIES.inc(BUDGET_EXHAUSTED)
+            logger.warning(logs.Message(
+                BUDGET_EXHAUSTED_MESSAGE, reason=reason, error=error
+            ))
+            return None
+        RETRIES.inc(reason)
+        logger.warning(logs.Message(
+            RETRY_MESSAGE, reason=reason, delay=delay,
+            attempt=attempt + 1, error=error
+        ))
+        return delay
+
+    def delay(self, reason, attempt, error):
+        """Пауза перед следующей попыткой или None, если не повторять."""
+        backoff = self.policies.get(reason)
+        if backoff is None or attempt >= backoff.attempts:
+            return None
+        delay = backoff.delay(attempt, self.rng)
+        retry_after = getattr(error, 'retry_after', None)
+        if retry_after is not None:
+            if retry_after > backoff.maximum:
+                return None
+            delay = max(delay, retry_after)
+        return delay
+
+
+POLICY = RetryPolicy()
+
+
+def install(sleep):
+    """Общая политика повторов с паузой sleep, например Shutdown.sleep."""
+    global POLICY
+    POLICY = RetryPolicy(sleep=sleep)
+    return POLICY
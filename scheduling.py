@@ -0,0 +1,151 @@
+import os
+import random
+import threading
+import time
+
+from reporting import TokenBucket
+import startup
+
+email_utils = startup.lazy('email.utils')
+
+BASE_INTERVAL = float(os.getenv('POLL_BASE_INTERVAL', 600))
+REVIEWING_INTERVAL = float(os.getenv('POLL_REVIEWING_INTERVAL', 120))
+MAX_INTERVAL = float(os.getenv('POLL_MAX_INTERVAL', 3600))
+BACKOFF_FACTOR = float(os.getenv('POLL_BACKOFF_FACTOR', 1.5))
+JITTER = float(os.getenv('POLL_JITTER', 0.1))
+HOURLY_BUDGET = int(os.getenv('POLL_HOURLY_BUDGET', 60))
+
+ACTIVE_STATUSES = frozenset(('reviewing',))
+MAX_STREAK = 64
+
+
+def parse_retry_after(value, now=None):
+    """Секунды из заголовка Retry-After: число или HTTP-дата."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        moment = email_utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, moment - (time.time() if now is None else now))
+
+
+class ServerClock:
+    """Время сервера по последнему current_date из ответа API.
+
+    Между ответами время идёт по монотонным часам процесса, поэтому
+    перевод системных часов и их дрейф на расписание не влияют.
+    """
+
+    def __init__(self, monotonic=time.monotonic, wall=time.time):
+        self.monotonic = monotonic
+        self._anchor = wall()
+        self._anchor_monotonic = monotonic()
+        self._lock = threading.Lock()
+
+    def observe(self, current_date):
+        """Привязка к времени сервера из ответа."""
+        if current_date is None:
+            return
+        with self._lock:
+            self._anchor = current_date
+            self._anchor_monotonic = self.monotonic()
+
+    def now(self):
+        """Текущее время сервера."""
+        with self._lock:
+            return self._anchor + self.monotonic() - self._anchor_monotonic
+
+
+class AdaptiveScheduler:
+    """Интервал до следующего опроса подписки.
+
+    Пока какая-то работа на проверке, опрос идёт с REVIEWING_INTERVAL.
+    Если ответы не меняются, интервал растёт от BASE_INTERVAL в
+    BACKOFF_FACTOR раз за цикл до MAX_INTERVAL. Retry-After и 429
+    соблюдаются, а почасовой бюджет запросов подписки ограничивает
+    частоту снизу. К интервалу добавляется случайный разброс ±JITTER.
+    """
+
+    def __init__(self, base=BASE_INTERVAL, reviewing=REVIEWING_INTERVAL,
+                 maximum=MAX_INTERVAL, factor=BACKOFF_FACTOR,
+                 jitter=JITTER, hourly_budget=HOURLY_BUDGET, clock=None,
+                 rng=None):
+        self.base = base
+        self.reviewing = reviewing
+        self.maximum = maximum
+        self.factor = factor
+        self.jitter = jitter
+        self.hourly_budget = hourly_budget
+        self.hourly_rate = hourly_budget / 3600
+        self.clock = clock or ServerClock()
+        self.rng = rng or random
+
+    def charge(self, subscription):
+        """Списание запроса из почасового бюджета подписки."""
+        now = self.clock.now()
+        if subscription.budget is None:
+            subscription.budget = TokenBucket(
+                self.hourly_budget, self.hourly_rate, now
+            )
+        subscription.budget.take(now)
+
+    def after_success(self, subscription, changed, current_date=None):
+        """Интервал после успешного ответа."""
+        self.clock.observe(current_date)
+        subscription.streak = 0 if changed else subscription.streak + 1
+        if ACTIVE_STATUSES.intersection(subscription.statuses.values()):
+            interval = self.reviewing
+        else:
+            interval = self._backoff(subscription)
+        return self._finish(subscription, interval)
+
+    def after_error(self, subscription, retry_after=None,
+                    rate_limited=False):
+        """Интервал после ошибки, не меньше Retry-After сервера."""
+        interval = self.base
+        if rate_limited:
+            subscription.streak += 1
+            interval = self._backoff(subscription)
+        return self._finish(subscription, interval, floor=retry_after or 0)
+
+    def _backoff(self, subscription):
+        return self.base * self.factor ** min(subscription.streak, MAX_STREAK)
+
+    def _finish(self, subscription, interval, floor=0.0):
+        interval = min(interval, self.maximum) * self.rng.uniform(
+            1 - self.jitter, 1 + self.jitter
+        )
+        budget_wait = (
+            0.0 if subscription.budget is None
+            else subscription.budget.wait(self.clock.now())
+        )
+        return max(interval, floor, budget_wait)
+
+
+def startup_delays(subscriptions, window, now=None):
+    """Паузы до первого опроса подписок после запуска.
+
+    Подписка с сохранённым и ещё не наступившим временем опроса ждёт до
+    него. Новые и просроченные подписки равномерно распределяются по
+    window, чтобы перезапуск не опрашивал их все разом.
+    """
+    now = time.time() if now is None else now
+    overdue = [
+        subscription for subscription in subscriptions
+        if subscription.due is None or subscription.due <= now
+    ]
+    step = window / len(overdue) if overdue else 0.0
+    offsets = {
+        id(subscription): index * step
+        for index, subscription in enumerate(overdue)
+    }
+    return [
+        offsets[id(subscription)] if id(subscription) in offsets
+        else subscription.due - now
+        for subscription in subscriptions
+    ]
@@ -0,0 +1,100 @@
+from bisect import bisect
+import hashlib
+import os
+import socket
+import sqlite3
+import time
+
+COORDINATION_FILE = os.getenv('COORDINATION_FILE')
+WORKER_ID = os.getenv('WORKER_ID') or f'{socket.gethostname()}-{os.getpid()}'
+WORKER_TTL = float(os.getenv('WORKER_TTL', 30))
+VNODES = 128
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID;
+'''
+
+
+def ring_hash(value):
+    """Стабильный 64-битный хеш строки."""
+    return int.from_bytes(
+        hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big'
+    )
+
+
+class HashRing:
+    """Консистентное хеширование подписок по воркерам.
+
+    У каждого воркера VNODES точек на кольце, поэтому подписки
+    распределяются равномерно, а при входе или выходе воркера
+    переезжает только около 1/N подписок.
+    """
+
+    def __init__(self, nodes=(), vnodes=VNODES):
+        self.nodes = frozenset(nodes)
+        points = sorted(
+            (ring_hash(f'{node}#{index}'), node)
+            for node in self.nodes for index in range(vnodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def owner(self, key):
+        """Воркер, которому принадлежит ключ."""
+        if not self._hashes:
+            return None
+        index = bisect(self._hashes, ring_hash(key)) % len(self._hashes)
+        return self._nodes[index]
+
+
+class Membership:
+    """Список живых воркеров в общем файле SQLite.
+
+    Воркер продлевает свою запись heartbeat() чаще, чем раз в ttl;
+    запись с истёкшим сроком считается ушедшим воркером. Подходит для
+    нескольких процессов на одной машине или общей файловой системе с
+    рабочими блокировками.
+    """
+
+    def __init__(self, path=COORDINATION_FILE, worker_id=WORKER_ID,
+                 ttl=WORKER_TTL, clock=time.time):
+        self.worker_id = worker_id
+        self.ttl = ttl
+        self.clock = clock
+        self.connection = sqlite3.connect(
+            path, timeout=ttl, check_same_thread=False, isolation_level=None
+        )
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(SCHEMA)
+
+    def heartbeat(self):
+        """Продление своей записи, возвращает живых воркеров."""
+        now = self.clock()
+        with self.connection:
+            self.connection.execute('BEGIN IMMEDIATE')
+            self.connection.execute(
+                'INSERT INTO workers (worker_id, expires_at) VALUES (?, ?) '
+                'ON CONFLICT (worker_id) '
+                'DO UPDATE SET expires_at = excluded.expires_at',
+                (self.worker_id, now + self.ttl)
+            )
+            self.connection.execute(
+                'DELETE FROM workers WHERE expires_at < ?', (now,)
+            )
+            return [row[0] for row in self.connection.execute(
+                'SELECT worker_id FROM workers'
+            )]
+
+    def leave(self):
+        """Удаление своей записи, чтобы подписки переехали сразу."""
+        with self.connection:
+            self.connection.execute(
+                'DELETE FROM workers WHERE worker_id = ?', (self.worker_id,)
+            )
+
+    def close(self):
+        """Закрытие файла координации."""
+        self.connection.close()
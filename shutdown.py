@@ -0,0 +1,42 @@
+import os
+import signal
+import threading
+
+SHUTDOWN_TIMEOUT = float(os.getenv('SHUTDOWN_TIMEOUT', 20))
+SIGNALS = (signal.SIGTERM, signal.SIGINT)
+
+
+class Shutdown:
+    """Запрос кооперативной остановки по сигналу.
+
+    Первый SIGTERM или SIGINT только взводит флаг: текущий опрос
+    доигрывается, паузы между опросами прерываются, а очередь отправки
+    и хранилище успевают сохранить состояние. Повторный сигнал
+    останавливает процесс сразу.
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.signal = None
+
+    def install(self, signals=SIGNALS):
+        """Установка обработчиков сигналов; только в главном потоке."""
+        for signum in signals:
+            signal.signal(signum, self.request)
+        return self
+
+    def request(self, signum=None, frame=None):
+        """Запрос остановки."""
+        if self.event.is_set() and signum is not None:
+            raise SystemExit(128 + signum)
+        self.signal = signum
+        self.event.set()
+
+    @property
+    def requested(self):
+        """Запрошена ли остановка."""
+        return self.event.is_set()
+
+    def sleep(self, seconds):
+        """Пауза, прерываемая остановкой; True, если пора выходить."""
+        return self.event.wait(max(0.0, seconds))
@@ -0,0 +1,351 @@
+import argparse
+import bisect
+from collections import deque
+import json
+import logging
+import random
+import time
+
+import requests
+
+import breaker
+from clock import VirtualClock
+import homework
+from reporting import ErrorReporter
+import retry
+import scheduling
+import storage
+from subscriptions import Subscription
+import timeline
+import transport
+
+START = 1_700_000_000
+HOUR = 60 * 60
+DAY = 24 * HOUR
+TOKEN = 'simulation'
+CHAT_ID = 1
+NETWORK = 'network'
+SERVER = 'server'
+RATE_LIMIT = 'rate_limit'
+OUTAGES = (NETWORK, SERVER, RATE_LIMIT)
+RATE_LIMIT_RETRY_AFTER = '600'
+PERCENTILES = (0.5, 0.9, 0.99)
+
+SIMULATION_REPORT_MESSAGE = (
+    'Симуляция {days:.1f} сут за {seconds:.2f} с: запросов к API '
+    '{api_calls}, уведомлений {notified} из {transitions}, пропущено '
+    '{missed}, не успели до конца {pending}, сообщений об ошибках '
+    '{error_messages}; задержка уведомления p50 {latency_p50:.0f} с, '
+    'p90 {latency_p90:.0f} с, p99 {latency_p99:.0f} с, '
+    'макс {latency_max:.0f} с'
+)
+
+
+class Scenario:
+    """Смены статусов работ и сбои эндпоинта по времени от начала.
+
+    transitions — кортежи (секунды, id работы, статус), outages —
+    (начало, конец, вид сбоя): network, server (ответ 500) или
+    rate_limit (ответ 429 с Retry-After).
+    """
+
+    def __init__(self, transitions=(), outages=()):
+        self.transitions = sorted(transitions)
+        self.outages = sorted(outages)
+        self._moments = [transition[0] for transition in self.transitions]
+
+    @classmethod
+    def load(cls, path):
+        """Сценарий из json: часы в transitions и outages."""
+        with open(path, encoding='utf-8') as file:
+            data = json.load(file)
+        return cls(
+            [(hours * HOUR, homework_id, status)
+             for hours, homework_id, status in data.get('transitions', [])],
+            [(start * HOUR, end * HOUR, kind)
+             for start, end, kind in data.get('outages', [])]
+        )
+
+    @classmethod
+    def generate(cls, duration, homeworks=5, outages=0, seed=None):
+        """Случайные циклы проверки работ и сбои за duration секунд.
+
+        Работа уходит на проверку, проверяется в среднем за 12 часов и
+        с вероятностью 0.4 возвращается на доработку примерно на сутки.
+        """
+        rng = random.Random(seed)
+        transitions = []
+        for homework_id in range(1, homeworks + 1):
+            at = rng.uniform(0, duration * 0.8)
+            while at < duration:
+                transitions.append((at, homework_id, 'reviewing'))
+                at += rng.expovariate(1 / (12 * HOUR))
+                if rng.random() < 0.6:
+                    transitions.append((at, homework_id, 'approved'))
+                    break
+                transitions.append((at, homework_id, 'rejected'))
+                at += rng.expovariate(1 / DAY)
+        failures = []
+        for _ in range(outages):
+            start = rng.uniform(0, duration)
+            failures.append((
+                start, start + rng.uniform(600, 2 * HOUR),
+                rng.choice(OUTAGES)
+            ))
+        return cls(
+            [item for item in transitions if item[0] < duration], failures
+        )
+
+    def outage(self, offset):
+        """Вид сбоя в момент offset или None."""
+        for start, end, kind in self.outages:
+            if start <= offset < end:
+                return kind
+        return None
+
+    def homeworks(self, since, offset):
+        """Последние статусы работ, изменившихся в [since, offset]."""
+        latest = {}
+        for at, homework_id, status in self.transitions[
+            :bisect.bisect_right(self._moments, offset)
+        ]:
+            latest[homework_id] = at, status
+        return [
+            (homework_id, at, status)
+            for homework_id, (at, status) in sorted(latest.items())
+            if at >= since
+        ]
+
+
+def homework_name(homework_id):
+    """Название работы в симуляции."""
+    return f'hw{homework_id}'
+
+
+class SimulatedPracticum:
+    """Эндпоинт Практикума по сценарию на часах симуляции."""
+
+    def __init__(self, scenario, clock, start=START):
+        self.scenario = scenario
+        self.clock = clock
+        self.start = start
+        self.calls = 0
+
+    def get(self, url, params=None, **kwargs):
+        """Ответ эндпоинта в текущий момент симуляции."""
+        self.calls += 1
+        now = self.clock.time()
+        kind = self.scenario.outage(now - self.start)
+        if kind == NETWORK:
+            raise requests.exceptions.ConnectionError('simulated outage')
+        response = requests.models.Response()
+        response.url = url
+        if kind == SERVER:
+            response.status_code = 500
+            response._content = b'{}'
+            return response
+        if kind == RATE_LIMIT:
+            response.status_code = 429
+            response.headers['Retry-After'] = RATE_LIMIT_RETRY_AFTER
+            response._content = b'{}'
+            return response
+        since = (params or {}).get('from_date', 0) - self.start
+        response.status_code = 200
+        response._content = json.dumps({
+            'current_date': int(now),
+            'homeworks': [
+                {
+                    'id': homework_id,
+                    'homework_name': homework_name(homework_id),
+                    'status': status,
+                    'date_updated': time.strftime(
+                        timeline.DATE_FORMAT, time.gmtime(self.start + at)
+                    ),
+                }
+                for homework_id, at, status in self.scenario.homeworks(
+                    since, now - self.start
+                )
+            ],
+        }).encode()
+        return response
+
+
+class SimulatedBot:
+    """Бот, запоминающий время и текст сообщений."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.messages = []
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        """Запись сообщения вместо отправки."""
+        self.messages.append((self.clock.time(), text))
+
+
+def percentile(values, fraction):
+    """Перцентиль по ближайшему рангу или 0 для пустого списка."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def match(scenario, messages, start, duration):
+    """Задержки уведомлений, пропущенные и не дошедшие до конца смены.
+
+    Смена пропущена, если работа сменила статус снова раньше, чем бот
+    сообщил о первой смене.
+    """
+    sent = {}
+    for moment, text in messages:
+        sent.setdefault(text, deque()).append(moment - start)
+    latest = {}
+    for at, homework_id, status in reversed(scenario.transitions):
+        latest.setdefault(homework_id, []).append(at)
+    latencies, missed, pending, matched = [], 0, 0, 0
+    for at, homework_id, status in scenario.transitions:
+        moments = latest[homework_id]
+        moments.pop()
+        deadline = moments[-1] if moments else duration
+        queue = sent.get(homework.parse_status({
+            'homework_name': homework_name(homework_id), 'status': status
+        }), deque())
+        while queue and queue[0] < at:
+            queue.popleft()
+        if queue and queue[0] < deadline:
+            latencies.append(queue.popleft() - at)
+            matched += 1
+        elif moments:
+            missed += 1
+        else:
+            pending += 1
+    return latencies, missed, pending, matched
+
+
+def simulate(scenario, duration, seed=None, start=START, **settings):
+    """Прогон цикла опроса бота по сценарию на виртуальных часах.
+
+    settings передаются в AdaptiveScheduler (base, reviewing, maximum,
+    factor, jitter, hourly_budget). Используются настоящие Poller,
+    poll_due, проверка ответа и автоматы отключения; сеть и Telegram
+    заменены сценарием. Возвращает отчёт о запросах и уведомлениях.
+    """
+    clock = VirtualClock(start)
+    practicum = SimulatedPracticum(scenario, clock, start)
+    bot = SimulatedBot(clock)
+    store = storage.CheckpointStore(':memory:')
+    poller = homework.Poller(
+        bot, store,
+        reporter=ErrorReporter(clock=clock.monotonic),
+        scheduler=scheduling.AdaptiveScheduler(
+            clock=scheduling.ServerClock(clock.monotonic, clock.time),
+            rng=random.Random(seed), **settings
+        ),
+        clock=clock.time,
+        retry_policy=retry.RetryPolicy(
+            budget=retry.RetryBudget(clock=clock.monotonic),
+            sleep=clock.sleep, rng=random.Random(seed)
+        )
+    )
+    subscription = Subscription(TOKEN, CHAT_ID, timestamp=start)
+
+    def step():
+        clock.call_later(
+            homework.poll_due(
+                poller, subscription, store, clock=clock.time
+            ), step
+        )
+
+    previous = transport.current()
+    transport.install(practicum)
+    breaker.reset(clock.monotonic)
+    started = time.perf_counter()
+    try:
+        clock.call_at(start, step)
+        clock.run(start + duration)
+    finally:
+        transport.install(previous)
+        breaker.reset()
+        store.close()
+    latencies, missed, pending, matched = match(
+        scenario, bot.messages, start, duration
+    )
+    return {
+        'days': duration / DAY,
+        'seconds': time.perf_counter() - started,
+        'api_calls': practicum.calls,
+        'transitions': len(scenario.transitions),
+        'notified': matched,
+        'missed': missed,
+        'pending': pending,
+        'error_messages': len(bot.messages) - matched,
+        **{
+            f'latency_p{round(fraction * 100)}': percentile(
+                latencies, fraction
+            )
+            for fraction in PERCENTILES
+        },
+        'latency_max': max(latencies, default=0.0),
+    }
+
+
+def parse_args(argv=None):
+    """Параметры симуляции."""
+    parser = argparse.ArgumentParser(
+        description='Симуляция опроса на виртуальных часах'
+    )
+    parser.add_argument('--days', type=float, default=7)
+    parser.add_argument(
+        '--scenario', help='json со сменами статусов и сбоями в часах'
+    )
+    parser.add_argument('--homeworks', type=int, default=5)
+    parser.add_argument('--outages', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument(
+        '--base-interval', type=float, default=scheduling.BASE_INTERVAL
+    )
+    parser.add_argument(
+        '--reviewing-interval', type=float,
+        default=scheduling.REVIEWING_INTERVAL
+    )
+    parser.add_argument(
+        '--max-interval', type=float, default=scheduling.MAX_INTERVAL
+    )
+    parser.add_argument(
+        '--backoff-factor', type=float, default=scheduling.BACKOFF_FACTOR
+    )
+    parser.add_argument('--jitter', type=float, default=scheduling.JITTER)
+    parser.add_argument(
+        '--hourly-budget', type=int, default=scheduling.HOURLY_BUDGET
+    )
+    parser.add_argument(
+        '--verbose', action='store_true',
+        help='писать лог бота, включая ошибки от сбоев сценария'
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Симуляция из командной строки."""
+    args = parse_args(argv)
+    if not args.verbose:
+        homework.logger.setLevel(logging.CRITICAL)
+    duration = args.days * DAY
+    scenario = (
+        Scenario.load(args.scenario) if args.scenario
+        else Scenario.generate(
+            duration, args.homeworks, args.outages, args.seed
+        )
+    )
+    report = simulate(
+        scenario, duration, seed=args.seed, base=args.base_interval,
+        reviewing=args.reviewing_interval, maximum=args.max_interval,
+        factor=args.backoff_factor, jitter=args.jitter,
+        hourly_budget=args.hourly_budget
+    )
+    print(SIMULATION_REPORT_MESSAGE.format(**report))
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+from contextlib import contextmanager
+import importlib.util
+import os
+import sys
+import time
+
+PROFILE_HEADER = 'Этап запуска                     мс'
+PROFILE_LINE = '{name:<30} {milliseconds:>6.1f}'
+PROFILE_TOTAL = 'всего'
+
+
+def lazy(name):
+    """Модуль, который загрузится при первом обращении к атрибуту.
+
+    Если модуль уже загружен, возвращается он сам.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def load(module):
+    """Загрузка модуля, отложенного через lazy, прямо сейчас."""
+    getattr(module, '__name__')
+    return module
+
+
+def process_started():
+    """Момент запуска процесса по часам perf_counter или None."""
+    try:
+        with open('/proc/self/stat') as stat:
+            fields = stat.read().rsplit(')', 1)[1].split()
+        started = int(fields[19]) / os.sysconf('SC_CLK_TCK')
+        uptime = time.clock_gettime(time.CLOCK_BOOTTIME)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+    return time.perf_counter() - (uptime - started)
+
+
+class StartupProfile:
+    """Длительность этапов запуска процесса.
+
+    Отсчёт идёт от запуска процесса, если его можно узнать, иначе от
+    создания профиля.
+    """
+
+    def __init__(self, started=None, clock=time.perf_counter):
+        self.clock = clock
+        self.started = clock() if started is None else started
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        """Замер этапа."""
+        started = self.clock()
+        try:
+            yield
+        finally:
+            self.phases.append((name, self.clock() - started))
+
+    def mark(self, name, started):
+        """Этап, начавшийся в started и закончившийся сейчас."""
+        self.phases.append((name, self.clock() - started))
+
+    def report(self):
+        """Таблица этапов в миллисекундах."""
+        lines = [PROFILE_HEADER]
+        lines.extend(
+            PROFILE_LINE.format(name=name, milliseconds=seconds * 1000)
+            for name, seconds in self.phases
+        )
+        lines.append(PROFILE_LINE.format(
+            name=PROFILE_TOTAL,
+            milliseconds=(self.clock() - self.started) * 1000
+        ))
+        return '\n'.join(lines)
@@ -0,0 +1,229 @@
+import os
+import sqlite3
+import sys
+import threading
+
+STATE_FILE = os.getenv('STATE_FILE', 'homework_state.sqlite3')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cursors (
+    subscription TEXT PRIMARY KEY,
+    from_date INTEGER NOT NULL,
+    due REAL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS statuses (
+    subscription TEXT NOT NULL,
+    homework_id INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    PRIMARY KEY (subscription, homework_id)
+) WITHOUT ROWID;
+'''
+
+
+HISTORY_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS history (
+    subscription TEXT NOT NULL,
+    homework_id NOT NULL,
+    homework_name TEXT,
+    status TEXT NOT NULL,
+    date_updated TEXT,
+    PRIMARY KEY (subscription, homework_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS backfill_progress (
+    subscription TEXT PRIMARY KEY,
+    records INTEGER NOT NULL,
+    current_date INTEGER
+) WITHOUT ROWID;
+'''
+
+
+def add_column(connection, table, column, declaration):
+    """Добавление столбца в таблицу, созданную прошлой версией схемы."""
+    columns = {
+        row[1] for row in connection.execute(f'PRAGMA table_info({table})')
+    }
+    if column not in columns:
+        connection.execute(
+            f'ALTER TABLE {table} ADD COLUMN {column} {declaration}'
+        )
+
+
+def connect(path):
+    """Соединение с SQLite в режиме WAL для нескольких потоков."""
+    connection = sqlite3.connect(
+        path, check_same_thread=False, isolation_level=None
+    )
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    return connection
+
+
+class CheckpointStore:
+    """Устойчивое к сбоям хранилище курсоров и последних статусов.
+
+    SQLite в режиме WAL с synchronous=NORMAL: после сбоя процесса
+    теряется не больше последней незафиксированной транзакции, а
+    fsync выполняется только на контрольных точках журнала. Изменения
+    копятся в памяти и записываются одной транзакцией в flush(), так что
+    стоимость записи делится на все подписки цикла.
+    """
+
+    def __init__(self, path=STATE_FILE):
+        self.path = path
+        self.connection = connect(path)
+        self.connection.executescript(SCHEMA)
+        add_column(self.connection, 'cursors', 'due', 'REAL')
+        self._lock = threading.Lock()
+        self._cursors = {}
+        self._statuses = {}
+
+    def load_cursors(self):
+        """Все сохранённые курсоры: подписка -> from_date."""
+        with self._lock:
+            return dict(self.connection.execute(
+                'SELECT subscription, from_date FROM cursors'
+            ))
+
+    def load_cursor(self, subscription, default=None):
+        """Сохранённый курсор подписки."""
+        with self._lock:
+            row = self.connection.execute(
+                'SELECT from_date FROM cursors WHERE subscription = ?',
+                (subscription,)
+            ).fetchone()
+        return default if row is None else row[0]
+
+    def load_due(self, subscription, default=None):
+        """Сохранённое время следующего опроса подписки."""
+        with self._lock:
+            row = self.connection.execute(
+                'SELECT due FROM cursors WHERE subscription = ?',
+                (subscription,)
+            ).fetchone()
+        return default if row is None or row[0] is None else row[0]
+
+    def load_schedule(self):
+        """Время следующего опроса всех подписок, где оно известно."""
+        with self._lock:
+            return dict(self.connection.execute(
+                'SELECT subscription, due FROM cursors WHERE due IS NOT NULL'
+            ))
+
+    def load_statuses(self, subscription):
+        """Последние статусы работ подписки: id работы -> статус.
+
+        Статусы интернируются: у всех подписок одни и те же строки.
+        """
+        with self._lock:
+            return {
+                homework_id: sys.intern(status)
+                for homework_id, status in self.connection.execute(
+                    'SELECT homework_id, status FROM statuses '
+                    'WHERE subscription = ?',
+                    (subscription,)
+                )
+            }
+
+    def load_all_statuses(self):
+        """Последние статусы работ всех подписок."""
+        statuses = {}
+        with self._lock:
+            rows = self.connection.execute(
+                'SELECT subscription, homework_id, status FROM statuses'
+            ).fetchall()
+        for subscription, homework_id, status in rows:
+            statuses.setdefault(subscription, {})[homework_id] = sys.intern(
+                status
+            )
+        return statuses
+
+    def save_cursor(self, subscription, from_date, due=None):
+        """Отложенная запись курсора и времени опроса до flush()."""
+        with self._lock:
+            self._cursors[subscription] = from_date, due
+
+    def save_status(self, subscription, homework_id, status):
+        """Отложенная запись статуса работы до следующего flush()."""
+        with self._lock:
+            self._statuses[subscription, homework_id] = status
+
+    def flush(self):
+        """Запись накопленных изменений одной транзакцией."""
+        with self._lock:
+            if not self._cursors and not self._statuses:
+                return 0
+            cursors, self._cursors = self._cursors, {}
+            statuses, self._statuses = self._statuses, {}
+            with self.connection:
+                self.connection.execute('BEGIN')
+                self.connection.executemany(
+                    'INSERT INTO cursors (subscription, from_date, due) '
+                    'VALUES (?, ?, ?) ON CONFLICT (subscription) '
+                    'DO UPDATE SET from_date = excluded.from_date, '
+                    'due = COALESCE(excluded.due, cursors.due)',
+                    ((key, from_date, due)
+                     for key, (from_date, due) in cursors.items())
+                )
+                self.connection.executemany(
+                    'INSERT INTO statuses (subscription, homework_id, status) '
+                    'VALUES (?, ?, ?) ON CONFLICT (subscription, homework_id) '
+                    'DO UPDATE SET status = excluded.status',
+                    ((key, homework_id, status)
+                     for (key, homework_id), status in statuses.items())
+                )
+        return len(cursors) + len(statuses)
+
+    def close(self):
+        """Запись остатка изменений и закрытие базы."""
+        self.flush()
+        self.connection.close()
+
+
+class HistoryStore:
+    """История статусов работ, загруженная бэкфиллом.
+
+    Записи пишутся пачками, а подписка отмечается загруженной только
+    после записи всей её истории, поэтому после сбоя бэкфилл начинает
+    заново лишь незаконченные подписки. Повторная запись работы
+    перезаписывает её, так что перезапуск идемпотентен.
+    """
+
+    def __init__(self, path=STATE_FILE):
+        self.connection = connect(path)
+        self.connection.executescript(HISTORY_SCHEMA)
+        self._lock = threading.Lock()
+
+    def finished(self):
+        """Подписки, история которых уже загружена."""
+        with self._lock:
+            return {row[0] for row in self.connection.execute(
+                'SELECT subscription FROM backfill_progress'
+            )}
+
+    def write(self, subscription, records):
+        """Запись пачки работ одной транзакцией."""
+        if not records:
+            return
+        with self._lock, self.connection:
+            self.connection.execute('BEGIN')
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO history (subscription, homework_id, '
+                'homework_name, status, date_updated) '
+                'VALUES (?, ?, ?, ?, ?)',
+                ((subscription, key, record.get('homework_name'),
+                  record['status'], record.get('date_updated'))
+                 for key, record in records)
+            )
+
+    def finish(self, subscription, records, current_date):
+        """Отметка о полностью загруженной истории подписки."""
+        with self._lock, self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO backfill_progress '
+                '(subscription, records, current_date) VALUES (?, ?, ?)',
+                (subscription, records, current_date)
+            )
+
+    def close(self):
+        """Закрытие базы."""
+        self.connection.close()
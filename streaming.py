@@ -0,0 +1,174 @@
+import codecs
+import json
+import re
+
+import exceptions
+import homework
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = re.compile(r'\s*')
+VALUE_TYPES = {
+    '[': list, '{': dict, '"': str, 't': bool, 'f': bool, 'n': type(None),
+}
+
+UNEXPECTED_TOKEN_MESSAGE = 'Неожиданный символ {char!r} в позиции {position}'
+UNEXPECTED_END_MESSAGE = 'Ответ от эндпоинта оборвался'
+
+
+def value_type(char):
+    """Тип json-значения по первому символу."""
+    return VALUE_TYPES.get(char, int if char.isdigit() or char == '-' else str)
+
+
+class HomeworkStream:
+    """Потоковый разбор ответа эндпоинта по одной работе.
+
+    Итерирование по объекту отдаёт работы из списка homeworks по мере
+    чтения тела, так что в памяти одновременно находится только одна
+    запись и текущий кусок ответа. Ответ проверяется так же, как в
+    check_response, а каждая работа — как в parse_status. Остальные
+    ключи верхнего уровня (current_date) доступны в fields после
+    окончания разбора.
+    """
+
+    def __init__(self, chunks, request_params=None):
+        self.chunks = iter(chunks)
+        self.request_params = request_params or dict(
+            url=homework.ENDPOINT, headers=None, params=None
+        )
+        self.decoder = json.JSONDecoder()
+        self.text = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.position = 0
+        self.consumed = 0
+        self.fields = {}
+        self.count = 0
+
+    @property
+    def current_date(self):
+        """current_date из ответа, если он уже прочитан."""
+        return self.fields.get('current_date')
+
+    def __iter__(self):
+        """Проверенные работы по одной."""
+        if self.peek() != '{':
+            raise TypeError(homework.NOT_A_DICT_MESSAGE.format(
+                type=value_type(self.peek())
+            ))
+        self.advance()
+        found = False
+        first = True
+        while self.peek() != '}':
+            if not first:
+                self.expect(',')
+            first = False
+            key = self.decode()
+            self.expect(':')
+            if key == 'homeworks':
+                found = True
+                yield from self.homeworks()
+            else:
+                self.field(key)
+        self.advance()
+        if not found:
+            raise KeyError(homework.NO_HOMEWORK_KEY_MESSAGE)
+
+    def homeworks(self):
+        """Элементы списка homeworks с проверкой каждого."""
+        if self.peek() != '[':
+            raise TypeError(homework.NOT_A_LIST_MESSAGE.format(
+                type=value_type(self.peek())
+            ))
+        self.advance()
+        first = True
+        while self.peek() != ']':
+            if not first:
+                self.expect(',')
+            first = False
+            record = self.decode()
+            homework.parse_status(record)
+            self.count += 1
+            yield record
+        self.advance()
+
+    def field(self, key):
+        """Прочие ключи верхнего уровня, включая ключи ошибок."""
+        value = self.decode()
+        if key in homework.ERROR_CODES:
+            raise exceptions.ResponseError(
+                homework.RESPONSE_ERROR_MESSAGE.format(
+                    key=key, error=value, **self.request_params
+                )
+            )
+        self.fields[key] = value
+
+    def fill(self):
+        """Чтение следующего куска, False если тело закончилось."""
+        if self.position > len(self.buffer) // 2:
+            self.consumed += self.position
+            self.buffer = self.buffer[self.position:]
+            self.position = 0
+        for chunk in self.chunks:
+            text = self.text.decode(chunk)
+            if text:
+                self.buffer += text
+                return True
+        return False
+
+    def peek(self):
+        """Первый значимый символ без сдвига позиции."""
+        while True:
+            self.position = WHITESPACE.match(
+                self.buffer, self.position
+            ).end()
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.fill():
+                raise ValueError(UNEXPECTED_END_MESSAGE)
+
+    def advance(self):
+        """Пропуск текущего символа."""
+        self.position += 1
+
+    def expect(self, char):
+        """Проверка и пропуск ожидаемого символа."""
+        found = self.peek()
+        if found != char:
+            raise ValueError(UNEXPECTED_TOKEN_MESSAGE.format(
+                char=found, position=self.consumed + self.position
+            ))
+        self.advance()
+
+    def decode(self):
+        """Одно json-значение, при нехватке данных читается ещё кусок."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(
+                    self.buffer, self.position
+                )
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            if end == len(self.buffer) and self.fill():
+                continue
+            self.position = end
+            return value
+
+
+def stream_api_answer(current_timestamp, headers, chunk_size=CHUNK_SIZE):
+    """Потоковый запрос к эндпоинту, возвращает HomeworkStream."""
+    request_params = homework.build_request_params(current_timestamp, headers)
+    response = homework.fetch_api_response(request_params, stream=True)
+    if response.status_code != 200:
+        response.close()
+        raise exceptions.ResponseStatusCodeError(
+            homework.STATUS_CODE_EXCEPTION_MESSGAE.format(
+                status_code=response.status_code, **request_params
+            ),
+            status_code=response.status_code
+        )
+    return HomeworkStream(
+        response.iter_content(chunk_size), request_params
+    )
@@ -0,0 +1,86 @@
+import hashlib
+import json
+import os
+import sys
+import time
+
+
+class Subscription:
+    """Пара токена Практикума и чата Telegram с курсором опроса."""
+
+    __slots__ = (
+        'token', 'chat_id', 'timestamp', 'statuses', 'key', 'streak',
+        'budget', 'validators', 'due', 'cohort'
+    )
+
+    def __init__(self, token, chat_id, timestamp=None, statuses=None,
+                 cohort=None):
+        self.token = token
+        self.chat_id = chat_id
+        self.cohort = cohort
+        self.timestamp = (
+            int(time.time()) if timestamp is None else timestamp
+        )
+        self.statuses = {} if statuses is None else statuses
+        self.streak = 0
+        self.budget = None
+        self.validators = None
+        self.due = None
+        self.key = hashlib.sha256(
+            f'{token}:{chat_id}'.encode()
+        ).hexdigest()[:16]
+
+    @property
+    def headers(self):
+        """Заголовки запроса к эндпоинту для этой подписки."""
+        return {'Authorization': f'OAuth {self.token}'}
+
+    def restore(self, store):
+        """Восстановление курсора, статусов и времени опроса."""
+        self.timestamp = store.load_cursor(self.key, self.timestamp)
+        self.statuses = store.load_statuses(self.key)
+        self.due = store.load_due(self.key, self.due)
+
+    def checkpoint(self, store, cursor=None):
+        """Отложенная запись курсора и времени опроса в хранилище.
+
+        cursor задаёт сохраняемый курсор, если он отстаёт от timestamp.
+        """
+        store.save_cursor(
+            self.key, self.timestamp if cursor is None else cursor, self.due
+        )
+
+
+def restore_all(subscriptions, store):
+    """Восстановление состояния всех подписок тремя запросами к базе."""
+    cursors = store.load_cursors()
+    statuses = store.load_all_statuses()
+    schedule = store.load_schedule()
+    for subscription in subscriptions:
+        subscription.timestamp = cursors.get(
+            subscription.key, subscription.timestamp
+        )
+        subscription.statuses = statuses.get(subscription.key, {})
+        subscription.due = schedule.get(subscription.key, subscription.due)
+
+
+def load_file(path):
+    """Подписки из json-списка объектов с token, chat_id и cohort.
+
+    Названия когорт интернируются: их мало, а подписок в каждой много.
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as file:
+        return [
+            Subscription(
+                item['token'], item.get('chat_id'),
+                cohort=intern_cohort(item.get('cohort'))
+            )
+            for item in json.load(file)
+        ]
+
+
+def intern_cohort(cohort):
+    """Общая строка когорты для всех её подписок."""
+    return sys.intern(cohort) if isinstance(cohort, str) else cohort
@@ -1,9 +1,28 @@
 import sys
 from os.path import abspath, dirname
 
+import pytest
+
 root_dir = dirname(dirname(abspath(__file__)))
 sys.path.append(root_dir)
 
+import breaker  # noqa: E402
+import retry  # noqa: E402
+
 pytest_plugins = [
     'tests.fixtures.fixture_data'
 ]
+
+
+@pytest.fixture(autouse=True)
+def reset_breakers():
+    breaker.reset()
+    yield
+    breaker.reset()
+
+
+@pytest.fixture(autouse=True)
+def retry_without_pauses(monkeypatch):
+    monkeypatch.setattr(retry, 'POLICY', retry.RetryPolicy(
+        sleep=lambda seconds: None
+    ))
@@ -0,0 +1,90 @@
+import json
+
+import backfill
+import storage
+import transport
+from subscriptions import Subscription
+
+
+class FakeResponse:
+
+    def __init__(self, body, status_code=200):
+        self.body = body
+        self.status_code = status_code
+        self.headers = {}
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start:start + chunk_size]
+
+    def close(self):
+        pass
+
+
+class FakeTransport:
+
+    def __init__(self, histories, broken=()):
+        self.histories = histories
+        self.broken = set(broken)
+        self.calls = []
+
+    def get(self, url, headers=None, params=None, **kwargs):
+        token = headers['Authorization'].split()[1]
+        self.calls.append(token)
+        if token in self.broken:
+            return FakeResponse(b'{}', status_code=500)
+        return FakeResponse(json.dumps({
+            'homeworks': self.histories[token], 'current_date': 1000
+        }).encode())
+
+
+def history(count):
+    return [
+        {'id': i, 'homework_name': f'hw{i}', 'status': 'approved',
+         'date_updated': f'2022-01-{i % 28 + 1:02d}T10:00:00Z'}
+        for i in range(count)
+    ]
+
+
+def test_backfill_resumes_after_failure(tmp_path):
+    store = storage.HistoryStore(str(tmp_path / 'state.sqlite3'))
+    subscriptions = [Subscription(f'token{i}', i) for i in range(4)]
+    histories = {f'token{i}': history(30 * (i + 1)) for i in range(4)}
+    fake = FakeTransport(histories, broken={'token2'})
+    transport.install(fake)
+    try:
+        report = backfill.backfill(
+            subscriptions, store, concurrency=2, batch_size=7
+        )
+        assert report['failed'] == 1
+        assert report['records'] == 30 + 60 + 120
+        assert report['peak_rss_mb'] > 0
+
+        fake.broken.clear()
+        fake.calls.clear()
+        report = backfill.backfill(subscriptions, store, concurrency=2)
+    finally:
+        transport.install(None)
+
+    assert fake.calls == ['token2']
+    assert report['records'] == 90
+    rows = store.connection.execute(
+        'SELECT COUNT(*) FROM history'
+    ).fetchone()[0]
+    assert rows == 30 + 60 + 90 + 120
+    store.close()
+
+
+def test_until_filters_records(tmp_path):
+    store = storage.HistoryStore(str(tmp_path / 'state.sqlite3'))
+    subscription = Subscription('token', 1)
+    transport.install(FakeTransport({'token': history(28)}))
+    try:
+        count = backfill.backfill_subscription(
+            subscription, store,
+            until=backfill.updated_at({'date_updated': '2022-01-10T10:00:00Z'})
+        )
+    finally:
+        transport.install(None)
+    assert count == 10
+    store.close()
@@ -0,0 +1,37 @@
+import telegram
+
+from benchmarks import stubs
+import homework
+from subscriptions import Subscription
+import transport
+
+
+def test_poller_runs_against_stub_servers(monkeypatch):
+    practicum = stubs.practicum_server(payload_size=3).start()
+    bot_api = stubs.telegram_server().start()
+    try:
+        monkeypatch.setattr(
+            homework, 'ENDPOINT', practicum.url + stubs.PRACTICUM_PATH
+        )
+        monkeypatch.setattr(transport, '_current', transport.Transport())
+        bot = telegram.Bot('123456:stub', base_url=bot_api.url + '/bot')
+        poller = homework.Poller(bot)
+        subscription = Subscription('token', 1, timestamp=0, statuses={
+            index: 'approved' for index in range(1, 4)
+        })
+        for _ in range(3):
+            poller.poll(subscription)
+        assert poller.counters['polls'] == 3
+        assert bot_api.messages == 3
+        assert len(bot_api.latencies) == 3
+        assert practicum.polls['OAuth token'] == 3
+    finally:
+        transport.current().close()
+        practicum.shutdown()
+        bot_api.shutdown()
+
+
+def test_error_rate_fails_requests():
+    server = stubs.practicum_server(error_rate=1.0, seed=1)
+    assert server.should_fail()
+    server.server_close()
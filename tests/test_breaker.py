@@ -0,0 +1,102 @@
+import pytest
+import requests
+
+import breaker
+from clock import VirtualClock
+import exceptions
+import homework
+import metrics
+import retry
+from subscriptions import Subscription
+from utils import RecordingBot
+
+
+def make_breaker(**kwargs):
+    clock = VirtualClock()
+    options = dict(
+        failure_threshold=3, reset_timeout=30, clock=clock.monotonic
+    )
+    options.update(kwargs)
+    return breaker.CircuitBreaker('test', **options), clock
+
+
+def test_opens_after_threshold_of_consecutive_failures():
+    circuit, _ = make_breaker()
+    for _ in range(2):
+        circuit.failure()
+    circuit.success()
+    for _ in range(2):
+        circuit.failure()
+    assert circuit.state == breaker.CLOSED
+    circuit.failure()
+    assert circuit.state == breaker.OPEN
+    assert not circuit.allow()
+    with pytest.raises(exceptions.CircuitOpenError) as info:
+        circuit.check()
+    assert info.value.retry_after == 30
+
+
+def test_single_probe_after_reset_timeout():
+    circuit, clock = make_breaker()
+    for _ in range(3):
+        circuit.failure()
+    clock.now = 30
+    assert circuit.allow()
+    assert circuit.state == breaker.HALF_OPEN
+    assert not circuit.allow()
+    circuit.success()
+    assert circuit.state == breaker.CLOSED
+    assert circuit.allow()
+
+
+def test_failed_probe_reopens():
+    circuit, clock = make_breaker()
+    for _ in range(3):
+        circuit.failure()
+    clock.now = 30
+    assert circuit.allow()
+    circuit.failure()
+    assert circuit.state == breaker.OPEN
+    clock.now = 45
+    assert not circuit.allow()
+    assert circuit.retry_after() == 15
+
+
+def test_open_api_circuit_skips_requests(monkeypatch):
+    calls = []
+
+    def failing_get(*args, **kwargs):
+        calls.append(kwargs['url'])
+        raise requests.exceptions.ConnectionError('down')
+
+    monkeypatch.setattr(requests, 'get', failing_get)
+    for _ in range(breaker.FAILURE_THRESHOLD):
+        with pytest.raises(Exception):
+            homework.get_api_answer(0)
+    with pytest.raises(exceptions.CircuitOpenError):
+        homework.get_api_answer(0)
+    attempts = retry.POLICIES[retry.CONNECT].attempts
+    assert len(calls) == breaker.FAILURE_THRESHOLD * attempts
+    assert breaker.states() == {'practicum.yandex.ru': breaker.OPEN}
+
+
+def test_state_is_exported_as_metric():
+    breaker.get('example.org').failure()
+    for _ in range(breaker.FAILURE_THRESHOLD):
+        breaker.get('telegram.test').failure()
+    rendered = metrics.REGISTRY.render()
+    assert 'homework_circuit_state{endpoint="example.org"} 0' in rendered
+    assert 'homework_circuit_state{endpoint="telegram.test"} 2' in rendered
+
+
+def test_poller_does_not_report_while_circuit_is_open():
+    circuit = breaker.get('practicum.yandex.ru')
+    for _ in range(breaker.FAILURE_THRESHOLD):
+        circuit.failure()
+    bot = RecordingBot()
+    poller = homework.Poller(bot)
+    subscription = Subscription('token', 1, timestamp=0)
+    delay = poller.poll(subscription)
+    assert delay >= breaker.RESET_TIMEOUT - 1
+    assert bot.sent == []
+    assert poller.counters['circuit_open'] == 1
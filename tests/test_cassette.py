@@ -0,0 +1,135 @@
+import json
+import time
+
+import requests
+
+import cassette
+import homework
+import replay
+import retry
+from subscriptions import Subscription
+import transport
+from utils import RecordingBot
+
+
+class ScriptedTransport:
+
+    def __init__(self, answers):
+        self.answers = list(answers)
+
+    def get(self, url, params=None, **kwargs):
+        answer = self.answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        response = requests.models.Response()
+        response.status_code = 200
+        if isinstance(answer, int):
+            response.status_code, answer = answer, {}
+        response.headers['Content-Type'] = 'application/json'
+        response._content = json.dumps(answer).encode()
+        return response
+
+
+def answer(current_date, *homeworks):
+    return {
+        'current_date': current_date,
+        'homeworks': [
+            {'id': id, 'homework_name': f'hw{id}', 'status': status}
+            for id, status in homeworks
+        ],
+    }
+
+
+def record(path, answers, statuses=None):
+    recorder = cassette.Cassette(str(path))
+    subscription = Subscription(
+        'secret-token', 7, timestamp=100, statuses=statuses or {}
+    )
+    recorder.state(subscription)
+    bot = RecordingBot()
+    scripted = ScriptedTransport(answers)
+    transport.install(cassette.RecordingTransport(scripted, recorder))
+    try:
+        poller = homework.Poller(cassette.RecordingBot(bot, recorder))
+        while scripted.answers:
+            poller.poll(subscription)
+    finally:
+        transport.install(None)
+        recorder.close()
+    return bot.sent
+
+
+def test_cassette_has_no_tokens_and_replays_identically(tmp_path):
+    path = tmp_path / 'traffic.jsonl.gz'
+    sent = record(path, [
+        answer(200, (1, 'reviewing'), (2, 'approved')),
+        requests.exceptions.ConnectionError('reset'),
+        answer(300, (1, 'approved')),
+    ], statuses={2: 'approved'})
+    events = cassette.load(str(path))
+    assert 'secret-token' not in json.dumps(events)
+    assert [event['kind'] for event in events].count('http') == 3
+    assert len(sent) == 2
+
+    report = replay.replay(events, speed=0)
+    assert report['polls'] == 2
+    assert report['sent'] == report['expected'] == 2
+    assert report['mismatches'] == 0
+
+
+def test_error_messages_are_recorded_without_tokens(tmp_path):
+    path = tmp_path / 'traffic.jsonl'
+    sent = record(path, [404])
+    assert 'OAuth secret-token' in sent[0]
+    with open(path, encoding='utf-8') as file:
+        text = file.read()
+    assert 'secret-token' not in text
+    assert 'OAuth ***' in text
+    assert cassette.redact(
+        'https://api.telegram.org/bot123:AB-c/sendMessage'
+    ) == 'https://api.telegram.org/bot***/sendMessage'
+
+    report = replay.replay(cassette.load(str(path)), speed=0)
+    assert report['sent'] == report['expected'] == 1
+    assert report['mismatches'] == 0
+
+
+def test_replay_detects_changed_messages(tmp_path, monkeypatch):
+    path = tmp_path / 'traffic.jsonl'
+    record(path, [answer(200, (1, 'rejected'))])
+    monkeypatch.setitem(homework.HOMEWORK_VERDICTS, 'rejected', 'Другое')
+    report = replay.replay(cassette.load(str(path)), speed=0)
+    assert report['mismatches'] == 1
+
+
+def test_replay_compresses_recorded_gaps():
+    events = [
+        {'kind': 'http', 't': 0.0, 'elapsed': 0.5, 'url': 'u',
+         'params': {}, 'status': 200, 'headers': {},
+         'body': json.dumps(answer(1))},
+        {'kind': 'http', 't': 10.0, 'elapsed': 0.5, 'url': 'u',
+         'params': {}, 'status': 200, 'headers': {},
+         'body': json.dumps(answer(2))},
+    ]
+    now = [0.0]
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    report = replay.replay(events, speed=10, sleep=sleep, clock=lambda: now[0])
+    assert report['polls'] == 2
+    assert now[0] == 1.0 + 0.05
+    assert report['recorded_seconds'] == 10.0
+
+
+def test_replay_of_outage_does_not_wait_for_open_circuit():
+    events = [
+        {'kind': 'http', 't': float(second * 600), 'elapsed': 0.1,
+         'url': 'u', 'params': {}, 'status': 500, 'headers': {},
+         'body': '{}'}
+        for second in range(30)
+    ]
+    started = time.monotonic()
+    report = replay.replay(events, speed=0)
+    assert time.monotonic() - started < 5
+    assert report['polls'] >= 30 // retry.POLICIES[retry.SERVER].attempts
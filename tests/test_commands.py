@@ -0,0 +1,205 @@
+import threading
+import time
+
+import pytest
+
+from clock import VirtualClock
+import commands
+from homework import status_cache
+from subscriptions import Subscription
+
+
+def homework(id, status, name=None):
+    return {
+        'id': id,
+        'status': status,
+        'homework_name': name or 'hw{}'.format(id),
+    }
+
+
+def test_cache_serves_fresh_view_until_ttl():
+    clock = VirtualClock(1000.0)
+    calls = []
+
+    def fetch(subscription):
+        calls.append(subscription)
+        return [homework(1, 'reviewing')]
+
+    cache = commands.StatusCache(fetch, ttl=60, clock=clock.monotonic)
+    subscription = Subscription('token', 1)
+    cache.view(subscription)
+    clock.advance(59)
+    cache.view(subscription)
+    assert len(calls) == 1
+    clock.advance(2)
+    cache.view(subscription)
+    assert len(calls) == 2
+
+
+def test_poll_updates_keep_cache_fresh():
+    clock = VirtualClock(1000.0)
+    calls = []
+
+    def fetch(subscription):
+        calls.append(subscription)
+        return [homework(1, 'reviewing'), homework(2, 'approved')]
+
+    cache = commands.StatusCache(fetch, ttl=60, clock=clock.monotonic)
+    subscription = Subscription('token', 1)
+    cache.view(subscription)
+    clock.advance(50)
+    cache.update(subscription, [homework(1, 'rejected')])
+    clock.advance(50)
+    view = cache.view(subscription)
+    assert len(calls) == 1
+    assert view.homeworks[1]['status'] == 'rejected'
+    assert view.homeworks[2]['status'] == 'approved'
+    assert [item['status'] for _, item in view.history] == ['rejected']
+
+
+def test_concurrent_views_share_one_refresh():
+    release = threading.Event()
+    calls = []
+
+    def fetch(subscription):
+        calls.append(subscription)
+        release.wait(1)
+        return [homework(1, 'reviewing')]
+
+    cache = commands.StatusCache(fetch)
+    subscription = Subscription('token', 1)
+    views = []
+    threads = [
+        threading.Thread(target=lambda: views.append(cache.view(subscription)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert len(views) == 8
+    assert all(view is views[0] for view in views)
+
+
+def test_failed_refresh_falls_back_to_stale_view():
+    clock = VirtualClock(1000.0)
+    responses = [[homework(1, 'reviewing')], ConnectionError('down')]
+
+    def fetch(subscription):
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    cache = commands.StatusCache(fetch, ttl=60, clock=clock.monotonic)
+    subscription = Subscription('token', 1)
+    cache.view(subscription)
+    clock.advance(120)
+    assert cache.view(subscription).homeworks[1]['status'] == 'reviewing'
+
+
+def test_failed_refresh_without_view_raises():
+    def fetch(subscription):
+        raise ConnectionError('down')
+
+    cache = commands.StatusCache(fetch)
+    with pytest.raises(ConnectionError):
+        cache.view(Subscription('token', 1))
+
+
+def test_failed_refresh_is_cached_for_error_ttl():
+    clock = VirtualClock(1000.0)
+    calls = []
+
+    def fetch(subscription):
+        calls.append(subscription)
+        if len(calls) == 1:
+            return [homework(1, 'reviewing')]
+        raise ConnectionError('down')
+
+    cache = commands.StatusCache(
+        fetch, ttl=60, clock=clock.monotonic, error_ttl=30
+    )
+    subscription = Subscription('token', 1)
+    cache.view(subscription)
+    clock.advance(120)
+    for _ in range(3):
+        assert cache.view(subscription).homeworks[1]['status'] == 'reviewing'
+    assert len(calls) == 2
+    clock.advance(31)
+    cache.view(subscription)
+    assert len(calls) == 3
+
+    empty = commands.StatusCache(fetch, clock=clock.monotonic, error_ttl=30)
+    other = Subscription('token', 2)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            empty.view(other)
+    assert len(calls) == 4
+
+
+def test_history_uses_injected_wall_clock():
+    cache = commands.StatusCache(
+        lambda subscription: [homework(1, 'reviewing')],
+        clock=VirtualClock(1000.0).monotonic, wall=lambda: 1_700_000_000.0
+    )
+    subscription = Subscription('token', 1)
+    cache.view(subscription)
+    cache.update(subscription, [homework(1, 'approved')])
+    assert [
+        (moment, item['status'])
+        for moment, item in cache.view(subscription).history
+    ] == [(1_700_000_000.0, 'approved')]
+
+
+def make_listener(fetch, sent=None):
+    cache = commands.StatusCache(fetch)
+    sent = [] if sent is None else sent
+    listener = commands.CommandListener(
+        None, cache, [Subscription('token', 42)],
+        lambda chat_id, text: sent.append((chat_id, text)),
+        {'approved': 'Принято', 'reviewing': 'На проверке'}
+    )
+    return listener, sent
+
+
+def test_status_reply_lists_verdicts():
+    listener, _ = make_listener(lambda subscription: [
+        homework(1, 'approved', 'first'), homework(2, 'reviewing', 'second')
+    ])
+    assert listener.reply(42, '/status@homework_bot') == (
+        '"first": Принято\n"second": На проверке'
+    )
+
+
+def test_unknown_chats_and_texts_are_ignored():
+    sent = []
+    listener, _ = make_listener(lambda subscription: [], sent)
+    listener.answer(7, '/status')
+    listener.answer(42, 'hello')
+    listener.answer(42, None)
+    assert sent == []
+    listener.answer(42, '/status')
+    assert sent == [(42, commands.NO_HOMEWORKS_MESSAGE)]
+
+
+def test_history_and_unavailable_replies():
+    def fetch(subscription):
+        raise ConnectionError('down')
+
+    listener, _ = make_listener(fetch)
+    assert listener.reply(42, '/history') == commands.UNAVAILABLE_MESSAGE
+    listener.cache.update(
+        Subscription('token', 42), [homework(1, 'reviewing')], complete=True
+    )
+    assert listener.reply(42, '/history') == commands.NO_HISTORY_MESSAGE
+
+
+def test_status_cache_only_with_commands(monkeypatch):
+    monkeypatch.setattr(commands, 'BOT_COMMANDS', False)
+    assert status_cache() is None
+    monkeypatch.setattr(commands, 'BOT_COMMANDS', True)
+    assert isinstance(status_cache(), commands.StatusCache)
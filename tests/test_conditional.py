@@ -0,0 +1,64 @@
+import json
+
+import conditional
+import homework
+import transport
+from subscriptions import Subscription
+from utils import RecordingBot
+
+
+class FakeResponse:
+
+    def __init__(self, payload, status_code=200, headers=None):
+        self.content = json.dumps(payload).encode() if payload else b''
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class FakeTransport:
+
+    def __init__(self, responses):
+        self.responses = iter(responses)
+        self.requests = []
+
+    def get(self, url, headers=None, params=None, **kwargs):
+        self.requests.append(headers)
+        return next(self.responses)
+
+
+def test_digest_ignores_current_date():
+    first = b'{"homeworks": [], "current_date": 100}'
+    second = b'{"homeworks": [], "current_date": 200}'
+    assert conditional.body_digest(first) == conditional.body_digest(second)
+    assert conditional.current_date(second) == 200
+    assert conditional.request_headers(('"v1"', None, b'')) == {
+        'If-None-Match': '"v1"'
+    }
+
+
+def test_unchanged_responses_take_fast_path():
+    homeworks = [{'id': 1, 'status': 'reviewing', 'homework_name': 'a'}]
+    fake = FakeTransport([
+        FakeResponse({'homeworks': homeworks, 'current_date': 100},
+                     headers={'ETag': '"v1"'}),
+        FakeResponse({'homeworks': homeworks, 'current_date': 200}),
+        FakeResponse(None, status_code=304),
+    ])
+    transport.install(fake)
+    try:
+        bot = RecordingBot()
+        poller = homework.Poller(bot)
+        subscription = Subscription('token', 1, timestamp=0)
+        for _ in range(3):
+            poller.poll(subscription)
+    finally:
+        transport.install(None)
+
+    assert len(bot.sent) == 1
+    assert subscription.timestamp == 200
+    assert fake.requests[1]['If-None-Match'] == '"v1"'
+    assert poller.counters['polls'] == 3
+    assert poller.counters['fast_path'] == 2
@@ -0,0 +1,128 @@
+from concurrent.futures import Future
+
+import pytest
+
+import diff
+import homework
+import storage
+from subscriptions import Subscription
+from utils import RecordingBot
+
+
+def test_transitions_reports_every_change_once():
+    previous = {1: 'reviewing', 2: 'approved'}
+    homeworks = [
+        {'id': 1, 'status': 'approved', 'homework_name': 'a'},
+        {'id': 2, 'status': 'approved', 'homework_name': 'b'},
+        {'id': 3, 'status': 'reviewing', 'homework_name': 'c'},
+        {'id': 3, 'status': 'reviewing', 'homework_name': 'c'},
+    ]
+    changed = diff.transitions(previous, homeworks)
+    assert [key for key, _ in changed] == [1, 3]
+    assert previous == {1: 'reviewing', 2: 'approved'}
+
+
+def test_transitions_full_history_is_linear():
+    homeworks = [
+        {'id': i, 'status': 'approved', 'homework_name': str(i)}
+        for i in range(100000)
+    ]
+    previous = {i: 'approved' for i in range(100000)}
+    assert diff.transitions(previous, homeworks) == []
+
+
+def test_notify_sends_all_transitions_without_repeats():
+    bot = RecordingBot()
+    poller = homework.Poller(bot)
+    subscription = Subscription('token', 1, timestamp=0)
+    homeworks = [
+        {'id': 1, 'status': 'reviewing', 'homework_name': 'a'},
+        {'id': 2, 'status': 'rejected', 'homework_name': 'b'},
+    ]
+    for _ in range(2):
+        changes = diff.transitions(subscription.statuses, homeworks)
+        poller.notify(subscription, changes, from_date=0)
+    assert len(bot.sent) == 2
+    assert subscription.statuses == {1: 'reviewing', 2: 'rejected'}
+
+
+def test_failed_delivery_rolls_back_status_and_cursor():
+    class FailingBot:
+        def send_message(self, chat_id=None, text=None, **kwargs):
+            raise ConnectionError('telegram down')
+
+    poller = homework.Poller(FailingBot())
+    subscription = Subscription('token', 1, timestamp=100)
+    subscription.statuses = {1: 'reviewing'}
+    changes = diff.transitions(
+        subscription.statuses,
+        [{'id': 1, 'status': 'approved', 'homework_name': 'a'}]
+    )
+    subscription.timestamp = 200
+    poller.notify(subscription, changes, from_date=100)
+    assert subscription.statuses == {1: 'approved'}
+    poller.settle(subscription)
+    assert subscription.statuses == {1: 'reviewing'}
+    assert subscription.timestamp == 100
+
+
+def test_unknown_status_does_not_drop_other_transitions():
+    bot = RecordingBot()
+    poller = homework.Poller(bot)
+    subscription = Subscription('token', 1, timestamp=100)
+    poller.fetch = lambda subscription: (200, [
+        {'id': 1, 'status': 'weird', 'homework_name': 'a'},
+        {'id': 2, 'status': 'approved', 'homework_name': 'b'},
+    ], None)
+    poller.cycle(subscription)
+    assert len(bot.sent) == 2
+    assert 'Работа проверена' in bot.sent[0]
+    assert subscription.statuses == {2: 'approved'}
+    assert subscription.timestamp == 100
+
+
+def test_cursor_is_not_persisted_past_undelivered_notification(tmp_path):
+    store = storage.CheckpointStore(str(tmp_path / 'state.sqlite3'))
+    poller = homework.Poller(RecordingBot(), store)
+    futures = []
+
+    def send(chat_id, message):
+        futures.append(Future())
+        return futures[-1]
+
+    poller.send = send
+    subscription = Subscription('token', 1, timestamp=100)
+    poller.fetch = lambda subscription: (200, [
+        {'id': 1, 'status': 'approved', 'homework_name': 'a'},
+    ], None)
+    poller.poll(subscription)
+    store.flush()
+    assert subscription.timestamp == 200
+    assert store.load_cursor(subscription.key) == 100
+    assert store.load_statuses(subscription.key) == {}
+
+    futures[0].set_result(True)
+    poller.close([subscription])
+    store.flush()
+    assert store.load_cursor(subscription.key) == 200
+    assert store.load_statuses(subscription.key) == {1: 'approved'}
+    store.close()
+
+
+@pytest.mark.parametrize('delivered', [True, False])
+def test_delivery_callback_leaves_subscription_to_polling_thread(delivered):
+    poller = homework.Poller(RecordingBot())
+    future = Future()
+    poller.send = lambda chat_id, message: future
+    subscription = Subscription('token', 1, timestamp=100)
+    changes = [(1, {'id': 1, 'status': 'approved', 'homework_name': 'a'})]
+    poller.notify(subscription, changes, from_date=100)
+    subscription.timestamp = 200
+    if delivered:
+        future.set_result(True)
+    else:
+        future.set_exception(ConnectionError('telegram down'))
+    assert subscription.statuses == {1: 'approved'}
+    assert subscription.timestamp == 200
+    poller.settle(subscription)
+    assert subscription.timestamp == (200 if delivered else 100)
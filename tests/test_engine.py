@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+
+import engine
+from subscriptions import Subscription
+from utils import RecordingPoller
+
+
+def test_subscription_headers():
+    subscription = Subscription('token', 1, timestamp=0)
+    assert subscription.headers == {'Authorization': 'OAuth token'}
+    assert subscription.timestamp == 0
+
+
+def test_load_subscriptions_from_file(tmp_path):
+    path = tmp_path / 'subscriptions.json'
+    path.write_text(
+        '[{"token": "a", "chat_id": 1}, {"token": "b", "chat_id": 2}]'
+    )
+    subscriptions = engine.load_subscriptions(str(path))
+    assert [s.token for s in subscriptions] == ['a', 'b']
+    assert [s.chat_id for s in subscriptions] == [1, 2]
+
+
+def test_engine_polls_every_subscription():
+    poller = RecordingPoller(delay=0.05)
+    subscriptions = [
+        Subscription(f'token{i}', i, timestamp=0) for i in range(50)
+    ]
+    bot_engine = engine.Engine(poller, concurrency=8, retry_time=0.05)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(
+            asyncio.wait_for(bot_engine.run(subscriptions), timeout=0.3)
+        )
+
+    assert set(poller.polled) == {s.key for s in subscriptions}
+    assert bot_engine.polls >= 50
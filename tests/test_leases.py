@@ -0,0 +1,99 @@
+import asyncio
+import time
+
+import pytest
+
+from clock import VirtualClock
+import engine
+import homework
+import leases
+import storage
+from subscriptions import Subscription
+from utils import RecordingPoller
+
+
+def make_replicas(tmp_path, ttl=30, clock=None):
+    virtual = VirtualClock(1000.0)
+    path = str(tmp_path / 'leases.sqlite3')
+    return virtual, [
+        leases.LeaseManager(
+            path, holder=name, ttl=ttl, clock=clock or virtual.time
+        )
+        for name in ('a', 'b')
+    ]
+
+
+def test_only_one_replica_holds_a_lease(tmp_path):
+    clock, (first, second) = make_replicas(tmp_path)
+    assert first.sync(['x', 'y']) == {'x', 'y'}
+    assert second.sync(['x', 'y']) == set()
+    clock.advance(10)
+    assert first.sync(['x', 'y']) == {'x', 'y'}
+    assert second.sync(['x', 'y']) == set()
+
+
+def test_standby_takes_over_after_expiry(tmp_path):
+    clock, (first, second) = make_replicas(tmp_path)
+    first.sync(['x'])
+    clock.advance(29)
+    assert second.sync(['x']) == set()
+    assert first.valid() is False
+    clock.advance(2)
+    assert second.sync(['x']) == {'x'}
+    assert second.holders() == {'x': ('b', 2)}
+    assert first.sync(['x']) == set()
+
+
+def test_release_hands_over_immediately(tmp_path):
+    _, (first, second) = make_replicas(tmp_path)
+    first.sync(['x'])
+    first.release()
+    assert second.sync(['x']) == {'x'}
+
+
+def test_poll_due_only_polls_while_leader(tmp_path):
+    clock, (first, second) = make_replicas(tmp_path)
+    store = storage.CheckpointStore(str(tmp_path / 'state.sqlite3'))
+    leader, standby = RecordingPoller(), RecordingPoller()
+    subscription = Subscription('token', 1, timestamp=0)
+    other = Subscription('token', 1, timestamp=0)
+
+    homework.poll_due(leader, subscription, store, first)
+    delay = homework.poll_due(standby, other, store, second)
+    assert (len(leader.polled), len(standby.polled)) == (1, 0)
+    assert delay == second.interval
+    store.close()
+
+
+def test_engine_polls_only_leased_subscriptions(tmp_path):
+    _, (first, second) = make_replicas(tmp_path, ttl=0.6, clock=time.time)
+    taken = Subscription('taken', 1, timestamp=0)
+    free = Subscription('free', 2, timestamp=0)
+    second.sync([taken.key])
+    poller = RecordingPoller(delay=60)
+    bot_engine = engine.Engine(poller, retry_time=0, leases=first)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(asyncio.wait_for(
+            bot_engine.run([taken, free]), timeout=0.3
+        ))
+    assert poller.polled == [free.key]
+
+
+def test_engine_waits_for_saved_due_after_gaining_lease(tmp_path):
+    _, (first, _) = make_replicas(tmp_path, ttl=0.6, clock=time.time)
+    store = storage.CheckpointStore(str(tmp_path / 'state.sqlite3'))
+    later = Subscription('later', 1, timestamp=0)
+    overdue = Subscription('overdue', 2, timestamp=0)
+    store.save_cursor(later.key, 0, time.time() + 60)
+    store.save_cursor(overdue.key, 0, time.time() - 60)
+    store.flush()
+    poller = RecordingPoller(delay=60, store=store)
+    bot_engine = engine.Engine(poller, retry_time=0, leases=first)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(asyncio.wait_for(
+            bot_engine.run([later, overdue]), timeout=0.3
+        ))
+    assert poller.polled == [overdue.key]
+    store.close()
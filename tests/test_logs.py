@@ -0,0 +1,55 @@
+import io
+import json
+import logging
+import queue
+
+import logs
+
+
+class Exploding:
+
+    def __str__(self):
+        raise AssertionError('message formatted eagerly')
+
+
+def test_records_are_json_with_context():
+    stream = io.StringIO()
+    logger = logging.getLogger('test_logs.json')
+    logger.setLevel(logging.INFO)
+    handler, listener = logs.configure(logger, path=None, stream=stream)
+    try:
+        logs.subscription_id.set('abc')
+        logs.cycle_id.set(7)
+        logger.info(logs.Message('отправлено: {text}', text='привет'))
+        logger.debug(logs.Message('{value}', value=Exploding()))
+    finally:
+        logs.shutdown(listener)
+        logger.removeHandler(handler)
+    record = json.loads(stream.getvalue())
+    assert record['message'] == 'отправлено: привет'
+    assert record['subscription'] == 'abc'
+    assert record['cycle'] == 7
+    assert record['level'] == 'INFO'
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = logs.BoundedQueueHandler(queue.Queue(2))
+    logger = logging.getLogger('test_logs.bounded')
+    logger.addHandler(handler)
+    logger.propagate = False
+    try:
+        for number in range(5):
+            logger.warning(logs.Message('{number}', number=number))
+    finally:
+        logger.removeHandler(handler)
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+
+
+def test_module_loggers_share_the_configured_bot_logger():
+    import homework
+    import retry
+
+    assert homework.logger is logs.get_logger()
+    assert homework.logger.name == logs.LOGGER_NAME
+    assert retry.logger.parent is homework.logger
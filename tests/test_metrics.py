@@ -0,0 +1,70 @@
+import urllib.request
+
+import exceptions
+import metrics
+from subscriptions import Subscription
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = metrics.Registry()
+    histogram = registry.register(metrics.Histogram(
+        'test_seconds', 'тест', 'stage', buckets=(0.1, 1)
+    ))
+    for value in (0.05, 0.5, 5):
+        histogram.labels('poll').observe(value)
+    lines = registry.render().splitlines()
+    assert '# TYPE test_seconds histogram' in lines
+    assert 'test_seconds_bucket{stage="poll",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="poll",le="1"} 2' in lines
+    assert 'test_seconds_bucket{stage="poll",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{stage="poll"} 3' in lines
+
+
+def test_timed_function_keeps_signature_and_result():
+    histogram = metrics.Histogram('timed_seconds', 'тест', 'stage')
+
+    @histogram.time('work')
+    def work(value):
+        return value * 2
+
+    assert work(21) == 42
+    assert work.__wrapped__.__name__ == 'work'
+    assert 'timed_seconds_count{stage="work"} 1' in list(histogram.samples())
+
+
+def test_every_repo_exception_has_a_counter():
+    rendered = metrics.REGISTRY.render()
+    for name in ('ResponseStatusCodeError', 'ResponseError',
+                 'MissingTokenError', 'RateLimitError'):
+        assert f'homework_errors_total{{exception="{name}"}}' in rendered
+    assert issubclass(exceptions.RateLimitError, Exception)
+
+
+def test_cursor_lag_tracks_oldest_subscription(monkeypatch):
+    monkeypatch.setattr(metrics.time, 'time', lambda: 1000)
+    metrics.track_cursor_lag([
+        Subscription('a', 1, timestamp=900),
+        Subscription('b', 2, timestamp=400),
+    ])
+    assert list(metrics.CURSOR_LAG.samples()) == [
+        'homework_cursor_lag_seconds 600'
+    ]
+
+
+def test_endpoint_serves_prometheus_text():
+    server = metrics.serve(port=0)
+    try:
+        port = server.server_address[1]
+        with urllib.request.urlopen(
+            f'http://127.0.0.1:{port}/metrics'
+        ) as response:
+            body = response.read().decode()
+            assert response.headers['Content-Type'].startswith('text/plain')
+        assert '# TYPE homework_stage_seconds histogram' in body
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_disabled_without_port():
+    assert metrics.serve(port=None) is None
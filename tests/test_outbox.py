@@ -0,0 +1,95 @@
+import time
+
+import pytest
+from telegram.error import BadRequest, RetryAfter
+
+import breaker
+import exceptions
+import outbox
+from utils import RecordingBot
+
+
+def test_messages_are_delivered_and_acknowledged():
+    bot = RecordingBot()
+    box = outbox.Outbox(bot, global_rate=1000, chat_rate=1000).start()
+    futures = [box.submit(chat, f'text {chat}') for chat in range(20)]
+    assert all(future.result(timeout=2) for future in futures)
+    assert box.stop(timeout=1) == 0
+    assert box.stats()['sent'] == 20
+
+
+def test_per_chat_rate_is_respected():
+    bot = RecordingBot()
+    box = outbox.Outbox(bot, global_rate=1000, chat_rate=20).start()
+    futures = [box.submit(1, f'text {i}') for i in range(5)]
+    other = box.submit(2, 'other')
+    for future in futures + [other]:
+        future.result(timeout=2)
+    box.stop(timeout=1)
+    chat_times = [sent for sent, chat, _ in bot.messages if chat == 1]
+    assert chat_times[-1] - chat_times[0] >= 4 / 20 * 0.9
+    assert bot.sent.index('other') < 5
+
+
+def test_retry_after_is_honoured_and_bad_request_fails():
+    bot = RecordingBot(failures={
+        'flood': RetryAfter(0.2),
+        'bad': BadRequest('chat not found'),
+    })
+    box = outbox.Outbox(bot, global_rate=1000, chat_rate=1000).start()
+    started = time.monotonic()
+    flood = box.submit(1, 'flood')
+    bad = box.submit(2, 'bad')
+    assert flood.result(timeout=2)
+    assert time.monotonic() - started >= 0.2
+    with pytest.raises(BadRequest):
+        bad.result(timeout=2)
+    box.stop(timeout=1)
+    assert box.stats()['retry_after'] == 1
+
+
+def test_full_queue_rejects_without_blocking():
+    box = outbox.Outbox(RecordingBot(), maxsize=1)
+    box.submit(1, 'first')
+    with pytest.raises(exceptions.OutboxFullError):
+        box.submit(1, 'second').result(timeout=0)
+    assert box.stop(timeout=0) == 1
+
+
+def test_open_circuit_delays_messages_without_killing_the_thread(
+        monkeypatch):
+    monkeypatch.setattr(breaker, 'PROBE_WAIT', 0.05)
+    circuit = breaker.get(breaker.TELEGRAM)
+    circuit.reset_timeout = 0.1
+    for _ in range(circuit.failure_threshold):
+        circuit.failure()
+    bot = RecordingBot()
+    box = outbox.Outbox(bot, global_rate=1000, chat_rate=1000).start()
+    future = box.submit(1, 'after outage')
+    assert future.result(timeout=2)
+    assert box._thread.is_alive()
+    assert box.stop(timeout=1) == 0
+    assert box.stats()['circuit_open'] >= 1
+    assert circuit.state == breaker.CLOSED
+
+
+@pytest.mark.parametrize('error, failures', [
+    (BadRequest('chat not found'), 0),
+    (RetryAfter(1), 0),
+    (ConnectionError('reset'), 1),
+])
+def test_deliver_counts_only_outages_as_failures(error, failures):
+    bot = RecordingBot(failures={'text': error})
+    with pytest.raises(type(error)):
+        outbox.deliver(bot, 1, 'text')
+    assert breaker.get(breaker.TELEGRAM).failures == failures
+
+
+def test_deliver_does_not_send_while_circuit_is_open():
+    circuit = breaker.get(breaker.TELEGRAM)
+    for _ in range(circuit.failure_threshold):
+        circuit.failure()
+    bot = RecordingBot()
+    with pytest.raises(exceptions.CircuitOpenError):
+        outbox.deliver(bot, 1, 'text')
+    assert bot.sent == []
@@ -0,0 +1,131 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import pstats
+import signal
+import threading
+import time
+import tracemalloc
+
+import profiling
+
+
+def profiled_work():
+    return sum(range(1000))
+
+
+def unprofiled_work():
+    return 'done'
+
+
+def make_profiler(tmp_path):
+    moments = iter(range(1, 1000))
+    return profiling.Profiler(
+        str(tmp_path), clock=lambda: next(moments)
+    )
+
+
+def test_disabled_profiler_installs_nothing():
+    previous = signal.getsignal(profiling.STACKS_SIGNAL)
+    profiler = profiling.Profiler(directory=None).install()
+    assert signal.getsignal(profiling.STACKS_SIGNAL) is previous
+    assert profiler.run(unprofiled_work) == 'done'
+    assert profiler.session is None
+
+
+def test_profile_covers_iterations_between_toggles(tmp_path):
+    profiler = make_profiler(tmp_path)
+    profiler.toggle_profile()
+    assert profiler.run(profiled_work) == 499500
+    with ThreadPoolExecutor(1) as executor:
+        assert executor.submit(profiler.run, profiled_work).result()
+    profiler.toggle_profile()
+    assert profiler.run(unprofiled_work) == 'done'
+
+    files = list(tmp_path.glob('profile-*.pstats'))
+    assert len(files) == 1
+    stats = pstats.Stats(str(files[0])).stats
+    calls = {
+        function: counts[1] for (_, _, function), counts in stats.items()
+    }
+    assert calls['profiled_work'] == 2
+    assert 'unprofiled_work' not in calls
+
+
+def test_stacks_of_all_threads(tmp_path):
+    profiler = make_profiler(tmp_path)
+    event = threading.Event()
+    waiter = threading.Thread(target=event.wait, name='waiter', daemon=True)
+    waiter.start()
+    try:
+        path = profiler.dump_stacks()
+    finally:
+        event.set()
+        waiter.join()
+    with open(path, encoding='utf-8') as file:
+        text = file.read()
+    assert 'Поток waiter' in text
+    assert 'Поток MainThread' in text
+    assert 'dump_stacks' in text
+
+
+def test_tracemalloc_snapshot_after_second_toggle(tmp_path):
+    profiler = make_profiler(tmp_path)
+    assert profiler.toggle_tracemalloc() is None
+    assert tracemalloc.is_tracing()
+    kept = [bytearray(1024) for _ in range(100)]
+    path = profiler.toggle_tracemalloc()
+    assert not tracemalloc.is_tracing()
+    snapshot = tracemalloc.Snapshot.load(path)
+    assert sum(
+        stat.size for stat in snapshot.statistics('filename')
+        if stat.traceback[0].filename == __file__
+    ) >= 1024 * len(kept)
+    assert list(tmp_path.glob('tracemalloc-*.txt'))
+
+
+def test_signal_writes_stacks(tmp_path):
+    previous = {
+        signum: signal.getsignal(signum) for signum in (
+            profiling.PROFILE_SIGNAL, profiling.MEMORY_SIGNAL,
+            profiling.STACKS_SIGNAL
+        )
+    }
+    try:
+        make_profiler(tmp_path / 'profiles').install()
+        os.kill(os.getpid(), profiling.STACKS_SIGNAL)
+        deadline = time.monotonic() + 2
+        while (not list((tmp_path / 'profiles').glob('stacks-*.txt'))
+               and time.monotonic() < deadline):
+            time.sleep(0.01)
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+    assert list((tmp_path / 'profiles').glob('stacks-*.txt'))
+
+
+def test_single_active_profile_without_concurrent_support(
+        tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, 'CONCURRENT_PROFILES', False)
+    profiler = make_profiler(tmp_path)
+    profiler.toggle_profile()
+    started, release = threading.Event(), threading.Event()
+
+    def profiled_wait():
+        started.set()
+        release.wait(1)
+
+    with ThreadPoolExecutor(1) as executor:
+        future = executor.submit(profiler.run, profiled_wait)
+        started.wait(1)
+        assert profiler.run(unprofiled_work) == 'done'
+        release.set()
+        future.result()
+    profiler.toggle_profile()
+    profiler.run(unprofiled_work)
+
+    stats = pstats.Stats(
+        str(next(tmp_path.glob('profile-*.pstats')))
+    ).stats
+    functions = {function for _, _, function in stats}
+    assert 'profiled_wait' in functions
+    assert 'unprofiled_work' not in functions
@@ -0,0 +1,40 @@
+from clock import VirtualClock
+import reporting
+
+
+def test_fingerprint_ignores_volatile_parts():
+    first = reporting.fingerprint(ValueError('timeout after 301 ms, id 0xdead'))
+    second = reporting.fingerprint(ValueError('timeout after 12 ms, id 0xbeef'))
+    assert first == second
+    assert first != reporting.fingerprint(KeyError('timeout after 1 ms'))
+
+
+def test_repeats_are_suppressed_and_summarised():
+    clock = VirtualClock()
+    reporter = reporting.ErrorReporter(
+        window=60, burst=10, rate=0, clock=clock.monotonic
+    )
+    assert reporter.report(1, ConnectionError('down 1'))
+    for attempt in range(5):
+        assert not reporter.report(1, ConnectionError(f'down {attempt}'))
+    assert reporter.report(2, ConnectionError('down 1'))
+    assert reporter.due(1) == []
+
+    clock.now = 61
+    summaries = reporter.due(1)
+    assert len(summaries) == 1
+    assert 'подавлено: 5' in summaries[0]
+    stats = reporter.stats()
+    assert stats['reported'] == 2
+    assert stats['suppressed'] == 5
+
+
+def test_token_bucket_limits_distinct_errors():
+    clock = VirtualClock()
+    reporter = reporting.ErrorReporter(
+        window=60, burst=2, rate=0, clock=clock.monotonic
+    )
+    assert reporter.report(1, ValueError('a'))
+    assert reporter.report(1, KeyError('b'))
+    assert not reporter.report(1, TypeError('c'))
+    assert reporter.stats()['rate_limited'] == 1
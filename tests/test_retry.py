@@ -0,0 +1,169 @@
+import random
+
+import pytest
+import requests
+
+import breaker
+from clock import VirtualClock
+import exceptions
+import homework
+import retry
+
+
+def caused_by(cause):
+    try:
+        raise ConnectionError('request failed') from cause
+    except ConnectionError as error:
+        return error
+
+
+def make_policy(capacity=10, min_per_second=1):
+    clock = VirtualClock()
+    pauses = []
+    policy = retry.RetryPolicy(
+        budget=retry.RetryBudget(
+            capacity=capacity, min_per_second=min_per_second,
+            clock=clock.monotonic
+        ),
+        sleep=pauses.append, rng=random.Random(1)
+    )
+    return policy, pauses
+
+
+def failing(*errors, result='ok'):
+    errors = list(errors)
+    calls = []
+
+    def function():
+        calls.append(1)
+        if errors:
+            raise errors.pop(0)
+        return result
+    return function, calls
+
+
+@pytest.mark.parametrize('error, reason', [
+    (caused_by(requests.exceptions.ConnectTimeout()), retry.CONNECT),
+    (caused_by(requests.exceptions.ConnectionError()), retry.CONNECT),
+    (caused_by(requests.exceptions.ReadTimeout()), retry.READ_TIMEOUT),
+    (exceptions.ResponseStatusCodeError('5xx', status_code=503),
+     retry.SERVER),
+    (exceptions.ResponseStatusCodeError('4xx', status_code=404), None),
+    (exceptions.RateLimitError('429', retry_after=1), retry.RATE_LIMITED),
+    (exceptions.ResponseError('code', key='code'), None),
+    (exceptions.ResponseError('error', key='error'), None),
+    (TypeError('homeworks'), None),
+])
+def test_classify(error, reason):
+    assert retry.classify(error) == reason
+
+
+def test_server_blip_is_retried_within_one_call():
+    policy, pauses = make_policy()
+    function, calls = failing(
+        exceptions.ResponseStatusCodeError('5xx', status_code=502)
+    )
+    assert policy.call(function) == 'ok'
+    assert len(calls) == 2
+    assert len(pauses) == 1
+    assert 0 <= pauses[0] <= retry.POLICIES[retry.SERVER].base
+
+
+def test_attempts_are_limited_per_class():
+    policy, _ = make_policy()
+    errors = [caused_by(requests.exceptions.ReadTimeout()) for _ in range(5)]
+    function, calls = failing(*errors)
+    with pytest.raises(ConnectionError):
+        policy.call(function)
+    assert len(calls) == retry.POLICIES[retry.READ_TIMEOUT].attempts
+
+
+def test_rate_limit_waits_retry_after_or_gives_up():
+    policy, pauses = make_policy()
+    function, calls = failing(exceptions.RateLimitError('429', retry_after=5))
+    assert policy.call(function) == 'ok'
+    assert pauses == [5]
+
+    function, calls = failing(
+        exceptions.RateLimitError('429', retry_after=600)
+    )
+    with pytest.raises(exceptions.RateLimitError):
+        policy.call(function)
+    assert len(calls) == 1
+
+
+def test_response_error_key_is_not_retried():
+    policy, pauses = make_policy()
+    function, calls = failing(exceptions.ResponseError('error', key='error'))
+    with pytest.raises(exceptions.ResponseError):
+        policy.call(function)
+    assert len(calls) == 1
+    assert pauses == []
+
+
+def test_budget_caps_retries():
+    policy, _ = make_policy(capacity=2, min_per_second=0)
+
+    def retried(requests_count):
+        total = 0
+        for _ in range(requests_count):
+            function, calls = failing(*(
+                caused_by(requests.exceptions.ConnectionError())
+                for _ in range(retry.POLICIES[retry.CONNECT].attempts)
+            ))
+            with pytest.raises(ConnectionError):
+                policy.call(function)
+            total += len(calls) - 1
+        return total
+
+    assert retried(10) == 2
+    assert retried(11) == 1
+
+
+def html_response(status_code):
+    response = requests.models.Response()
+    response.status_code = status_code
+    response._content = b'<html>Bad Gateway</html>'
+    return response
+
+
+def test_undecodable_5xx_body_is_a_retried_server_error():
+    policy, _ = make_policy()
+    responses = [html_response(502), html_response(503)]
+
+    def decode():
+        if responses:
+            return homework.decode_api_answer(
+                responses.pop(0), homework.build_request_params(0, {})
+            )
+        return {'homeworks': []}
+
+    with pytest.raises(exceptions.ResponseStatusCodeError) as info:
+        homework.decode_api_answer(
+            html_response(502), homework.build_request_params(0, {})
+        )
+    assert retry.classify(info.value) == retry.SERVER
+    assert policy.call(decode) == {'homeworks': []}
+
+
+def test_breaker_counts_one_failure_per_call():
+    policy, _ = make_policy()
+    circuit = breaker.get('retry-test')
+
+    def attempt():
+        circuit.record(False)
+        raise exceptions.ResponseStatusCodeError('5xx', status_code=500)
+
+    with pytest.raises(exceptions.ResponseStatusCodeError):
+        policy.call(attempt)
+    assert circuit.failures == 1
+
+
+def test_interrupted_pause_stops_retries():
+    policy = retry.RetryPolicy(sleep=lambda seconds: True)
+    function, calls = failing(
+        exceptions.ResponseStatusCodeError('5xx', status_code=500)
+    )
+    with pytest.raises(exceptions.ResponseStatusCodeError):
+        policy.call(function)
+    assert len(calls) == 1
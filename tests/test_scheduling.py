@@ -0,0 +1,68 @@
+from clock import VirtualClock
+import scheduling
+from subscriptions import Subscription
+
+
+def server_clock():
+    clock = VirtualClock(1000.0)
+    return scheduling.ServerClock(clock.monotonic, clock.time)
+
+
+def make_scheduler(**kwargs):
+    options = dict(base=600, reviewing=60, maximum=3600, factor=2,
+                   jitter=0, hourly_budget=1000, clock=server_clock())
+    options.update(kwargs)
+    return scheduling.AdaptiveScheduler(**options)
+
+
+def test_unchanged_responses_back_off_up_to_maximum():
+    scheduler = make_scheduler()
+    subscription = Subscription('token', 1, timestamp=0)
+    delays = [
+        scheduler.after_success(subscription, changed=False)
+        for _ in range(5)
+    ]
+    assert delays == [1200, 2400, 3600, 3600, 3600]
+    assert scheduler.after_success(subscription, changed=True) == 600
+
+
+def test_reviewing_shortens_interval():
+    scheduler = make_scheduler()
+    subscription = Subscription('token', 1, timestamp=0)
+    subscription.statuses = {1: 'reviewing'}
+    assert scheduler.after_success(subscription, changed=False) == 60
+
+
+def test_retry_after_is_honoured():
+    scheduler = make_scheduler()
+    subscription = Subscription('token', 1, timestamp=0)
+    assert scheduler.after_error(subscription, retry_after=7200) == 7200
+    assert scheduler.after_error(
+        subscription, rate_limited=True
+    ) == 1200
+
+
+def test_hourly_budget_limits_rate():
+    scheduler = make_scheduler(hourly_budget=2, reviewing=1)
+    subscription = Subscription('token', 1, timestamp=0)
+    subscription.statuses = {1: 'reviewing'}
+    scheduler.charge(subscription)
+    assert scheduler.after_success(subscription, changed=False) == 1
+    scheduler.charge(subscription)
+    assert scheduler.after_success(subscription, changed=False) == 1800
+
+
+def test_parse_retry_after():
+    assert scheduling.parse_retry_after('120') == 120
+    assert scheduling.parse_retry_after(
+        'Wed, 21 Oct 2015 07:28:00 GMT', now=1445412480 - 30
+    ) == 30
+    assert scheduling.parse_retry_after('garbage') is None
+    assert scheduling.parse_retry_after(None) is None
+
+
+def test_server_clock_follows_current_date():
+    ticks = iter([0.0, 10.0, 25.0])
+    clock = scheduling.ServerClock(monotonic=lambda: next(ticks))
+    clock.observe(5000)
+    assert clock.now() == 5015
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from clock import VirtualClock
+import engine
+import sharding
+from subscriptions import Subscription
+from utils import RecordingPoller
+
+
+def test_ring_balances_and_moves_few_keys():
+    keys = [f'subscription-{i}' for i in range(10000)]
+    before = sharding.HashRing(['a', 'b', 'c', 'd'])
+    after = sharding.HashRing(['a', 'b', 'c', 'd', 'e'])
+    owners = [before.owner(key) for key in keys]
+    for node in 'abcd':
+        assert 1800 < owners.count(node) < 3200
+    moved = sum(before.owner(key) != after.owner(key) for key in keys)
+    assert moved < 10000 * 0.3
+    assert all(
+        after.owner(key) == 'e'
+        for key in keys if before.owner(key) != after.owner(key)
+    )
+
+
+def test_empty_ring_has_no_owner():
+    assert sharding.HashRing().owner('key') is None
+
+
+def test_membership_expires_silent_workers(tmp_path):
+    path = str(tmp_path / 'coordination.sqlite3')
+    clock = VirtualClock(1000.0)
+    first = sharding.Membership(path, 'first', ttl=10, clock=clock.time)
+    second = sharding.Membership(path, 'second', ttl=10, clock=clock.time)
+    first.heartbeat()
+    assert sorted(second.heartbeat()) == ['first', 'second']
+    clock.now += 11
+    assert second.heartbeat() == ['second']
+    second.leave()
+    assert first.heartbeat() == ['first']
+
+
+def test_engine_polls_only_own_shard(tmp_path):
+    path = str(tmp_path / 'coordination.sqlite3')
+    other = sharding.Membership(path, 'other', ttl=30)
+    other.heartbeat()
+    membership = sharding.Membership(path, 'mine', ttl=30)
+    subscriptions = [
+        Subscription(f'token{i}', i, timestamp=0) for i in range(200)
+    ]
+    poller = RecordingPoller()
+    bot_engine = engine.Engine(poller, concurrency=8, retry_time=0.05)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(asyncio.wait_for(
+            bot_engine.run(subscriptions, membership), timeout=0.3
+        ))
+
+    ring = sharding.HashRing(['mine', 'other'])
+    mine = {s.key for s in subscriptions if ring.owner(s.key) == 'mine'}
+    assert set(poller.polled) == mine
+    assert other.heartbeat() == ['other']
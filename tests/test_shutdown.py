@@ -0,0 +1,103 @@
+import asyncio
+import os
+import signal
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import engine
+import homework
+import scheduling
+import shutdown
+import storage
+from subscriptions import restore_all, Subscription
+from utils import RecordingBot, RecordingPoller
+
+
+def test_startup_delays_keep_schedule_and_spread_overdue():
+    subscriptions = [Subscription(f't{i}', i, timestamp=0) for i in range(4)]
+    subscriptions[0].due = 1300
+    subscriptions[1].due = 900
+    delays = scheduling.startup_delays(subscriptions, 600, now=1000)
+    assert delays == [300, 0, 200, 400]
+
+
+def test_due_time_survives_restart(tmp_path):
+    path = str(tmp_path / 'state.sqlite3')
+    store = storage.CheckpointStore(path)
+    subscription = Subscription('token', 1, timestamp=100)
+    subscription.due = 5000.5
+    subscription.checkpoint(store)
+    store.close()
+
+    store = storage.CheckpointStore(path)
+    restored = [Subscription('token', 1, timestamp=0)]
+    restore_all(restored, store)
+    assert restored[0].timestamp == 100
+    assert restored[0].due == 5000.5
+    store.save_cursor(subscription.key, 200)
+    store.flush()
+    assert store.load_due(subscription.key) == 5000.5
+    store.close()
+
+
+def test_old_schema_is_migrated(tmp_path):
+    path = str(tmp_path / 'state.sqlite3')
+    connection = sqlite3.connect(path)
+    connection.execute(
+        'CREATE TABLE cursors (subscription TEXT PRIMARY KEY, '
+        'from_date INTEGER NOT NULL) WITHOUT ROWID'
+    )
+    connection.execute("INSERT INTO cursors VALUES ('a', 10)")
+    connection.commit()
+    connection.close()
+    store = storage.CheckpointStore(path)
+    assert store.load_cursor('a') == 10
+    assert store.load_due('a', default=7) == 7
+    store.close()
+
+
+def test_poll_persists_next_due_time(monkeypatch, tmp_path):
+    store = storage.CheckpointStore(str(tmp_path / 'state.sqlite3'))
+    poller = homework.Poller(RecordingBot(), store)
+    monkeypatch.setattr(
+        poller, 'fetch', lambda subscription: (1000, [], None)
+    )
+    subscription = Subscription('token', 1, timestamp=0)
+    before = time.time()
+    delay = poller.poll(subscription)
+    store.flush()
+    assert store.load_due(subscription.key) >= before + delay
+    store.close()
+
+
+def test_sleep_is_interrupted_by_request():
+    stop = shutdown.Shutdown()
+    threading.Timer(0.05, stop.request).start()
+    started = time.monotonic()
+    assert stop.sleep(10)
+    assert time.monotonic() - started < 5
+
+
+def test_second_signal_exits_immediately():
+    stop = shutdown.Shutdown()
+    stop.request(signal.SIGTERM)
+    with pytest.raises(SystemExit):
+        stop.request(signal.SIGTERM)
+
+
+def test_engine_finishes_inflight_polls_on_signal():
+    poller = RecordingPoller(delay=60, pause=0.2)
+    subscriptions = [Subscription('token', 1, timestamp=0)]
+    bot_engine = engine.Engine(poller, concurrency=2, retry_time=0)
+
+    async def scenario():
+        asyncio.get_running_loop().call_later(
+            0.05, os.kill, os.getpid(), signal.SIGUSR1
+        )
+        await bot_engine.serve(subscriptions, signals=(signal.SIGUSR1,))
+
+    asyncio.run(scenario())
+    assert len(poller.polled) == 1
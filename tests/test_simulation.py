@@ -0,0 +1,58 @@
+from clock import VirtualClock
+import simulation
+
+HOUR = simulation.HOUR
+FIXED = dict(
+    base=600, reviewing=120, maximum=600, factor=1, jitter=0,
+    hourly_budget=1000
+)
+
+
+def test_virtual_clock_runs_events_in_order():
+    clock = VirtualClock(100)
+    calls = []
+    clock.call_at(130, calls.append, 'late')
+    clock.call_later(10, calls.append, 'early')
+    clock.call_at(130, calls.append, 'same moment')
+    clock.sleep(5)
+    assert clock.time() == clock.monotonic() == 105
+    assert clock.run(until=200) == 3
+    assert calls == ['early', 'late', 'same moment']
+    assert clock.time() == 200
+
+
+def test_week_of_polling_reports_calls_and_latency():
+    scenario = simulation.Scenario([
+        (HOUR + 60, 1, 'reviewing'),
+        (5 * HOUR + 30, 1, 'approved'),
+    ])
+    report = simulation.simulate(scenario, 7 * 24 * HOUR, **FIXED)
+    assert report['notified'] == 2
+    assert report['missed'] == report['pending'] == 0
+    assert report['error_messages'] == 0
+    assert 0 < report['latency_max'] <= 600
+    assert report['api_calls'] < 7 * 24 * 6 + 200
+    assert report['seconds'] < 10
+
+
+def test_outage_delays_notification_and_reports_errors():
+    scenario = simulation.Scenario(
+        [(HOUR, 1, 'reviewing')],
+        [(HOUR - 60, 3 * HOUR, simulation.NETWORK)]
+    )
+    report = simulation.simulate(scenario, 6 * HOUR, **FIXED)
+    assert report['notified'] == 1
+    assert report['latency_p50'] >= 2 * HOUR - 60
+    assert report['error_messages'] >= 1
+
+
+def test_slow_schedule_misses_short_lived_status():
+    scenario = simulation.Scenario([
+        (HOUR + 10, 1, 'reviewing'),
+        (HOUR + 100, 1, 'approved'),
+    ])
+    report = simulation.simulate(
+        scenario, 4 * HOUR, **{**FIXED, 'base': 3600, 'maximum': 3600}
+    )
+    assert report['missed'] == 1
+    assert report['notified'] == 1
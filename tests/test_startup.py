@@ -0,0 +1,35 @@
+import subprocess
+import sys
+from os.path import abspath, dirname
+
+import startup
+
+ROOT = dirname(dirname(abspath(__file__)))
+
+
+def test_import_does_not_load_telegram_or_requests():
+    code = (
+        'import sys, homework; '
+        'print(sorted(name for name in ("telegram", "requests", "urllib3") '
+        'if type(sys.modules.get(name)).__name__ == "module"))'
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', code], cwd=ROOT, capture_output=True,
+        text=True, check=True, env={'LOG_FILE': ''}
+    )
+    assert result.stdout.strip() == '[]'
+
+
+def test_lazy_module_loads_on_first_attribute():
+    module = startup.lazy('json')
+    assert module.dumps([1]) == '[1]'
+
+
+def test_profile_reports_phases():
+    ticks = iter([0.0, 1.0, 1.5, 2.0])
+    profile = startup.StartupProfile(clock=lambda: next(ticks))
+    with profile.phase('этап'):
+        pass
+    lines = profile.report().splitlines()
+    assert lines[1].split() == ['этап', '500.0']
+    assert lines[2].split() == ['всего', '2000.0']
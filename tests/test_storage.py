@@ -0,0 +1,62 @@
+import json
+
+from homework import HOMEWORK_VERDICTS
+import storage
+from subscriptions import load_file, restore_all, Subscription
+
+
+def test_checkpoint_survives_reopen(tmp_path):
+    path = str(tmp_path / 'state.sqlite3')
+    store = storage.CheckpointStore(path)
+    store.save_cursor('a', 100)
+    store.save_status('a', 1, 'reviewing')
+    store.save_status('a', 1, 'approved')
+    store.save_cursor('b', 200)
+    assert store.flush() == 3
+    assert store.flush() == 0
+    store.save_cursor('a', 150)
+    store.close()
+
+    store = storage.CheckpointStore(path)
+    assert store.load_cursors() == {'a': 150, 'b': 200}
+    assert store.load_cursor('c', default=7) == 7
+    assert store.load_statuses('a') == {1: 'approved'}
+    store.close()
+
+
+def test_restore_all(tmp_path):
+    store = storage.CheckpointStore(str(tmp_path / 'state.sqlite3'))
+    first = Subscription('token', 1, timestamp=10)
+    first.checkpoint(store)
+    store.save_status(first.key, 5, 'rejected')
+    store.flush()
+
+    restored = [Subscription('token', 1, timestamp=0),
+                Subscription('other', 2, timestamp=0)]
+    restore_all(restored, store)
+    assert restored[0].timestamp == 10
+    assert restored[0].statuses == {5: 'rejected'}
+    assert restored[1].timestamp == 0
+    assert restored[1].statuses == {}
+    store.close()
+
+
+def test_restored_state_shares_status_and_cohort_strings(tmp_path):
+    path = tmp_path / 'subscriptions.json'
+    path.write_text(json.dumps([
+        {'token': 'first', 'chat_id': 1, 'cohort': 'cohort-' + '7'},
+        {'token': 'second', 'chat_id': 2, 'cohort': 'cohort-' + '7'},
+    ]))
+    store = storage.CheckpointStore(str(tmp_path / 'state.sqlite3'))
+    first, second = load_file(str(path))
+    store.save_status(first.key, 5, 'approved')
+    store.save_status(second.key, 6, 'approved')
+    store.flush()
+
+    restore_all([first, second], store)
+    approved = next(status for status in HOMEWORK_VERDICTS
+                    if status == 'approved')
+    assert first.statuses[5] is second.statuses[6] is approved
+    assert store.load_statuses(first.key)[5] is approved
+    assert first.cohort is second.cohort
+    store.close()
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+import exceptions
+import streaming
+
+
+def chunked(payload, size=7):
+    body = json.dumps(payload, ensure_ascii=False).encode()
+    return [body[start:start + size] for start in range(0, len(body), size)]
+
+
+def make_homeworks(count):
+    return [
+        {'id': i, 'homework_name': f'работа {i}', 'status': 'approved',
+         'reviewer_comment': 'x' * 50}
+        for i in range(count)
+    ]
+
+
+def test_stream_yields_every_record_with_bounded_buffer():
+    payload = {'current_date': 123, 'homeworks': make_homeworks(500)}
+    stream = streaming.HomeworkStream(chunked(payload, size=64))
+    longest = 0
+    ids = []
+    for record in stream:
+        ids.append(record['id'])
+        longest = max(longest, len(stream.buffer))
+    assert ids == list(range(500))
+    assert stream.current_date == 123
+    assert stream.count == 500
+    assert longest < 1000
+
+
+def test_stream_reads_fields_after_homeworks():
+    payload = {'homeworks': make_homeworks(2), 'current_date': 99}
+    stream = streaming.HomeworkStream(chunked(payload))
+    assert len(list(stream)) == 2
+    assert stream.current_date == 99
+
+
+@pytest.mark.parametrize('payload, error', [
+    ([], TypeError),
+    ({'current_date': 1}, KeyError),
+    ({'homeworks': {'status': 'approved'}}, TypeError),
+    ({'homeworks': [{'homework_name': 'a'}]}, KeyError),
+    ({'homeworks': [{'homework_name': 'a', 'status': 'unknown'}]},
+     ValueError),
+    ({'code': 'not_authenticated', 'homeworks': []},
+     exceptions.ResponseError),
+])
+def test_stream_applies_response_checks(payload, error):
+    with pytest.raises(error):
+        list(streaming.HomeworkStream(chunked(payload)))
+
+
+def test_truncated_body_is_an_error():
+    body = json.dumps({'homeworks': make_homeworks(3)}).encode()[:-20]
+    with pytest.raises(ValueError):
+        list(streaming.HomeworkStream([body]))
@@ -0,0 +1,108 @@
+import homework
+import timeline
+from subscriptions import Subscription
+from utils import RecordingBot
+
+DAY = timeline.DAY
+
+
+def make_store(tmp_path):
+    return timeline.TimelineStore(
+        str(tmp_path / 'timeline.sqlite3'), clock=lambda: 1000 * DAY
+    )
+
+
+def add(store, subscription, homework_id, status, day):
+    store.clock = lambda: 1000 * DAY + day * DAY
+    store.record(subscription, homework_id, {
+        'id': homework_id,
+        'homework_name': 'hw{}'.format(homework_id),
+        'status': status,
+    })
+
+
+def test_events_are_interned_and_deduplicated(tmp_path):
+    store = make_store(tmp_path)
+    subscription = Subscription('token', 1, cohort='spring')
+    homework_record = {
+        'id': 1, 'homework_name': 'hw1', 'status': 'reviewing',
+        'date_updated': '2022-01-10T10:00:00Z',
+    }
+    store.record(subscription, 1, homework_record)
+    store.record(subscription, 1, homework_record)
+    assert store.flush() == 2
+    store.record(subscription, 1, homework_record)
+    store.close()
+    store = make_store(tmp_path)
+    rows = store.connection.execute('SELECT * FROM timeline').fetchall()
+    assert rows == [(
+        1, 1, int(timeline.updated_at(homework_record)),
+        store.statuses['reviewing']
+    )]
+    assert all(isinstance(value, int) for value in rows[0])
+    assert store.transitions('reviewing') == [(
+        rows[0][2], subscription.key, 'spring', 1, 'hw1'
+    )]
+
+
+def test_median_review_time_per_cohort(tmp_path):
+    store = make_store(tmp_path)
+    spring = Subscription('a', 1, cohort='spring')
+    autumn = Subscription('b', 2, cohort='autumn')
+    add(store, spring, 1, 'reviewing', 0)
+    add(store, spring, 1, 'approved', 2)
+    add(store, spring, 2, 'reviewing', 0)
+    add(store, spring, 2, 'rejected', 1)
+    add(store, spring, 2, 'reviewing', 3)
+    add(store, spring, 2, 'approved', 7)
+    add(store, spring, 3, 'reviewing', 0)
+    add(store, spring, 3, 'approved', 3)
+    add(store, autumn, 1, 'reviewing', 0)
+    add(store, autumn, 1, 'approved', 1)
+    store.flush()
+    assert store.median_durations('reviewing', 'approved') == {
+        'spring': (3 * DAY, 3),
+        'autumn': (DAY, 1),
+    }
+    assert store.median_durations('reviewing', 'unknown') == {}
+
+
+def test_rejections_within_period(tmp_path):
+    store = make_store(tmp_path)
+    subscription = Subscription('a', 1)
+    add(store, subscription, 1, 'rejected', 0)
+    add(store, subscription, 2, 'rejected', 8)
+    add(store, subscription, 3, 'approved', 9)
+    store.flush()
+    since = 1000 * DAY + 2 * DAY
+    assert [row[3] for row in store.transitions('rejected', since)] == [2]
+    assert store.transitions('unknown') == []
+
+
+def test_poller_records_transitions(tmp_path, monkeypatch):
+    store = make_store(tmp_path)
+    poller = homework.Poller(RecordingBot(), timeline=store)
+    monkeypatch.setattr(poller, 'fetch', lambda subscription: (1000, [{
+        'id': 5, 'homework_name': 'hw5', 'status': 'approved',
+        'date_updated': '2022-01-10T10:00:00Z',
+    }], None))
+    subscription = Subscription('token', 1, timestamp=0)
+    poller.poll(subscription)
+    poller.poll(subscription)
+    assert [row[3:] for row in store.transitions('approved')] == [
+        (5, 'hw5')
+    ]
+
+
+def test_cli_prints_review_time(tmp_path, capsys):
+    store = make_store(tmp_path)
+    subscription = Subscription('a', 1, cohort='spring')
+    add(store, subscription, 1, 'reviewing', 0)
+    add(store, subscription, 1, 'approved', 1)
+    store.close()
+    timeline.main([
+        '--state', str(tmp_path / 'timeline.sqlite3'), 'review-time'
+    ])
+    assert capsys.readouterr().out == (
+        'spring: медиана 24.0 ч, работ 1\n'
+    )
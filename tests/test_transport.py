@@ -0,0 +1,57 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+
+import pytest
+import requests
+
+import transport
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = b'{"homeworks": [], "current_date": 1}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/'
+    server.shutdown()
+    server.server_close()
+
+
+def test_transport_reuses_connections(server_url):
+    client = transport.Transport(pool_size=2)
+    first = client.get(server_url, params={'from_date': 0})
+    second = client.get(server_url, params={'from_date': 0})
+    client.close()
+
+    assert first.json()['current_date'] == 1
+    assert first.timing['reused'] is False
+    assert 'connect' in first.timing
+    assert second.timing['reused'] is True
+    assert second.timing['first_byte'] <= second.timing['total']
+    stats = client.stats()
+    assert stats['requests'] == 2
+    assert stats['new_connections'] == 1
+    assert stats['reused_connections'] == 1
+
+
+def test_current_falls_back_to_requests():
+    transport.install(None)
+    assert transport.current() is requests
+    client = transport.install(transport.Transport())
+    assert transport.current() is client
+    transport.install(None)
@@ -1,4 +1,6 @@
 from inspect import signature
+import threading
+import time
 from types import ModuleType
 
 
@@ -37,3 +39,41 @@ def check_default_var_exists(scope: ModuleType, var_name: str) -> None:
         f'{var_name} должна быть переменной, а не функцией.'
     )
 
+
+class RecordingBot:
+    """Бот без сети: запоминает сообщения, failures — ошибки по тексту."""
+
+    def __init__(self, failures=None):
+        self.messages = []
+        self.failures = dict(failures or {})
+        self.lock = threading.Lock()
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        with self.lock:
+            error = self.failures.pop(text, None)
+            if error is not None:
+                raise error
+            self.messages.append((time.monotonic(), chat_id, text))
+
+    @property
+    def sent(self):
+        """Тексты отправленных сообщений по порядку."""
+        return [text for _, _, text in self.messages]
+
+
+class RecordingPoller:
+    """Поллер без запросов: запоминает ключи опрошенных подписок."""
+
+    def __init__(self, delay=0.01, store=None, pause=0.0):
+        self.delay = delay
+        self.store = store
+        self.pause = pause
+        self.polled = []
+        self.lock = threading.Lock()
+
+    def poll(self, subscription):
+        time.sleep(self.pause)
+        with self.lock:
+            self.polled.append(subscription.key)
+        subscription.due = time.time() + self.delay
+        return self.delay
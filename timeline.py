@@ -0,0 +1,260 @@
+from datetime import datetime, timezone
+import os
+import sys
+import threading
+import time
+
+import startup
+import storage
+
+argparse = startup.lazy('argparse')
+statistics = startup.lazy('statistics')
+
+TIMELINE_FILE = os.getenv('TIMELINE_FILE', storage.STATE_FILE)
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+DAY = 24 * 60 * 60
+NO_COHORT = '-'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS timeline_statuses (
+    code INTEGER PRIMARY KEY,
+    status TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS timeline_subscriptions (
+    id INTEGER PRIMARY KEY,
+    subscription TEXT NOT NULL UNIQUE,
+    cohort TEXT
+);
+CREATE TABLE IF NOT EXISTS timeline_homeworks (
+    subscription INTEGER NOT NULL,
+    homework_id NOT NULL,
+    name TEXT,
+    PRIMARY KEY (subscription, homework_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS timeline (
+    subscription INTEGER NOT NULL,
+    homework_id NOT NULL,
+    at INTEGER NOT NULL,
+    status INTEGER NOT NULL,
+    PRIMARY KEY (subscription, homework_id, at, status)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS timeline_by_status ON timeline (status, at);
+'''
+
+REJECTION_LINE = '{time} {cohort} {subscription} "{name}"'
+REVIEW_TIME_LINE = (
+    '{cohort}: медиана {median_hours:.1f} ч, работ {count}'
+)
+TIME_FORMAT = '%Y-%m-%d %H:%M'
+
+
+def updated_at(record):
+    """Время обновления работы как unix-время или None."""
+    value = record.get('date_updated')
+    if not value:
+        return None
+    return datetime.strptime(value, DATE_FORMAT).replace(
+        tzinfo=timezone.utc
+    ).timestamp()
+
+
+class TimelineStore:
+    """Дописываемый журнал смен статусов по подпискам и работам.
+
+    Событие хранится четырьмя целыми: номер подписки, id работы, время
+    и код статуса. Строки статусов и ключи подписок записаны один раз в
+    справочниках, названия работ — один раз на работу. Первичный ключ
+    (подписка, работа, время, статус) отвечает за историю одной работы и
+    делает повторную запись того же события пустой операцией, а индекс
+    (статус, время) — за выборки по статусу за период. События копятся
+    в памяти и записываются одной транзакцией в flush().
+    """
+
+    def __init__(self, path=TIMELINE_FILE, clock=time.time):
+        self.clock = clock
+        self.connection = storage.connect(path)
+        self.connection.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._events = []
+        self._homeworks = {}
+        self._cohorts = {}
+        self.statuses = dict(self.connection.execute(
+            'SELECT status, code FROM timeline_statuses'
+        ))
+        self.subscriptions = dict(self.connection.execute(
+            'SELECT subscription, id FROM timeline_subscriptions'
+        ))
+
+    def record(self, subscription, key, homework):
+        """Отложенная запись смены статуса работы до flush()."""
+        at = updated_at(homework)
+        with self._lock:
+            self._events.append((
+                subscription.key, key,
+                int(self.clock() if at is None else at), homework['status']
+            ))
+            self._homeworks[subscription.key, key] = homework.get(
+                'homework_name'
+            )
+            self._cohorts[subscription.key] = subscription.cohort
+
+    def flush(self):
+        """Запись накопленных событий одной транзакцией."""
+        with self._lock:
+            if not self._events:
+                return 0
+            events, self._events = self._events, []
+            homeworks, self._homeworks = self._homeworks, {}
+            cohorts, self._cohorts = self._cohorts, {}
+            with self.connection:
+                self.connection.execute('BEGIN')
+                self._intern(cohorts, events)
+                self.connection.executemany(
+                    'INSERT OR IGNORE INTO timeline_homeworks '
+                    '(subscription, homework_id, name) VALUES (?, ?, ?)',
+                    ((self.subscriptions[key], homework_id, name)
+                     for (key, homework_id), name in homeworks.items())
+                )
+                self.connection.executemany(
+                    'INSERT OR IGNORE INTO timeline '
+                    '(subscription, homework_id, at, status) '
+                    'VALUES (?, ?, ?, ?)',
+                    ((self.subscriptions[key], homework_id, at,
+                      self.statuses[status])
+                     for key, homework_id, at, status in events)
+                )
+        return len(events)
+
+    def _intern(self, cohorts, events):
+        for key, cohort in cohorts.items():
+            if key not in self.subscriptions:
+                self.subscriptions[key] = self.connection.execute(
+                    'INSERT INTO timeline_subscriptions (subscription, '
+                    'cohort) VALUES (?, ?)', (key, cohort)
+                ).lastrowid
+            elif cohort is not None:
+                self.connection.execute(
+                    'UPDATE timeline_subscriptions SET cohort = ? '
+                    'WHERE subscription = ?', (cohort, key)
+                )
+        for status in {event[3] for event in events} - self.statuses.keys():
+            self.statuses[status] = self.connection.execute(
+                'INSERT INTO timeline_statuses (status) VALUES (?)',
+                (status,)
+            ).lastrowid
+
+    def transitions(self, status, since=0, until=None):
+        """События со статусом status за период, по возрастанию времени.
+
+        Кортежи (время, подписка, когорта, id работы, название).
+        """
+        code = self.statuses.get(status)
+        if code is None:
+            return []
+        return self.connection.execute(
+            'SELECT t.at, s.subscription, s.cohort, t.homework_id, h.name '
+            'FROM timeline t '
+            'JOIN timeline_subscriptions s ON s.id = t.subscription '
+            'LEFT JOIN timeline_homeworks h '
+            'ON h.subscription = t.subscription '
+            'AND h.homework_id = t.homework_id '
+            'WHERE t.status = ? AND t.at >= ? AND t.at < ? ORDER BY t.at',
+            (code, since, sys.maxsize if until is None else until)
+        ).fetchall()
+
+    def durations(self, start, end, since=0, until=None):
+        """Секунды от последнего start до каждого end по когортам.
+
+        Учитываются события end за период; повторная отправка после
+        доработки считается заново от своего start.
+        """
+        start_code = self.statuses.get(start)
+        end_code = self.statuses.get(end)
+        if start_code is None or end_code is None:
+            return {}
+        # Унарный плюс не даёт планировщику взять индекс по статусу для
+        # подзапроса: историю одной работы быстрее найти по ключу.
+        rows = self.connection.execute(
+            'SELECT s.cohort, t.at - ('
+            'SELECT MAX(r.at) FROM timeline r '
+            'WHERE r.subscription = t.subscription '
+            'AND r.homework_id = t.homework_id '
+            'AND +r.status = ? AND r.at <= t.at) '
+            'FROM timeline t '
+            'JOIN timeline_subscriptions s ON s.id = t.subscription '
+            'WHERE t.status = ? AND t.at >= ? AND t.at < ?',
+            (start_code, end_code, since,
+             sys.maxsize if until is None else until)
+        )
+        durations = {}
+        for cohort, seconds in rows:
+            if seconds is not None:
+                durations.setdefault(cohort, []).append(seconds)
+        return durations
+
+    def median_durations(self, start, end, since=0, until=None):
+        """Медиана и число переходов start -> end по когортам."""
+        return {
+            cohort: (statistics.median(values), len(values))
+            for cohort, values in self.durations(
+                start, end, since, until
+            ).items()
+        }
+
+    def close(self):
+        """Запись остатка событий и закрытие базы."""
+        self.flush()
+        self.connection.close()
+
+
+def parse_args(argv=None):
+    """Параметры запроса к журналу."""
+    parser = argparse.ArgumentParser(description='Журнал смен статусов')
+    parser.add_argument('--state', default=TIMELINE_FILE)
+    parser.add_argument(
+        '--days', type=float, default=None,
+        help='только события за последние дни'
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+    rejections = commands.add_parser(
+        'rejections', help='работы, возвращённые на доработку'
+    )
+    rejections.add_argument('--status', default='rejected')
+    review_time = commands.add_parser(
+        'review-time', help='медиана времени между статусами по когортам'
+    )
+    review_time.add_argument('--from', dest='start', default='reviewing')
+    review_time.add_argument('--to', dest='end', default='approved')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Запрос к журналу из командной строки."""
+    args = parse_args(argv)
+    since = 0 if args.days is None else time.time() - args.days * DAY
+    store = TimelineStore(args.state)
+    try:
+        if args.command == 'rejections':
+            for at, subscription, cohort, _, name in store.transitions(
+                args.status, since
+            ):
+                print(REJECTION_LINE.format(
+                    time=time.strftime(TIME_FORMAT, time.localtime(at)),
+                    cohort=cohort or NO_COHORT,
+                    subscription=subscription, name=name
+                ))
+        else:
+            medians = store.median_durations(args.start, args.end, since)
+            for cohort, (median, count) in sorted(
+                medians.items(), key=lambda item: item[0] or ''
+            ):
+                print(REVIEW_TIME_LINE.format(
+                    cohort=cohort or NO_COHORT,
+                    median_hours=median / 3600, count=count
+                ))
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 64))
+CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 3.05))
+READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 10))
+TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+ACCEPT_ENCODING = 'gzip, deflate'
+
+TIMING_PHASES = ('connect', 'tls', 'first_byte', 'total')
+
+_local = threading.local()
+_current = None
+
+
+def _record(phase, seconds):
+    timing = getattr(_local, 'timing', None)
+    if timing is not None:
+        timing[phase] = timing.get(phase, 0.0) + seconds
+
+
+class _TimedConnectionMixin:
+    def _new_conn(self):
+        started = time.perf_counter()
+        conn = super()._new_conn()
+        _record('connect', time.perf_counter() - started)
+        return conn
+
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    """HTTP-соединение, замеряющее время установки."""
+
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    """HTTPS-соединение, замеряющее время установки и TLS-рукопожатия."""
+
+    def connect(self):
+        """Установка соединения с отдельным замером TLS."""
+        timing = getattr(_local, 'timing', None)
+        connect_before = timing.get('connect', 0.0) if timing else 0.0
+        started = time.perf_counter()
+        super().connect()
+        elapsed = time.perf_counter() - started
+        connect_after = timing.get('connect', 0.0) if timing else 0.0
+        _record('tls', elapsed - (connect_after - connect_before))
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    """Пул HTTP-соединений с замером времени."""
+
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    """Пул HTTPS-соединений с замером времени."""
+
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """Адаптер requests, использующий пулы с замером времени."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        """Подмена классов пулов в менеджере соединений."""
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool,
+        }
+
+
+class Transport:
+    """Общий пул keep-alive соединений с таймаутами и замером фаз.
+
+    Для каждого запроса в response.timing сохраняются секунды на
+    установку соединения (connect, включая разрешение имени — urllib3
+    делает его внутри create_connection), TLS-рукопожатие (tls),
+    ожидание первого байта ответа (first_byte) и весь запрос (total).
+    При переиспользовании соединения connect и tls отсутствуют,
+    а reused равен True.
+    """
+
+    def __init__(self, pool_size=POOL_SIZE, timeout=TIMEOUT,
+                 compression=True):
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = TimedHTTPAdapter(
+            pool_connections=4, pool_maxsize=pool_size
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers['Connection'] = 'keep-alive'
+        self.session.headers['Accept-Encoding'] = (
+            ACCEPT_ENCODING if compression else 'identity'
+        )
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.totals = dict.fromkeys(TIMING_PHASES, 0.0)
+
+    def get(self, url, params=None, **kwargs):
+        """GET-запрос через общий пул соединений."""
+        kwargs.setdefault('timeout', self.timeout)
+        _local.timing = timing = {}
+        started = time.perf_counter()
+        try:
+            response = self.session.get(url, params=params, **kwargs)
+        finally:
+            _local.timing = None
+        timing['first_byte'] = response.elapsed.total_seconds()
+        timing['total'] = time.perf_counter() - started
+        timing['reused'] = 'connect' not in timing
+        response.timing = timing
+        self._account(timing)
+        return response
+
+    def _account(self, timing):
+        with self._lock:
+            self.requests += 1
+            self.new_connections += not timing['reused']
+            for phase in TIMING_PHASES:
+                self.totals[phase] += timing.get(phase, 0.0)
+
+    def stats(self):
+        """Сводка по запросам и переиспользованию соединений."""
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'new_connections': self.new_connections,
+                'reused_connections': self.requests - self.new_connections,
+                **{f'{phase}_seconds': value
+                   for phase, value in self.totals.items()},
+            }
+
+    def close(self):
+        """Закрытие всех соединений пула."""
+        self.session.close()
+
+
+def install(transport):
+    """Назначение общего транспорта для запросов к API."""
+    global _current
+    _current = transport
+    return transport
+
+
+def current():
+    """Текущий транспорт: общий пул или модуль requests."""
+    return _current or requests